@@ -1,6 +1,12 @@
 import discord
 from discord.ext import commands
 from config import settings
+from services.metrics import metrics_collector
+from services.metrics_store import metrics_store
+from services.alerts import alert_engine
+from services.snapraid_reports import snapraid_reports
+from services.remote_jobs import remote_jobs
+from services.confirmations import confirmation_manager
 import os
 
 # Initialize bot
@@ -11,15 +17,28 @@ bot = commands.Bot(command_prefix="!", intents=intents)
 async def on_ready():
     print(f"Logged in as {bot.user} (ID: {bot.user.id})")
     print("------")
+    # Background metrics collection and persistence (no-op on reconnects)
+    metrics_store.start()
+    alert_engine.start(bot)
+    metrics_collector.start()
+    snapraid_reports.start()
+    remote_jobs.start(bot)
+    confirmation_manager.start()
     # Server Manager
     await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.watching, name="for i in servers: manage(i)"))
 
+# Persist every collected sample and check it against alert rules
+metrics_collector.add_listener(metrics_store.add_samples)
+metrics_collector.add_listener(alert_engine.evaluate)
+
 # Load extensions
 extensions = [
     "discord_commands.torrents",
     "discord_commands.docker_control",
     "discord_commands.snapraid",
     "discord_commands.system",
+    "discord_commands.fleet",
+    "discord_commands.jobs",
 ]
 
 if __name__ == "__main__":
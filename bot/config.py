@@ -14,6 +14,15 @@ class ConnectionConfig:
     port: int
     user: str
     key_path: str
+    max_concurrent_commands: int = 4
+    # Long-lived commands (event streams, log follows, du crawls), counted separately
+    max_background_commands: int = 4
+    keepalive_interval: int = 30
+    idle_timeout: int = 600
+    pool_min_size: int = 0
+    pool_max_size: int = 2
+    # Keep below sshd's MaxSessions (default 10)
+    max_channels_per_connection: int = 8
 
 
 @dataclass
@@ -40,6 +49,14 @@ class ServerConfig:
     def get_filesystem_config(self) -> Optional[Dict[str, Any]]:
         """Get filesystem configuration if available"""
         return self.config.get("filesystem")
+    
+    def get_docker_config(self) -> Dict[str, Any]:
+        """Get Docker configuration (empty if not configured)"""
+        return self.config.get("docker") or {}
+    
+    def get_alerts_config(self) -> Dict[str, Any]:
+        """Get alert rule configuration (empty if not configured)"""
+        return self.config.get("alerts") or {}
 
 
 class Settings:
@@ -53,6 +70,75 @@ class Settings:
         int(x) for x in os.getenv("DISCORD_ADMIN_USER_IDS", "").split(",") if x.strip()
     }
     
+    # SSH settings
+    SSH_WORKER_THREADS = int(os.getenv("SSH_WORKER_THREADS", "16"))
+    SSH_POOL_ACQUIRE_TIMEOUT = float(os.getenv("SSH_POOL_ACQUIRE_TIMEOUT", "30"))
+    SSH_POOL_JANITOR_INTERVAL = float(os.getenv("SSH_POOL_JANITOR_INTERVAL", "30"))
+    SSH_MAX_OUTPUT_CHARS = int(os.getenv("SSH_MAX_OUTPUT_CHARS", "1000000"))
+    
+    # Docker
+    DOCKER_INVENTORY_TTL = float(os.getenv("DOCKER_INVENTORY_TTL", "60"))
+    DOCKER_API_TIMEOUT = float(os.getenv("DOCKER_API_TIMEOUT", "60"))
+    DOCKER_API_IDLE_TIMEOUT = float(os.getenv("DOCKER_API_IDLE_TIMEOUT", "300"))
+    DOCKER_OVERVIEW_TTL = float(os.getenv("DOCKER_OVERVIEW_TTL", "15"))
+    DOCKER_FOLLOW_MAX_PER_HOST = int(os.getenv("DOCKER_FOLLOW_MAX_PER_HOST", "2"))
+    DOCKER_FOLLOW_MAX_DURATION = float(os.getenv("DOCKER_FOLLOW_MAX_DURATION", "3600"))
+    DOCKER_FOLLOW_BATCH_INTERVAL = float(os.getenv("DOCKER_FOLLOW_BATCH_INTERVAL", "2"))
+    
+    # System info
+    PUBLIC_IP_TTL = float(os.getenv("PUBLIC_IP_TTL", "3600"))
+    
+    # Fleet-wide commands
+    FLEET_MAX_CONCURRENCY = int(os.getenv("FLEET_MAX_CONCURRENCY", "8"))
+    FLEET_HOST_TIMEOUT = float(os.getenv("FLEET_HOST_TIMEOUT", "20"))
+    
+    # Background metrics collection
+    METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "60"))
+    METRICS_HISTORY = int(os.getenv("METRICS_HISTORY", "1440"))
+    
+    # Metrics persistence
+    METRICS_DB_PATH = os.getenv("METRICS_DB_PATH", "data/metrics.db")
+    METRICS_STORE_FLUSH_INTERVAL = float(os.getenv("METRICS_STORE_FLUSH_INTERVAL", "30"))
+    METRICS_RAW_RETENTION = int(os.getenv("METRICS_RAW_RETENTION", str(2 * 86400)))
+    METRICS_5MIN_RETENTION = int(os.getenv("METRICS_5MIN_RETENTION", str(30 * 86400)))
+    METRICS_HOURLY_RETENTION = int(os.getenv("METRICS_HOURLY_RETENTION", str(365 * 86400)))
+    COMMAND_RESULTS_RETENTION = int(os.getenv("COMMAND_RESULTS_RETENTION", str(90 * 86400)))
+    
+    # Disk usage index
+    DISK_USAGE_MAX_AGE = float(os.getenv("DISK_USAGE_MAX_AGE", "21600"))
+    DISK_USAGE_DF_TTL = float(os.getenv("DISK_USAGE_DF_TTL", "60"))
+    DISK_USAGE_CRAWL_TIMEOUT = float(os.getenv("DISK_USAGE_CRAWL_TIMEOUT", "14400"))
+    
+    # Operation scheduling
+    HEAVY_JOBS_PER_HOST = int(os.getenv("HEAVY_JOBS_PER_HOST", "1"))
+    QUEUE_MAX_WAIT = float(os.getenv("QUEUE_MAX_WAIT", "3600"))
+    
+    # Detached remote jobs
+    REMOTE_JOB_DIR = os.getenv("REMOTE_JOB_DIR", ".server-manager/jobs")
+    REMOTE_JOB_POLL_INTERVAL = float(os.getenv("REMOTE_JOB_POLL_INTERVAL", "15"))
+    REMOTE_JOB_LOG_CHUNK = int(os.getenv("REMOTE_JOB_LOG_CHUNK", str(256 * 1024)))
+    REMOTE_JOB_RETENTION_DAYS = int(os.getenv("REMOTE_JOB_RETENTION_DAYS", "7"))
+    
+    # SnapRAID
+    SNAPRAID_STATUS_TTL = int(os.getenv("SNAPRAID_STATUS_TTL", "300"))
+    SNAPRAID_SMART_TTL = int(os.getenv("SNAPRAID_SMART_TTL", str(6 * 3600)))
+    SNAPRAID_MAINTENANCE_TIMEOUT = float(os.getenv("SNAPRAID_MAINTENANCE_TIMEOUT", str(12 * 3600)))
+    
+    # Alerting
+    ALERT_CHANNEL_ID = int(os.getenv("ALERT_CHANNEL_ID", "0") or 0)
+    
+    # Confirmations
+    CONFIRMATION_TTL = float(os.getenv("CONFIRMATION_TTL", "120"))
+    CONFIRMATION_MAX_PENDING = int(os.getenv("CONFIRMATION_MAX_PENDING", "1000"))
+    CONFIRMATION_MAX_PER_USER = int(os.getenv("CONFIRMATION_MAX_PER_USER", "5"))
+    CONFIRMATION_STORE_PATH = os.getenv("CONFIRMATION_STORE_PATH", "")
+    
+    # Discord message handling
+    DISCORD_UPLOAD_LIMIT = int(os.getenv("DISCORD_UPLOAD_LIMIT", str(8 * 1024 * 1024)))
+    SNAPRAID_PROGRESS_INTERVAL = float(os.getenv("SNAPRAID_PROGRESS_INTERVAL", "10"))
+    OUTPUT_ATTACHMENT_THRESHOLD = int(os.getenv("OUTPUT_ATTACHMENT_THRESHOLD", str(256 * 1024)))
+    OUTPUT_PAGINATOR_TIMEOUT = float(os.getenv("OUTPUT_PAGINATOR_TIMEOUT", "900"))
+    
     # Misc
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     
@@ -3,15 +3,95 @@ from discord.ext import commands
 from discord.commands import SlashCommandGroup, Option
 from discord.ui import View, Button
 from config import settings
-from services.docker_client import DockerClient
+from services.docker_client import DockerClient, ContainerFilter
+from services.container_inventory import container_inventory
 from services.confirmations import confirmation_manager
 from services.server_manager import server_manager
+from services.metrics_store import metrics_store
+from services.resource_scheduler import resource_scheduler, DOCKER_CONTAINERS
+from services.output_delivery import OutputSpool, spool_stream, deliver_output, format_code_block
+from services.log_follow import log_follower
+from services.filesystem_stats import format_bytes
+import time
+
+def format_bulk_result(result, verb: str, server) -> str:
+    """Format the outcome of a bulk pause/resume for Discord"""
+    if result.listing_failed:
+        return f"Failed to list containers on {server.display_name}."
+
+    message = f"Success: {verb} {result.count} containers on {server.display_name}."
+    if result.failed:
+        failures = "\n".join(f"- {name}: {error}" for name, error in result.failed.items())
+        if len(failures) > 1500:
+            failures = failures[:1500] + "\n... (truncated)"
+        message += f"\nFailed for {len(result.failed)} containers:\n{failures}"
+    return message
+
+
+def format_container_list(names, limit: int = 15) -> str:
+    """Format container names for a confirmation prompt"""
+    shown = ", ".join(f"`{name}`" for name in names[:limit])
+    if len(names) > limit:
+        shown += f" and {len(names) - limit} more"
+    return f"{len(names)} container{'s' if len(names) != 1 else ''} ({shown})"
+
+
+# Rank of container states when sorting by problems first
+_STATE_RANK = {"dead": 0, "restarting": 0, "exited": 1, "created": 2, "paused": 2, "running": 3}
+
+OVERVIEW_SORTS = ["problems", "cpu", "memory", "restarts", "name"]
+
+
+def _sort_overview(containers, sort: str):
+    """Sort container summaries for display"""
+    if sort == "cpu":
+        return sorted(containers, key=lambda c: (-(c.cpu_percent or 0.0), c.name))
+    if sort == "memory":
+        return sorted(containers, key=lambda c: (-(c.memory_bytes or 0), c.name))
+    if sort == "restarts":
+        return sorted(containers, key=lambda c: (-c.restarts, c.name))
+    if sort == "name":
+        return sorted(containers, key=lambda c: c.name)
+    return sorted(containers, key=lambda c: (
+        0 if c.health == "unhealthy" else _STATE_RANK.get(c.state, 1),
+        -c.restarts,
+        c.name
+    ))
+
+
+def format_overview(containers, sort: str):
+    """Format container summaries as a summary line and a table spool"""
+    counts = {}
+    for container in containers:
+        counts[container.state] = counts.get(container.state, 0) + 1
+    unhealthy = sum(1 for container in containers if container.health == "unhealthy")
+    summary = ", ".join(f"{count} {state}" for state, count in sorted(counts.items()))
+    if unhealthy:
+        summary += f", {unhealthy} unhealthy"
+
+    spool = OutputSpool()
+    spool.write_line(f"{'NAME':<24} {'STATE':<10} {'HEALTH':<9} {'CPU':>6} {'MEMORY':>10} {'RST':>4}")
+    for container in _sort_overview(containers, sort):
+        cpu = f"{container.cpu_percent:.1f}%" if container.cpu_percent is not None else "-"
+        memory = format_bytes(container.memory_bytes) if container.memory_bytes is not None else "-"
+        spool.write_line(
+            f"{container.name[:24]:<24} {container.state[:10]:<10} {(container.health or '-')[:9]:<9} "
+            f"{cpu:>6} {memory:>10} {container.restarts:>4}"
+        )
+    return summary or "no containers", spool
+
 
 class ConfirmationView(View):
-    def __init__(self, token: str, action_type: str):
-        super().__init__(timeout=120)
+    def __init__(self, token: str, action_type: str, timeout: float = settings.CONFIRMATION_TTL):
+        super().__init__(timeout=timeout)
         self.token = token
         self.action_type = action_type
+        # Per-token custom IDs let a restarted bot route clicks to restored views
+        self.confirm_callback.custom_id = f"confirm_action:{token}"
+        self.cancel_callback.custom_id = f"cancel_action:{token}"
+
+    async def on_timeout(self):
+        confirmation_manager.discard(self.token)
 
     @discord.ui.button(label="Confirm", style=discord.ButtonStyle.danger, custom_id="confirm_action")
     async def confirm_callback(self, button, interaction):
@@ -25,26 +105,91 @@ class ConfirmationView(View):
              await interaction.response.send_message("You cannot confirm this action.", ephemeral=True)
              return
 
-        await interaction.response.defer() # Acknowledge interaction
-
         # Execute action based on type
         server_name = action.get("server_name")
         server = server_manager.get_server(server_name)
         
         if not server:
-            await interaction.edit_original_response(content=f"Server '{server_name}' not found.", view=None)
+            await interaction.response.edit_message(content=f"Server '{server_name}' not found.", view=None)
             return
         
+        if self.action_type not in ("docker_pause_all", "docker_resume_all"):
+             await interaction.response.edit_message(content="Unknown action.", view=None)
+             return
+
+        # The interaction token expires after 15 minutes, which a queued action can outlast,
+        # so progress and the result are posted to the channel instead
+        await interaction.response.edit_message(
+            content=f"{self.action_type.replace('_', ' ')} confirmed on {server.display_name}. Progress is posted in this channel.",
+            view=None
+        )
+
         docker_client = DockerClient(server)
+        verb = "Paused" if self.action_type == "docker_pause_all" else "Resumed"
+        title = f"**Docker {self.action_type[len('docker_'):].replace('_', ' ')} on {server.display_name}**"
+
+        # Bulk pause/resume on one server run one at a time, in request order
+        reservation = resource_scheduler.reserve(
+            server.name, [DOCKER_CONTAINERS], self.action_type.replace("_", " "), user_id=interaction.user.id
+        )
+        queue_view = QueuedActionView(reservation)
+        message = await interaction.channel.send(f"{title} - starting", view=queue_view)
 
-        if self.action_type == "docker_pause_all":
-            count = docker_client.pause_all()
-            await interaction.edit_original_response(content=f"Success: Paused {count} containers on {server.display_name}.", view=None)
-        elif self.action_type == "docker_resume_all":
-            count = docker_client.resume_all()
-            await interaction.edit_original_response(content=f"Success: Resumed {count} containers on {server.display_name}.", view=None)
-        else:
-             await interaction.edit_original_response(content="Unknown action.", view=None)
+        async def show_queue_position(position: int):
+            try:
+                await message.edit(content=f"{title} - ⏳ queued ({resource_scheduler.describe_blockers(reservation)})")
+            except discord.HTTPException as e:
+                print(f"Failed to update queued action message: {e}")
+
+        started = time.monotonic()
+        try:
+            if not await resource_scheduler.wait(reservation, show_queue_position, max_wait=settings.QUEUE_MAX_WAIT):
+                if reservation.timed_out:
+                    reason = f"gave up after {int(settings.QUEUE_MAX_WAIT // 60)} minutes in the queue"
+                else:
+                    reason = f"withdrawn by {queue_view.withdrawn_by}"
+                await message.edit(content=f"{title} - 🛑 {reason}", view=None)
+                return
+
+            await message.edit(content=f"{title} - running", view=None)
+            started = time.monotonic()
+            include = ContainerFilter.from_expression(action.get("filter"))
+            if self.action_type == "docker_pause_all":
+                result = await docker_client.pause_all(include)
+            else:
+                result = await docker_client.resume_all(include)
+        except Exception as e:
+            # Some containers may already have changed state before the failure
+            container_inventory.invalidate(server)
+            metrics_store.record_command(
+                server.name,
+                self.action_type.replace("_", " "),
+                1,
+                time.monotonic() - started,
+                interaction.user.id,
+                str(e)
+            )
+            try:
+                await message.edit(content=f"{title} - ❌ failed: {e}", view=None)
+            except discord.HTTPException as edit_error:
+                print(f"Failed to post bulk action result: {edit_error}")
+            return
+        finally:
+            resource_scheduler.release(reservation)
+
+        container_inventory.invalidate(server)
+        metrics_store.record_command(
+            server.name,
+            self.action_type.replace("_", " "),
+            0 if not result.failed and not result.listing_failed else 1,
+            time.monotonic() - started,
+            interaction.user.id,
+            f"{result.count} succeeded, {len(result.failed)} failed"
+        )
+        try:
+            await message.edit(content=format_bulk_result(result, verb, server), view=None)
+        except discord.HTTPException as e:
+            print(f"Failed to post bulk action result: {e}")
 
     @discord.ui.button(label="Cancel", style=discord.ButtonStyle.secondary, custom_id="cancel_action")
     async def cancel_callback(self, button, interaction):
@@ -52,10 +197,67 @@ class ConfirmationView(View):
         await interaction.response.edit_message(content="Action cancelled.", view=None)
 
 
+class QueuedActionView(View):
+    """Withdraw button attached to a queued bulk action's message"""
+
+    def __init__(self, reservation):
+        super().__init__(timeout=None)
+        self.reservation = reservation
+        self.withdrawn_by = None
+
+    @discord.ui.button(label="Withdraw", style=discord.ButtonStyle.secondary)
+    async def withdraw_callback(self, button, interaction):
+        if interaction.user.id != self.reservation.user_id and interaction.user.id not in settings.DISCORD_ADMIN_USER_IDS:
+            await interaction.response.send_message("You cannot withdraw this action.", ephemeral=True)
+            return
+        if self.reservation.granted:
+            await interaction.response.send_message("The action is already running.", ephemeral=True)
+            return
+        self.withdrawn_by = str(interaction.user)
+        resource_scheduler.release(self.reservation)
+        await interaction.response.defer()
+
+
+class LogFollowView(View):
+    """Stop button attached to a live log session's starter message"""
+
+    def __init__(self, session):
+        super().__init__(timeout=None)
+        self.session = session
+
+    @discord.ui.button(label="Stop", style=discord.ButtonStyle.secondary)
+    async def stop_callback(self, button, interaction):
+        if interaction.user.id != self.session.user_id and interaction.user.id not in settings.DISCORD_ADMIN_USER_IDS:
+            await interaction.response.send_message("You cannot stop this log session.", ephemeral=True)
+            return
+        self.session.stop(f"stopped by {interaction.user}")
+        button.disabled = True
+        button.label = "Stopping..."
+        await interaction.response.edit_message(view=self)
+
+
+def _format_follow_header(session, server, status: str) -> str:
+    """Render the starter message of a live log session"""
+    header = f"📜 **Logs for {session.container} on {server.display_name}**: {status}"
+    if session.pattern:
+        header += f"\nFilter: `{session.pattern.pattern}`"
+    if session.lines_seen:
+        header += f"\n{session.lines_matched}/{session.lines_seen} lines matched"
+        if session.lines_skipped:
+            header += f", {session.lines_skipped} skipped while output was too fast"
+    return header
+
+
 class DockerControl(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Restore confirmation prompts that were still pending before a restart
+        for token, action in confirmation_manager.pending_actions(["docker_pause_all", "docker_resume_all"]):
+            self.bot.add_view(ConfirmationView(token, action["action_type"], timeout=None))
+
     docker = SlashCommandGroup("docker", "Docker container management", guild_ids=[settings.DISCORD_GUILD_ID])
 
     def is_admin(self, ctx):
@@ -78,18 +280,15 @@ class DockerControl(commands.Cog):
         if not server:
             return []
         
-        try:
-            docker_client = DockerClient(server)
-            containers = docker_client.list_containers()
-            return [c for c in containers if c.lower().startswith(ctx.value.lower())]
-        except:
-            return []
+        containers = await container_inventory.get_names(server)
+        return [c for c in containers if c.lower().startswith(ctx.value.lower())][:25]
 
-    @docker.command(description="Pause all Docker containers")
+    @docker.command(description="Pause running Docker containers, optionally filtered")
     async def pause_all(
         self,
         ctx,
-        server: Option(str, "Server name", autocomplete=get_server_names)
+        server: Option(str, "Server name", autocomplete=get_server_names),
+        filter: Option(str, "Only running containers matching, e.g. project=media image=lscr.io/* plex*", required=False, default=None)
     ):
         if not self.is_admin(ctx):
             await ctx.respond("You are not authorized to use this command.", ephemeral=True)
@@ -101,20 +300,40 @@ class DockerControl(commands.Cog):
             await ctx.respond(error_msg, ephemeral=True)
             return
 
+        try:
+            include = ContainerFilter.from_expression(filter)
+        except ValueError as e:
+            await ctx.respond(f"❌ {e}", ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
         server_config = server_manager.get_server(server)
-        token = confirmation_manager.create(ctx.author.id, "docker_pause_all", server_name=server)
+        try:
+            names = await DockerClient(server_config).list_matching("running", include)
+        except ValueError as e:
+            await ctx.respond(f"❌ Invalid docker.exclude in servers.json: {e}", ephemeral=True)
+            return
+        if names is None:
+            await ctx.respond(f"Failed to list containers on {server_config.display_name}.", ephemeral=True)
+            return
+        if not names:
+            await ctx.respond(f"No running containers match on {server_config.display_name}.", ephemeral=True)
+            return
+
+        token = confirmation_manager.create(ctx.author.id, "docker_pause_all", server_name=server, filter=include.describe())
         view = ConfirmationView(token, "docker_pause_all")
         await ctx.respond(
-            f"This will pause all running Docker containers on **{server_config.display_name}**. Confirm?",
+            f"This will pause {format_container_list(names)} on **{server_config.display_name}**. Confirm?",
             view=view,
             ephemeral=True
         )
 
-    @docker.command(description="Resume all Docker containers")
+    @docker.command(description="Resume paused Docker containers, optionally filtered")
     async def resume_all(
         self,
         ctx,
-        server: Option(str, "Server name", autocomplete=get_server_names)
+        server: Option(str, "Server name", autocomplete=get_server_names),
+        filter: Option(str, "Only paused containers matching, e.g. project=media image=lscr.io/* plex*", required=False, default=None)
     ):
         if not self.is_admin(ctx):
             await ctx.respond("You are not authorized to use this command.", ephemeral=True)
@@ -126,11 +345,30 @@ class DockerControl(commands.Cog):
             await ctx.respond(error_msg, ephemeral=True)
             return
 
+        try:
+            include = ContainerFilter.from_expression(filter)
+        except ValueError as e:
+            await ctx.respond(f"❌ {e}", ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
         server_config = server_manager.get_server(server)
-        token = confirmation_manager.create(ctx.author.id, "docker_resume_all", server_name=server)
+        try:
+            names = await DockerClient(server_config).list_matching("paused", include)
+        except ValueError as e:
+            await ctx.respond(f"❌ Invalid docker.exclude in servers.json: {e}", ephemeral=True)
+            return
+        if names is None:
+            await ctx.respond(f"Failed to list containers on {server_config.display_name}.", ephemeral=True)
+            return
+        if not names:
+            await ctx.respond(f"No paused containers match on {server_config.display_name}.", ephemeral=True)
+            return
+
+        token = confirmation_manager.create(ctx.author.id, "docker_resume_all", server_name=server, filter=include.describe())
         view = ConfirmationView(token, "docker_resume_all")
         await ctx.respond(
-            f"This will resume all paused Docker containers on **{server_config.display_name}**. Confirm?",
+            f"This will resume {format_container_list(names)} on **{server_config.display_name}**. Confirm?",
             view=view,
             ephemeral=True
         )
@@ -156,7 +394,8 @@ class DockerControl(commands.Cog):
         
         server_config = server_manager.get_server(server)
         docker_client = DockerClient(server_config)
-        result = docker_client.restart_container(container)
+        result = await docker_client.restart_container(container)
+        container_inventory.invalidate(server_config)
         await ctx.respond(result, ephemeral=True)
 
     @docker.command(description="Get logs for a container")
@@ -165,7 +404,7 @@ class DockerControl(commands.Cog):
         ctx,
         server: Option(str, "Server name", autocomplete=get_server_names),
         container: Option(str, "Container name", autocomplete=get_container_names),
-        tail: Option(int, "Number of lines", default=20, required=False)
+        tail: Option(int, "Number of lines", default=20, required=False, min_value=1)
     ):
         if not self.is_admin(ctx):
             await ctx.respond("You are not authorized to use this command.", ephemeral=True)
@@ -181,15 +420,114 @@ class DockerControl(commands.Cog):
         
         server_config = server_manager.get_server(server)
         docker_client = DockerClient(server_config)
-        logs = docker_client.get_container_logs(container, tail)
+        spool = OutputSpool()
+        try:
+            exit_code = await spool_stream(docker_client.stream_container_logs(container, tail), spool)
+        except Exception as e:
+            spool.close()
+            await ctx.respond(f"Failed to get logs for {container}: {e}", ephemeral=True)
+            return
+        
+        if exit_code != 0:
+            error = spool.page(spool.page_count - 1).strip()
+            spool.close()
+            if "No such container" in error:
+                await ctx.respond(f"Container {container} not found.", ephemeral=True)
+            else:
+                await ctx.respond(f"Failed to get logs for {container}: {error[-500:]}", ephemeral=True)
+            return
+        
+        await deliver_output(
+            ctx,
+            spool,
+            f"**Logs for {container} on {server_config.display_name}**",
+            filename=f"{container}-{server_config.name}.log",
+            start_at_end=True,
+            empty_message="No logs found or empty."
+        )
+
+    @docker.command(description="Show state, health, restarts and resource usage of all containers")
+    async def overview(
+        self,
+        ctx,
+        server: Option(str, "Server name", autocomplete=get_server_names),
+        sort: Option(str, "Sort order", choices=OVERVIEW_SORTS, required=False, default="problems"),
+        refresh: Option(bool, "Ignore the cached overview", required=False, default=False)
+    ):
+        if not self.is_admin(ctx):
+            await ctx.respond("You are not authorized to use this command.", ephemeral=True)
+            return
+        
+        # Validate server and feature
+        is_valid, error_msg = server_manager.validate_server_feature(server, "docker")
+        if not is_valid:
+            await ctx.respond(error_msg, ephemeral=True)
+            return
+        
+        await ctx.defer(ephemeral=True)
         
-        if len(logs) > 1900:
-            logs = logs[-1900:] + "\n... (truncated)"
+        server_config = server_manager.get_server(server)
+        try:
+            containers = await container_inventory.get_overview(server_config, refresh)
+        except Exception as e:
+            await ctx.respond(f"❌ {e}", ephemeral=True)
+            return
         
-        if not logs.strip():
-            logs = "No logs found or empty."
+        summary, spool = format_overview(containers, sort)
+        await deliver_output(
+            ctx,
+            spool,
+            f"**Containers on {server_config.display_name}**: {summary}",
+            filename=f"containers-{server_config.name}.txt"
+        )
 
-        await ctx.respond(f"**Logs for {container} on {server_config.display_name}**\n```\n{logs}\n```", ephemeral=True)
+    @docker.command(description="Follow a container's logs live in a thread")
+    async def follow(
+        self,
+        ctx,
+        server: Option(str, "Server name", autocomplete=get_server_names),
+        container: Option(str, "Container name", autocomplete=get_container_names),
+        filter: Option(str, "Only show lines matching this regular expression", required=False, default=None),
+        since: Option(str, "Start with logs since (e.g. 30s, 10m, 2h)", required=False, default="1m"),
+        minutes: Option(int, "Stop following after this many minutes", required=False, default=10, min_value=1, max_value=60)
+    ):
+        if not self.is_admin(ctx):
+            await ctx.respond("You are not authorized to use this command.", ephemeral=True)
+            return
+        
+        # Validate server and feature
+        is_valid, error_msg = server_manager.validate_server_feature(server, "docker")
+        if not is_valid:
+            await ctx.respond(error_msg, ephemeral=True)
+            return
+        
+        server_config = server_manager.get_server(server)
+        try:
+            session = log_follower.open_session(server_config, container, since, minutes * 60, filter, ctx.author.id)
+        except (ValueError, RuntimeError) as e:
+            await ctx.respond(f"❌ {e}", ephemeral=True)
+            return
+        
+        await ctx.defer(ephemeral=True)
+        try:
+            view = LogFollowView(session)
+            message = await ctx.channel.send(_format_follow_header(session, server_config, "following"), view=view)
+            thread = await message.create_thread(name=f"{container} logs"[:100], auto_archive_duration=60)
+        except discord.HTTPException as e:
+            log_follower.close(session)
+            await ctx.respond(f"❌ Failed to start a log thread: {e}", ephemeral=True)
+            return
+        await ctx.respond(f"Following logs of {container} in {thread.mention} for up to {minutes} minutes.", ephemeral=True)
+        
+        async def post_batch(text: str):
+            await thread.send(format_code_block(text))
+        
+        await log_follower.run(server_config, session, post_batch)
+        try:
+            await message.edit(content=_format_follow_header(session, server_config, f"ended ({session.stop_reason})"), view=None)
+            await thread.send(f"Log session ended: {session.stop_reason}.")
+        except discord.HTTPException as e:
+            print(f"Failed to close log session message: {e}")
 
 def setup(bot):
     bot.add_cog(DockerControl(bot))
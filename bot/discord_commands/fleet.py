@@ -0,0 +1,126 @@
+import discord
+from discord.ext import commands
+from discord.commands import SlashCommandGroup, Option
+from config import settings
+from services.fleet import fan_out
+from services.filesystem_stats import format_bytes, build_df_command, parse_df_rows
+from services.server_manager import server_manager
+from services.snapraid_reports import snapraid_reports
+from services.ssh_executor import ssh_executor
+
+# Discord allows at most 25 fields per embed
+MAX_EMBED_FIELDS = 25
+
+
+async def _uptime(server):
+    """Get uptime and load average"""
+    stdout, stderr, exit_code = await ssh_executor.run(server, "uptime -p; cat /proc/loadavg", timeout=None)
+    if exit_code != 0:
+        raise RuntimeError(stderr.strip() or f"exit code {exit_code}")
+    lines = stdout.strip().splitlines()
+    load = " ".join(lines[1].split()[:3]) if len(lines) > 1 else "?"
+    return f"{lines[0] if lines else '?'}\nLoad: {load}"
+
+
+async def _disk(server):
+    """Get df usage for the server's configured paths (or / without filesystem config)"""
+    fs_config = server.get_filesystem_config() or {}
+    paths = fs_config.get("paths") or {"/": "/"}
+    stdout, stderr, exit_code = await ssh_executor.run(server, build_df_command(paths), timeout=None)
+    filesystems, errors = parse_df_rows(stdout)
+    if not filesystems and not errors:
+        raise RuntimeError(stderr.strip() or f"exit code {exit_code}")
+
+    lines = []
+    for key in paths:
+        info = filesystems.get(key)
+        if info is None:
+            lines.append(f"`{key}`: ❌ {errors.get(key, 'no output from df')[:100]}")
+            continue
+        percent = info.used_bytes / info.total_bytes * 100 if info.total_bytes else 0
+        lines.append(f"`{key}`: {percent:.0f}% used, {format_bytes(info.available_bytes)} free")
+    return "\n".join(lines)
+
+
+async def _snapraid(server):
+    """Summarize the (cached) snapraid status"""
+    report = await snapraid_reports.get_status(server)
+    lines = [
+        "✅ in sync" if report.synced else f"⚠️ {report.not_synced_percent}% not synced",
+        "✅ no errors" if not report.errors else f"❌ {report.errors} errors",
+    ]
+    if report.oldest_scrub_days is not None:
+        lines.append(f"Oldest scrub {report.oldest_scrub_days}d ago")
+    return "\n".join(lines)
+
+
+class Fleet(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    fleet = SlashCommandGroup("fleet", "Run checks across several servers at once", guild_ids=[settings.DISCORD_GUILD_ID])
+
+    async def get_targets(self, ctx: discord.AutocompleteContext):
+        """Autocomplete for fan-out targets"""
+        choices = server_manager.get_target_choices()
+        return [c for c in choices if c.lower().startswith(ctx.value.lower())][:25]
+
+    async def get_snapraid_targets(self, ctx: discord.AutocompleteContext):
+        """Autocomplete for fan-out targets with SnapRAID"""
+        choices = server_manager.get_target_choices("snapraid")
+        return [c for c in choices if c.lower().startswith(ctx.value.lower())][:25]
+
+    async def _run(self, ctx, title: str, target: str, operation, feature: str = None):
+        """Fan an operation out to the resolved targets and reply with one embed"""
+        servers, error_msg = server_manager.resolve_targets(target, feature)
+        if error_msg:
+            await ctx.respond(error_msg, ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
+        results = await fan_out(servers, operation)
+
+        ok_count = sum(1 for r in results if r.ok)
+        embed = discord.Embed(
+            title=f"{title} - {target}",
+            description=f"{ok_count}/{len(results)} servers responded",
+            color=discord.Color.green() if ok_count == len(results) else discord.Color.orange()
+        )
+        for result in results[:MAX_EMBED_FIELDS]:
+            value = str(result.value) if result.ok else f"❌ {result.error}"
+            embed.add_field(
+                name=f"{result.server.display_name} ({result.latency * 1000:.0f}ms)",
+                value=value[:1024] or "(no output)",
+                inline=False
+            )
+        if len(results) > MAX_EMBED_FIELDS:
+            embed.set_footer(text=f"{len(results) - MAX_EMBED_FIELDS} more servers not shown")
+
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    @fleet.command(description="Show uptime and load across servers")
+    async def uptime(
+        self,
+        ctx,
+        target: Option(str, "all, @feature or a server name", autocomplete=get_targets, default="all")
+    ):
+        await self._run(ctx, "Uptime", target, _uptime)
+
+    @fleet.command(description="Show disk usage across servers")
+    async def disk(
+        self,
+        ctx,
+        target: Option(str, "all, @feature or a server name", autocomplete=get_targets, default="all")
+    ):
+        await self._run(ctx, "Disk Usage", target, _disk)
+
+    @fleet.command(description="Show SnapRAID status across servers")
+    async def snapraid(
+        self,
+        ctx,
+        target: Option(str, "all, @feature or a server name", autocomplete=get_snapraid_targets, default="all")
+    ):
+        await self._run(ctx, "SnapRAID Status", target, _snapraid, feature="snapraid")
+
+def setup(bot):
+    bot.add_cog(Fleet(bot))
@@ -0,0 +1,163 @@
+import discord
+from discord.ext import commands
+from discord.commands import SlashCommandGroup, Option
+from config import settings
+from services.fleet import fan_out
+from services.output_delivery import OutputSpool, deliver_output
+from services.remote_jobs import remote_jobs, RUNNING, FINISHED
+from services.resource_scheduler import resource_scheduler
+from services.server_manager import server_manager
+
+# Discord allows at most 25 fields per embed
+MAX_EMBED_FIELDS = 25
+
+STATE_ICONS = {
+    "running": "⏳",
+    "finished": "✅",
+    "failed": "❌",
+    "cancelled": "🛑",
+    "lost": "❓",
+}
+
+
+def format_job(job) -> str:
+    """Format a job as a single line"""
+    line = f"{STATE_ICONS.get(job.state, '')} `{job.job_id}` {job.label or job.command[:40]} - {job.state}"
+    if job.exit_code is not None and job.state != FINISHED:
+        line += f" ({job.exit_code})"
+    if job.started:
+        line += f", started <t:{int(job.started)}:R>"
+    return line
+
+
+class Jobs(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    jobs = SlashCommandGroup("jobs", "Detached jobs running on servers", guild_ids=[settings.DISCORD_GUILD_ID])
+
+    def is_admin(self, ctx):
+        return ctx.author.id in settings.DISCORD_ADMIN_USER_IDS
+
+    async def get_targets(self, ctx: discord.AutocompleteContext):
+        """Autocomplete for fan-out targets"""
+        choices = server_manager.get_target_choices()
+        return [c for c in choices if c.lower().startswith(ctx.value.lower())][:25]
+
+    async def get_server_names(self, ctx: discord.AutocompleteContext):
+        """Autocomplete for all servers"""
+        server_names = server_manager.get_server_names()
+        return [name for name in server_names if name.lower().startswith(ctx.value.lower())]
+
+    async def get_job_ids(self, ctx: discord.AutocompleteContext):
+        """Autocomplete for jobs last listed on the selected server"""
+        server_name = ctx.options.get("server")
+        if not server_name:
+            return []
+        job_ids = [job.job_id for job in remote_jobs.get_cached_jobs(server_name)]
+        return [job_id for job_id in job_ids if job_id.startswith(ctx.value)][:25]
+
+    @jobs.command(description="List detached jobs across servers")
+    async def list(
+        self,
+        ctx,
+        target: Option(str, "all, @feature or a server name", autocomplete=get_targets, default="all"),
+        running_only: Option(bool, "Only show running jobs", required=False, default=False)
+    ):
+        servers, error_msg = server_manager.resolve_targets(target)
+        if error_msg:
+            await ctx.respond(error_msg, ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
+        results = await fan_out(servers, remote_jobs.list_jobs)
+
+        embed = discord.Embed(title=f"Jobs - {target}", color=discord.Color.blue())
+        for result in results[:MAX_EMBED_FIELDS]:
+            if not result.ok:
+                value = f"❌ {result.error}"
+            else:
+                jobs = [job for job in result.value if job.state == RUNNING or not running_only]
+                value = "\n".join(format_job(job) for job in jobs[:10]) or "No jobs"
+                if len(jobs) > 10:
+                    value += f"\n... and {len(jobs) - 10} more"
+            embed.add_field(name=result.server.display_name, value=value[:1024], inline=False)
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    @jobs.command(description="Show operations holding or queued for server resources")
+    async def queue(self, ctx):
+        queues = resource_scheduler.snapshot()
+        if not queues:
+            await ctx.respond("No operations are running or queued.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="Operation Queue", color=discord.Color.blue())
+        for server_name, reservations in list(queues.items())[:MAX_EMBED_FIELDS]:
+            server = server_manager.get_server(server_name)
+            lines = []
+            for reservation in reservations:
+                if reservation.granted:
+                    line = f"▶️ {reservation.label}, running since <t:{int(reservation.granted_at)}:R>"
+                else:
+                    line = f"⏳ {reservation.label}, queued at position {resource_scheduler.position(reservation)}"
+                if reservation.user_id:
+                    line += f" (<@{reservation.user_id}>)"
+                lines.append(line)
+            embed.add_field(name=server.display_name if server else server_name, value="\n".join(lines)[:1024], inline=False)
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    @jobs.command(description="Show the end of a job's log")
+    async def tail(
+        self,
+        ctx,
+        server: Option(str, "Server name", autocomplete=get_server_names),
+        job_id: Option(str, "Job ID", autocomplete=get_job_ids),
+        lines: Option(int, "Number of lines", required=False, default=20, min_value=1, max_value=5000)
+    ):
+        server_config = server_manager.get_server(server)
+        if not server_config:
+            await ctx.respond(f"Server '{server}' not found.", ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
+        try:
+            output = await remote_jobs.tail(server_config, job_id, lines)
+        except Exception as e:
+            await ctx.respond(f"❌ Error reading job log: {e}", ephemeral=True)
+            return
+
+        spool = OutputSpool()
+        spool.write(output)
+        await deliver_output(
+            ctx,
+            spool,
+            f"**Job `{job_id}` on {server_config.display_name}**",
+            filename=f"job-{job_id}.log",
+            start_at_end=True
+        )
+
+    @jobs.command(description="Cancel a running job")
+    async def cancel(
+        self,
+        ctx,
+        server: Option(str, "Server name", autocomplete=get_server_names),
+        job_id: Option(str, "Job ID", autocomplete=get_job_ids),
+        force: Option(bool, "Terminate instead of interrupting", required=False, default=False)
+    ):
+        if not self.is_admin(ctx):
+            await ctx.respond("You are not authorized to use this command.", ephemeral=True)
+            return
+
+        server_config = server_manager.get_server(server)
+        if not server_config:
+            await ctx.respond(f"Server '{server}' not found.", ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
+        if await remote_jobs.cancel(server_config, job_id, force=force):
+            await ctx.respond(f"🛑 Sent {'SIGTERM' if force else 'SIGINT'} to job `{job_id}` on {server_config.display_name}.", ephemeral=True)
+        else:
+            await ctx.respond(f"❌ Could not signal job `{job_id}` on {server_config.display_name}.", ephemeral=True)
+
+def setup(bot):
+    bot.add_cog(Jobs(bot))
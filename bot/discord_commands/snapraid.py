@@ -3,16 +3,374 @@ from discord.ext import commands
 from discord.commands import SlashCommandGroup, Option
 from discord.ui import View, Button
 from config import settings
-from services.snapraid_runner import run_snapraid_command
+from services.snapraid_runner import start_snapraid_job, parse_progress_line
+from services.snapraid_reports import snapraid_reports
+from services.filesystem_stats import format_age
+from services.remote_jobs import remote_jobs, FINISHED, FAILED, CANCELLED
+from services.resource_scheduler import resource_scheduler, SNAPRAID_ARRAY, DOCKER_CONTAINERS
+from services.docker_client import DockerClient, ContainerFilter
+from services.container_inventory import container_inventory
 from services.confirmations import confirmation_manager
 from services.server_manager import server_manager
+from services.metrics_store import metrics_store
+from services.metrics import metrics_collector
+from collections import deque
+from typing import Dict, List, Optional
 import asyncio
+import tempfile
+import time
+
+class SnapRAIDProgressView(View):
+    """Cancel button attached to a queued or running SnapRAID job's progress message"""
+
+    def __init__(self, server, reservation):
+        super().__init__(timeout=None)
+        self.server = server
+        self.reservation = reservation
+        self.job = None
+        self.cancelled_by = None
+
+    @discord.ui.button(label="Cancel", style=discord.ButtonStyle.danger)
+    async def cancel_callback(self, button, interaction):
+        if interaction.user.id not in settings.DISCORD_ADMIN_USER_IDS:
+            await interaction.response.send_message("You are not authorized to cancel this command.", ephemeral=True)
+            return
+
+        self.cancelled_by = interaction.user
+        button.disabled = True
+        button.label = "Cancelling..."
+        await interaction.response.edit_message(view=self)
+
+        if self.job is None:
+            if not self.reservation.granted:
+                # Still queued: withdraw from the queue
+                resource_scheduler.release(self.reservation)
+            # Otherwise the run sees cancelled_by before or right after it starts the job
+            return
+
+        await stop_job(self.server, self.job)
+
+
+async def stop_job(server, job) -> None:
+    """Interrupt a SnapRAID job, terminating it if it is still running 30s later"""
+    # SIGINT lets SnapRAID save its state
+    await remote_jobs.cancel(server, job.job_id)
+    await asyncio.sleep(30)
+    job, _, _ = await remote_jobs.poll(server, job, limit=0)
+    if not job.done:
+        await remote_jobs.cancel(server, job.job_id, force=True)
+
+
+def _format_elapsed(seconds: float) -> str:
+    """Format a duration as h/m/s"""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    return f"{minutes}m {secs:02d}s"
+
+
+def _render_progress(action_type: str, server, progress, recent_lines, started: float, status: str) -> str:
+    """Render the progress message for a SnapRAID run"""
+    lines = [f"**SnapRAID {action_type} on {server.display_name}** - {status} ({_format_elapsed(time.monotonic() - started)})"]
+    if progress:
+        filled = progress.percent // 5
+        lines.append(f"`{'█' * filled}{'░' * (20 - filled)}` {progress.percent}%")
+        details = [f"{progress.processed_mb:,} MB processed"]
+        if progress.speed_mb_s is not None:
+            details.append(f"{progress.speed_mb_s} MB/s")
+        if progress.cpu_percent is not None:
+            details.append(f"CPU {progress.cpu_percent}%")
+        details.append(f"ETA {progress.format_eta()}")
+        lines.append(" | ".join(details))
+    if recent_lines:
+        recent = "\n".join(recent_lines)[-900:]
+        lines.append(f"```\n{recent}\n```")
+    return "\n".join(lines)
+
+
+async def run_with_progress(interaction, server, action_type: str, pause_filter=None, timeout: Optional[float] = None) -> None:
+    """
+    Run a long SnapRAID command as a detached job, keeping a single progress message up to date
+
+    The run first queues for the server's SnapRAID array, so overlapping
+    sync/scrub/fix runs wait their turn instead of thrashing the disks.
+    The message is posted to the channel rather than as an interaction
+    followup, because interaction tokens expire long before a sync finishes.
+    The job keeps running if the bot restarts; its completion is then
+    reported to the channel by the job manager. The full output is attached
+    to the message when the command ends.
+
+    With a pause filter the run is a maintenance pipeline: it also holds the
+    server's containers, pauses the matching ones before the job and resumes
+    exactly those afterwards, even if the job fails, is cancelled or times out.
+
+    Args:
+        interaction: Interaction that confirmed the run
+        server: Server configuration
+        action_type: SnapRAID command (sync, scrub or fix)
+        pause_filter: Containers to pause around the job (None to pause nothing)
+        timeout: Seconds after which the job is stopped (None for no limit)
+    """
+    resources = [SNAPRAID_ARRAY] if pause_filter is None else [SNAPRAID_ARRAY, DOCKER_CONTAINERS]
+    title = action_type if pause_filter is None else f"maintenance {action_type}"
+    reservation = resource_scheduler.reserve(
+        server.name, resources, f"snapraid {title}", heavy=True, user_id=interaction.user.id
+    )
+    try:
+        await _run_reserved(interaction, server, action_type, title, reservation, pause_filter, timeout)
+    finally:
+        resource_scheduler.release(reservation)
+
+
+def _format_phases(phases: Dict[str, float]) -> str:
+    """Format phase durations, e.g. pause 12s, sync 1h 02m, resume 8s"""
+    return ", ".join(f"{phase} {_format_elapsed(seconds)}" for phase, seconds in phases.items())
+
+
+async def _run_reserved(interaction, server, action_type: str, title: str, reservation, pause_filter, timeout) -> None:
+    """Wait for the reservation, then pause containers if asked, run and follow the job and resume them"""
+    view = SnapRAIDProgressView(server, reservation)
+    queued_since = time.monotonic()
+    message = await interaction.channel.send(
+        _render_progress(title, server, None, [], queued_since, "starting"),
+        view=view
+    )
+
+    async def show_queue_position(position: int):
+        status = f"⏳ queued ({resource_scheduler.describe_blockers(reservation)})"
+        try:
+            await message.edit(content=_render_progress(title, server, None, [], queued_since, status))
+        except discord.HTTPException as e:
+            print(f"Failed to update SnapRAID queue message: {e}")
+
+    if not await resource_scheduler.wait(reservation, show_queue_position):
+        await message.edit(
+            content=_render_progress(title, server, None, [], queued_since, f"🛑 withdrawn by {view.cancelled_by}"),
+            view=None
+        )
+        return
+
+    started = time.monotonic()
+    state = {"progress": None, "status": "starting", "timed_out": False, "partial": ""}
+    recent_lines = deque(maxlen=8)
+    phases: Dict[str, float] = {}
+    paused: List[str] = []
+    exit_code = None
+    job = None
+    docker_client = DockerClient(server)
+    log_file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+
+    async def update_message():
+        while True:
+            try:
+                await message.edit(content=_render_progress(
+                    title, server, state["progress"], recent_lines, started, state["status"]
+                ))
+            except discord.HTTPException as e:
+                print(f"Failed to update SnapRAID progress message: {e}")
+            await asyncio.sleep(settings.SNAPRAID_PROGRESS_INTERVAL)
+
+    def take_line(line: str):
+        progress = parse_progress_line(line)
+        if progress:
+            state["progress"] = progress
+        elif line.strip():
+            recent_lines.append(line)
+
+    async def on_output(text: str):
+        log_file.write(text.encode("utf-8"))
+        # A chunk can end mid-line (read limit or a \r progress rewrite); hold the tail for the next one
+        lines = (state["partial"] + text).splitlines(keepends=True)
+        state["partial"] = lines.pop() if lines and not lines[-1].endswith(("\r", "\n")) else ""
+        for line in lines:
+            take_line(line.rstrip("\r\n"))
+
+    async def enforce_timeout(job):
+        await asyncio.sleep(timeout)
+        state["timed_out"] = True
+        state["status"] = "⏱️ time limit reached, stopping"
+        await stop_job(server, job)
+
+    updater = asyncio.create_task(update_message())
+    try:
+        if pause_filter is not None:
+            state["status"] = "⏸️ pausing containers"
+            phase_started = time.monotonic()
+            result = await docker_client.pause_all(pause_filter)
+            phases["pause"] = time.monotonic() - phase_started
+            paused = result.succeeded
+            container_inventory.invalidate(server)
+            if result.listing_failed:
+                raise RuntimeError("could not list the containers to pause")
+            recent_lines.append(f"Paused {len(paused)} containers")
+            for name, error in result.failed.items():
+                recent_lines.append(f"Failed to pause {name}: {error}")
+
+        if view.cancelled_by:
+            state["status"] = f"🛑 cancelled by {view.cancelled_by}"
+        else:
+            job = await start_snapraid_job(
+                server, action_type, interaction.user.id, interaction.channel.id, paused_containers=paused
+            )
+            view.job = job
+            if view.cancelled_by:
+                asyncio.create_task(stop_job(server, job))
+            state["status"] = f"running (job `{job.job_id}`)"
+
+            watchdog = asyncio.create_task(enforce_timeout(job)) if timeout else None
+            phase_started = time.monotonic()
+            try:
+                job = await remote_jobs.follow(server, job, on_output, interval=settings.SNAPRAID_PROGRESS_INTERVAL)
+            finally:
+                if watchdog:
+                    watchdog.cancel()
+            take_line(state["partial"])
+            state["partial"] = ""
+            phases[action_type] = time.monotonic() - phase_started
+            exit_code = job.exit_code
+
+            if job.state == FINISHED:
+                state["status"] = "✅ finished"
+            elif job.state == CANCELLED and state["timed_out"]:
+                state["status"] = f"⏱️ stopped after the {_format_elapsed(timeout)} time limit"
+            elif job.state == CANCELLED:
+                state["status"] = f"🛑 cancelled by {view.cancelled_by or 'another user'}"
+            elif job.state == FAILED:
+                state["status"] = f"❌ failed (exit code {job.exit_code})"
+            else:
+                state["status"] = "❌ stopped without an exit code"
+    except asyncio.CancelledError:
+        # The bot is shutting down: leave a running job's containers paused for the reattached watcher to resume
+        if job is not None and not job.done:
+            paused = []
+        raise
+    except Exception as e:
+        state["status"] = f"❌ failed: {e}"
+    finally:
+        if paused:
+            outcome = state["status"]
+            state["status"] = "▶️ resuming containers"
+            phase_started = time.monotonic()
+            result = await docker_client.resume_containers(paused)
+            phases["resume"] = time.monotonic() - phase_started
+            container_inventory.invalidate(server)
+            if job is not None:
+                # Otherwise the job's .meta still asks a restarted bot to resume them
+                await remote_jobs.mark_resumed(server, job.job_id)
+            state["status"] = outcome
+            if result.failed:
+                state["status"] += f", ⚠️ {len(result.failed)} containers failed to resume"
+                for name, error in result.failed.items():
+                    recent_lines.append(f"Failed to resume {name}: {error}")
+        updater.cancel()
+
+    snapraid_reports.invalidate_status(server)
+    summary = state["status"]
+    if pause_filter is not None:
+        summary += f" ({_format_phases(phases)})"
+        # Phase durations go into the metrics history to help size the maintenance window
+        metrics_collector.publish(server.name, {
+            f"maintenance_{phase}_seconds": seconds for phase, seconds in phases.items()
+        })
+    metrics_store.record_command(
+        server.name,
+        f"snapraid {title}",
+        exit_code,
+        time.monotonic() - started,
+        interaction.user.id,
+        summary
+    )
+
+    # Keep the end of the log if it exceeds Discord's upload limit
+    size = log_file.tell()
+    log_file.seek(max(0, size - settings.DISCORD_UPLOAD_LIMIT))
+    log_name = f"snapraid-{action_type}-{server.name}-{time.strftime('%Y%m%d-%H%M%S')}.log"
+
+    content = _render_progress(title, server, state["progress"], recent_lines, started, state["status"])
+    if phases and pause_filter is not None:
+        content += f"\nPhases: {_format_phases(phases)}"
+    try:
+        if size:
+            await message.edit(content=content, file=discord.File(log_file, filename=log_name), view=None)
+        else:
+            await message.edit(content=content, view=None)
+    except discord.HTTPException as e:
+        print(f"Failed to post SnapRAID log: {e}")
+    finally:
+        log_file.close()
+
+
+def format_status_embed(server, report) -> discord.Embed:
+    """Render a parsed status report as a compact embed"""
+    healthy = report.errors == 0 and report.synced
+    embed = discord.Embed(
+        title=f"SnapRAID Status - {server.display_name}",
+        color=discord.Color.green() if healthy else discord.Color.red()
+    )
+    if report.sync_in_progress is not None:
+        sync = f"⚠️ interrupted sync at {report.sync_in_progress}%"
+    elif report.not_synced_percent:
+        sync = f"⚠️ {report.not_synced_percent}% not synced"
+    else:
+        sync = "✅ in sync"
+    embed.add_field(name="Sync", value=sync, inline=True)
+    embed.add_field(name="Errors", value="✅ none" if not report.errors else f"❌ {report.errors}", inline=True)
+    if report.oldest_scrub_days is not None:
+        embed.add_field(
+            name="Scrub",
+            value=f"oldest {report.oldest_scrub_days}d, median {report.median_scrub_days}d, "
+                  f"{report.not_scrubbed_percent}% not scrubbed",
+            inline=False
+        )
+    if report.disks:
+        lines = [
+            f"`{disk.name}` {disk.use_percent if disk.use_percent is not None else '?'}% used, "
+            f"{disk.free_gb if disk.free_gb is not None else '?'} GB free, {disk.files} files"
+            for disk in report.disks
+        ]
+        embed.add_field(name="Disks", value="\n".join(lines)[:1024], inline=False)
+    if report.warnings:
+        embed.add_field(name="Warnings", value="\n".join(report.warnings)[:1024], inline=False)
+    embed.set_footer(text=f"Checked {format_age(report.fetched_at)}")
+    return embed
+
+
+def format_smart_embed(server, report) -> discord.Embed:
+    """Render a parsed SMART report as a compact embed"""
+    worst = max((disk.fail_percent or 0 for disk in report.disks), default=0)
+    embed = discord.Embed(
+        title=f"SnapRAID SMART - {server.display_name}",
+        color=discord.Color.green() if worst < 20 else discord.Color.orange() if worst < 50 else discord.Color.red()
+    )
+    lines = []
+    for disk in report.disks:
+        name = disk.disk if disk.disk != "-" else disk.device
+        details = [
+            f"{disk.temperature}°C" if disk.temperature is not None else "-°C",
+            f"{disk.power_on_hours:,}h on" if disk.power_on_hours is not None else "-h on",
+            f"{disk.error_count} errors" if disk.error_count else "no errors" if disk.error_count == 0 else "- errors",
+            f"FP {disk.fail_percent}%" if disk.fail_percent is not None else "FP n/a",
+        ]
+        lines.append(f"`{name}` {' · '.join(details)}")
+    embed.description = "\n".join(lines)[:4000] or "No disks reported."
+    if report.array_fail_percent is not None:
+        embed.add_field(name="Any disk failing within a year", value=f"{report.array_fail_percent}%", inline=False)
+    embed.set_footer(text=f"Checked {format_age(report.fetched_at)}")
+    return embed
+
 
 class SnapRAIDConfirmationView(View):
-    def __init__(self, token: str, action_type: str):
-        super().__init__(timeout=120)
+    def __init__(self, token: str, action_type: str, timeout: float = settings.CONFIRMATION_TTL):
+        super().__init__(timeout=timeout)
         self.token = token
         self.action_type = action_type
+        # Per-token custom IDs let a restarted bot route clicks to restored views
+        self.confirm_callback.custom_id = f"confirm_snapraid:{token}"
+        self.cancel_callback.custom_id = f"cancel_snapraid:{token}"
+
+    async def on_timeout(self):
+        confirmation_manager.discard(self.token)
 
     @discord.ui.button(label="Confirm", style=discord.ButtonStyle.danger, custom_id="confirm_snapraid")
     async def confirm_callback(self, button, interaction):
@@ -33,33 +391,39 @@ class SnapRAIDConfirmationView(View):
             return
 
         await interaction.response.edit_message(
-            content=f"{self.action_type} started on {server.display_name} in background...",
+            content=f"{self.action_type.replace('_', ' ')} started on {server.display_name}. Progress is posted in this channel.",
             view=None
         )
         
-        loop = asyncio.get_running_loop()
-        
-        try:
-            result = await loop.run_in_executor(None, run_snapraid_command, server, self.action_type)
-            if len(result) > 1900:
-                result = result[:1900] + "\n... (truncated)"
-            
-            await interaction.followup.send(
-                f"**SnapRAID {self.action_type} Finished on {server.display_name}**\n```\n{result}\n```",
-                ephemeral=True
+        if self.action_type.startswith("maintenance_"):
+            await run_with_progress(
+                interaction,
+                server,
+                self.action_type[len("maintenance_"):],
+                pause_filter=ContainerFilter.from_expression(action.get("filter")),
+                timeout=action.get("timeout")
             )
-        except Exception as e:
-             await interaction.followup.send(f"SnapRAID {self.action_type} failed: {e}", ephemeral=True)
+        else:
+            await run_with_progress(interaction, server, self.action_type)
 
     @discord.ui.button(label="Cancel", style=discord.ButtonStyle.secondary, custom_id="cancel_snapraid")
     async def cancel_callback(self, button, interaction):
         confirmation_manager.consume(self.token)
         await interaction.response.edit_message(content="Action cancelled.", view=None)
 
+# Confirmation action types of SnapRAID commands
+SNAPRAID_ACTIONS = ["sync", "scrub", "fix", "maintenance_sync", "maintenance_scrub"]
+
 class SnapRAID(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Restore confirmation prompts that were still pending before a restart
+        for token, action in confirmation_manager.pending_actions(SNAPRAID_ACTIONS):
+            self.bot.add_view(SnapRAIDConfirmationView(token, action["action_type"], timeout=None))
+
     snapraid = SlashCommandGroup("snapraid", "SnapRAID management", guild_ids=[settings.DISCORD_GUILD_ID])
 
     def is_admin(self, ctx):
@@ -75,7 +439,8 @@ class SnapRAID(commands.Cog):
     async def status(
         self,
         ctx,
-        server: Option(str, "Server name", autocomplete=get_server_names)
+        server: Option(str, "Server name", autocomplete=get_server_names),
+        refresh: Option(bool, "Ignore the cached report", required=False, default=False)
     ):
         # Validate server and feature
         is_valid, error_msg = server_manager.validate_server_feature(server, "snapraid")
@@ -85,16 +450,19 @@ class SnapRAID(commands.Cog):
 
         await ctx.defer(ephemeral=True)
         server_config = server_manager.get_server(server)
-        result = await asyncio.to_thread(run_snapraid_command, server_config, "status")
-        if len(result) > 1900:
-            result = result[:1900] + "\n... (truncated)"
-        await ctx.respond(f"**SnapRAID Status on {server_config.display_name}**\n```\n{result}\n```", ephemeral=True)
+        try:
+            report = await snapraid_reports.get_status(server_config, refresh=refresh)
+        except Exception as e:
+            await ctx.respond(f"❌ Error getting SnapRAID status: {e}", ephemeral=True)
+            return
+        await ctx.respond(embed=format_status_embed(server_config, report), ephemeral=True)
 
     @snapraid.command(description="Get SnapRAID SMART stats")
     async def smart(
         self,
         ctx,
-        server: Option(str, "Server name", autocomplete=get_server_names)
+        server: Option(str, "Server name", autocomplete=get_server_names),
+        refresh: Option(bool, "Ignore the cached report (spins up the disks)", required=False, default=False)
     ):
         # Validate server and feature
         is_valid, error_msg = server_manager.validate_server_feature(server, "snapraid")
@@ -104,10 +472,12 @@ class SnapRAID(commands.Cog):
 
         await ctx.defer(ephemeral=True)
         server_config = server_manager.get_server(server)
-        result = await asyncio.to_thread(run_snapraid_command, server_config, "smart")
-        if len(result) > 1900:
-            result = result[:1900] + "\n... (truncated)"
-        await ctx.respond(f"**SnapRAID SMART on {server_config.display_name}**\n```\n{result}\n```", ephemeral=True)
+        try:
+            report = await snapraid_reports.get_smart(server_config, refresh=refresh)
+        except Exception as e:
+            await ctx.respond(f"❌ Error getting SMART report: {e}", ephemeral=True)
+            return
+        await ctx.respond(embed=format_smart_embed(server_config, report), ephemeral=True)
 
     async def _dangerous_command(self, ctx, server: str, command_name: str, warning: str):
         if not self.is_admin(ctx):
@@ -168,6 +538,64 @@ class SnapRAID(commands.Cog):
             "SnapRAID fix will attempt to restore files. Ensure you know what you are doing!"
         )
 
+    @snapraid.command(description="Pause containers, run sync or scrub, then resume them")
+    async def maintenance(
+        self,
+        ctx,
+        server: Option(str, "Server name", autocomplete=get_server_names),
+        action: Option(str, "SnapRAID command", choices=["sync", "scrub"], default="sync"),
+        filter: Option(str, "Containers to pause, e.g. project=media (default: the server's maintenance.pause)", required=False, default=None),
+        max_hours: Option(float, "Stop the job after this many hours", required=False, default=None, min_value=0.1)
+    ):
+        if not self.is_admin(ctx):
+            await ctx.respond("You are not authorized to use this command.", ephemeral=True)
+            return
+
+        # Containers are paused over docker, so both features are needed
+        for feature in ("snapraid", "docker"):
+            is_valid, error_msg = server_manager.validate_server_feature(server, feature)
+            if not is_valid:
+                await ctx.respond(error_msg, ephemeral=True)
+                return
+
+        server_config = server_manager.get_server(server)
+        maintenance_config = (server_config.get_snapraid_config() or {}).get("maintenance") or {}
+        expression = filter if filter is not None else maintenance_config.get("pause", "")
+        if max_hours is not None:
+            timeout = max_hours * 3600
+        else:
+            timeout = float(maintenance_config.get("timeout_hours", settings.SNAPRAID_MAINTENANCE_TIMEOUT / 3600)) * 3600
+
+        await ctx.defer(ephemeral=True)
+        try:
+            include = ContainerFilter.from_expression(expression)
+            names = await DockerClient(server_config).list_matching("running", include)
+        except ValueError as e:
+            await ctx.respond(f"❌ {e}", ephemeral=True)
+            return
+        if names is None:
+            await ctx.respond(f"❌ Failed to list containers on {server_config.display_name}.", ephemeral=True)
+            return
+
+        token = confirmation_manager.create(
+            ctx.author.id,
+            f"maintenance_{action}",
+            server_name=server,
+            filter=include.describe(),
+            timeout=timeout
+        )
+        view = SnapRAIDConfirmationView(token, f"maintenance_{action}")
+        preview = ", ".join(f"`{name}`" for name in names[:20]) or "none"
+        if len(names) > 20:
+            preview += f" and {len(names) - 20} more"
+        await ctx.respond(
+            f"SnapRAID {action} will run on **{server_config.display_name}** with "
+            f"{len(names)} containers paused ({preview}). They are resumed when the {action} ends, "
+            f"fails or is stopped after {_format_elapsed(timeout)}. Confirm?",
+            view=view,
+            ephemeral=True
+        )
+
+
 def setup(bot):
     bot.add_cog(SnapRAID(bot))
-
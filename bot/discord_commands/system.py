@@ -2,12 +2,43 @@ import discord
 from discord.ext import commands
 from discord.commands import SlashCommandGroup, Option
 from config import settings
-from services.filesystem_stats import get_disk_usage, get_available_paths
+from services.filesystem_stats import disk_usage_index, get_available_paths, format_bytes, format_age
 from services.server_manager import server_manager
 from services.ssh_executor import ssh_executor
-import subprocess
+from services.system_info import system_info_service, format_duration
+from services.metrics import metrics_collector
+from services.metrics_store import metrics_store
+from services.alerts import alert_engine
 import time
 
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+def format_metric(metric: str, value: float) -> str:
+    """Format a metric value according to its unit"""
+    if "bytes" in metric:
+        return format_bytes(value)
+    if "percent" in metric:
+        return f"{value:.1f}%"
+    if metric == "uptime_seconds":
+        return format_duration(value)
+    if metric == "probe_seconds":
+        return f"{value * 1000:.0f}ms"
+    if value == int(value):
+        return str(int(value))
+    return f"{value:.2f}"
+
+
+def sparkline(values, width: int = 24) -> str:
+    """Render values as a unicode sparkline of at most width characters"""
+    if not values:
+        return ""
+    step = max(1, len(values) // width)
+    points = [sum(values[i:i + step]) / len(values[i:i + step]) for i in range(0, len(values), step)]
+    low, high = min(points), max(points)
+    span = high - low or 1
+    return "".join(SPARK_CHARS[int((p - low) / span * (len(SPARK_CHARS) - 1))] for p in points)
+
 class System(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -43,7 +74,8 @@ class System(commands.Cog):
         self,
         ctx,
         server: Option(str, "Server name", autocomplete=get_server_names_filesystem),
-        path: Option(str, "Path to check", autocomplete=get_path_choices)
+        path: Option(str, "Path to check", autocomplete=get_path_choices),
+        refresh: Option(bool, "Re-measure the path in the background", required=False, default=False)
     ):
         # Validate server and feature
         is_valid, error_msg = server_manager.validate_server_feature(server, "filesystem")
@@ -51,19 +83,48 @@ class System(commands.Cog):
             await ctx.respond(error_msg, ephemeral=True)
             return
 
+        await ctx.defer(ephemeral=True)
+
         server_config = server_manager.get_server(server)
-        size_str = get_disk_usage(server_config, path)
-        
-        # Get the actual path for display
-        fs_config = server_config.get_filesystem_config()
-        actual_path = fs_config.get('paths', {}).get(path, path) if fs_config else path
-        
-        await ctx.respond(
-            f"**Disk Usage on {server_config.display_name}**\nPath: `{actual_path}`\nSize: {size_str}",
-            ephemeral=True
-        )
+        report = await disk_usage_index.query(server_config, path, refresh=refresh)
+
+        if report.error:
+            await ctx.respond(f"Error checking disk usage: {report.error}", ephemeral=True)
+            return
+
+        lines = [f"**Disk Usage on {server_config.display_name}**", f"Path: `{report.path}`"]
+
+        if report.is_mount_point and report.filesystem:
+            fs = report.filesystem
+            percent = fs.used_bytes / fs.total_bytes * 100 if fs.total_bytes else 0
+            lines.append(
+                f"Size: {format_bytes(fs.used_bytes)} used of {format_bytes(fs.total_bytes)} "
+                f"({percent:.0f}%), {format_bytes(fs.available_bytes)} free"
+            )
+        elif report.size:
+            lines.append(f"Size: {format_bytes(report.size.size_bytes)} (measured {format_age(report.size.measured_at)})")
+        else:
+            lines.append("Size: not measured yet")
+
+        if report.filesystem and not report.is_mount_point:
+            fs = report.filesystem
+            lines.append(
+                f"Filesystem `{fs.mount_point}`: {format_bytes(fs.available_bytes)} free of {format_bytes(fs.total_bytes)}"
+            )
+
+        if report.children:
+            measured = f" (measured {format_age(report.size.measured_at)})" if report.size else ""
+            largest = ", ".join(f"`{name}` {format_bytes(size)}" for name, size in report.children[:5])
+            lines.append(f"Largest subdirectories{measured}: {largest}")
+
+        if report.crawl_queued:
+            lines.append(f"Queued behind another crawl on this server (requested {format_age(report.crawl_started)}); run again later for fresh sizes.")
+        elif report.crawl_started:
+            lines.append(f"Measuring in the background (started {format_age(report.crawl_started)}); run again later for fresh sizes.")
+
+        await ctx.respond("\n".join(lines), ephemeral=True)
 
-    @system.command(description="Get system info (Uptime, IP)")
+    @system.command(description="Get system info (Uptime, load, memory, kernel, IP)")
     async def info(
         self,
         ctx,
@@ -76,29 +137,187 @@ class System(commands.Cog):
             return
 
         await ctx.defer(ephemeral=True)
-        
-        # Uptime
-        uptime_output, _, uptime_exit = ssh_executor.execute_command(server_config, "uptime -p", timeout=5)
-        if uptime_exit != 0:
-            uptime_output = "Error getting uptime"
-        else:
-            uptime_output = uptime_output.strip()
 
-        # Public IP
-        public_ip, _, ip_exit = ssh_executor.execute_command(server_config, "curl -s ifconfig.me", timeout=10)
-        if ip_exit != 0:
-            public_ip = "Error getting public IP"
-        else:
-            public_ip = public_ip.strip()
+        try:
+            snapshot = await system_info_service.collect(server_config)
+        except Exception as e:
+            await ctx.respond(f"Error getting system info from {server_config.display_name}: {e}", ephemeral=True)
+            return
 
         # Bot Latency
         latency = round(self.bot.latency * 1000)
 
+        uptime = snapshot.uptime_text or (
+            format_duration(snapshot.uptime_seconds) if snapshot.uptime_seconds is not None else "Error getting uptime"
+        )
+        load = " / ".join(f"{value:.2f}" for value in snapshot.load) if snapshot.load else "Unknown"
+        if snapshot.mem_total:
+            used = snapshot.mem_total - (snapshot.mem_available or 0)
+            memory = f"{format_bytes(used)} / {format_bytes(snapshot.mem_total)} ({used / snapshot.mem_total * 100:.0f}%)"
+        else:
+            memory = "Unknown"
+        public_ip = snapshot.public_ip or "Error getting public IP"
+        if snapshot.public_ip_fetched_at:
+            public_ip += f" (checked {format_age(snapshot.public_ip_fetched_at)})"
+
         embed = discord.Embed(title=f"System Info - {server_config.display_name}", color=discord.Color.blue())
-        embed.add_field(name="Uptime", value=uptime_output, inline=False)
+        embed.add_field(name="Uptime", value=uptime, inline=False)
+        embed.add_field(name="Load (1/5/15m)", value=load, inline=True)
+        embed.add_field(name="Memory", value=memory, inline=True)
+        embed.add_field(name="Kernel", value=snapshot.kernel or "Unknown", inline=False)
         embed.add_field(name="Public IP", value=public_ip, inline=False)
-        embed.add_field(name="Bot Latency", value=f"{latency}ms", inline=False)
+        embed.add_field(name="Bot Latency", value=f"{latency}ms (probe {snapshot.probe_seconds * 1000:.0f}ms)", inline=False)
+
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    @system.command(description="Show SSH connection pool usage")
+    async def ssh_pool(self, ctx):
+        stats = ssh_executor.pool_stats()
+        if not stats:
+            await ctx.respond("No SSH connections have been opened yet.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="SSH Connection Pools", color=discord.Color.blue())
+        for server_name, pool in stats.items():
+            server_config = server_manager.get_server(server_name)
+            display_name = server_config.display_name if server_config else server_name
+            embed.add_field(
+                name=display_name,
+                value=(
+                    f"Connections: {pool['connections']} ({pool['idle_connections']} idle)\n"
+                    f"Channels: {pool['channels_in_use']}/{pool['channel_capacity']}\n"
+                    f"Waiting: {pool['waiting']} (total waits {pool['waits']}, max {pool['max_wait']}s)\n"
+                    f"Opened: {pool['created']}, evicted: {pool['evicted']}"
+                ),
+                inline=False
+            )
+
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    async def get_metric_names(self, ctx: discord.AutocompleteContext):
+        """Autocomplete for metrics collected on the selected server"""
+        server_name = ctx.options.get("server")
+        if not server_name:
+            return []
+        names = metrics_collector.metric_names(server_name)
+        return [n for n in names if ctx.value.lower() in n.lower()][:25]
+
+    @system.command(description="Show the latest collected metrics for a server")
+    async def metrics(
+        self,
+        ctx,
+        server: Option(str, "Server name", autocomplete=get_server_names_all)
+    ):
+        server_config = server_manager.get_server(server)
+        if not server_config:
+            await ctx.respond(f"Server '{server}' not found.", ephemeral=True)
+            return
+
+        latest = metrics_collector.latest_values(server)
+        if not latest:
+            await ctx.respond(f"No metrics collected for {server_config.display_name} yet.", ephemeral=True)
+            return
+
+        sampled_at = max(timestamp for timestamp, _ in latest.values())
+        lines = [f"`{metric}`: {format_metric(metric, value)}" for metric, (_, value) in sorted(latest.items())]
+        embed = discord.Embed(
+            title=f"Metrics - {server_config.display_name}",
+            description="\n".join(lines)[:4000],
+            color=discord.Color.blue()
+        )
+        embed.set_footer(text=f"Sampled {format_age(sampled_at)}")
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    @system.command(description="Show how a collected metric changed over time")
+    async def trend(
+        self,
+        ctx,
+        server: Option(str, "Server name", autocomplete=get_server_names_all),
+        metric: Option(str, "Metric name", autocomplete=get_metric_names),
+        hours: Option(float, "Window in hours", required=False, default=24.0)
+    ):
+        server_config = server_manager.get_server(server)
+        if not server_config:
+            await ctx.respond(f"Server '{server}' not found.", ephemeral=True)
+            return
+
+        since = time.time() - hours * 3600
+        series = metrics_collector.get_series(server, metric)
+        samples = series.samples(since=since) if series else []
+        lows = highs = None
+        source = ""
+        # The ring buffer only holds recent samples; older windows come from the local store
+        if not samples or samples[0][0] > since + 2 * settings.METRICS_INTERVAL:
+            stored = await metrics_store.query_samples(server, metric, since)
+            if len(stored) > len(samples):
+                samples = [(entry.ts, entry.value) for entry in stored]
+                lows = [entry.min for entry in stored]
+                highs = [entry.max for entry in stored]
+                source = " (from history)"
+        if len(samples) < 2:
+            await ctx.respond(f"Not enough samples of `{metric}` on {server_config.display_name} yet.", ephemeral=True)
+            return
+
+        (first_time, first), (last_time, last) = samples[0], samples[-1]
+        values = [value for _, value in samples]
+        span_hours = (last_time - first_time) / 3600
+        delta = last - first
+        rate = delta / span_hours if span_hours else 0
+        sign = "+" if delta >= 0 else "-"
+
+        embed = discord.Embed(title=f"{metric} - {server_config.display_name}", color=discord.Color.blue())
+        embed.add_field(name="Latest", value=format_metric(metric, last), inline=True)
+        low, high = min(lows or values), max(highs or values)
+        embed.add_field(name="Min / Max", value=f"{format_metric(metric, low)} / {format_metric(metric, high)}", inline=True)
+        embed.add_field(
+            name=f"Change over {span_hours:.1f}h",
+            value=f"{sign}{format_metric(metric, abs(delta))} ({sign}{format_metric(metric, abs(rate))}/h)",
+            inline=False
+        )
+        embed.add_field(name="Trend", value=sparkline(values) or "-", inline=False)
+        embed.set_footer(text=f"{len(samples)} samples{source}")
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    @system.command(description="Show alerts that are currently firing")
+    async def alerts(self, ctx):
+        active = alert_engine.active_alerts()
+        if not active:
+            await ctx.respond("✅ No active alerts.", ephemeral=True)
+            return
+
+        lines = [f"🚨 {alert_engine.describe(alert)} - since <t:{int(alert.since)}:R>" for alert in active]
+        embed = discord.Embed(title="Active Alerts", description="\n".join(lines)[:4000], color=discord.Color.red())
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    @system.command(description="Show recent long-running commands run through the bot")
+    async def history(
+        self,
+        ctx,
+        server: Option(str, "Server name", autocomplete=get_server_names_all, required=False, default=None),
+        limit: Option(int, "Number of entries", required=False, default=10, min_value=1, max_value=25)
+    ):
+        rows = await metrics_store.recent_commands(server, limit)
+        if not rows:
+            await ctx.respond("No commands recorded yet.", ephemeral=True)
+            return
 
+        embed = discord.Embed(title="Command History", color=discord.Color.blue())
+        for ts, server_name, command, exit_code, duration, user_id, summary in rows:
+            server_config = server_manager.get_server(server_name)
+            status = "✅" if exit_code == 0 else "❌"
+            details = [f"<t:{int(ts)}:R>"]
+            if duration is not None:
+                details.append(format_duration(duration))
+            if user_id:
+                details.append(f"<@{user_id}>")
+            value = " · ".join(details)
+            if summary:
+                value += f"\n{summary[:200]}"
+            embed.add_field(
+                name=f"{status} {command} - {server_config.display_name if server_config else server_name}",
+                value=value,
+                inline=False
+            )
         await ctx.respond(embed=embed, ephemeral=True)
 
 def setup(bot):
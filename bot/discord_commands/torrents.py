@@ -2,9 +2,54 @@ import discord
 from discord.ext import commands
 from discord.commands import SlashCommandGroup, Option
 from config import settings
-from services.qbittorrent_client import QBittorrentClient
+from services.qbittorrent_client import (
+    TorrentItem,
+    get_qbittorrent_client,
+    parse_links,
+    parse_torrent_upload,
+)
 from services.server_manager import server_manager
+from services.output_delivery import OutputSpool, deliver_output
 import aiohttp
+from typing import Tuple
+import asyncio
+
+STATUS_ICONS = {
+    "added": "✅",
+    "submitted": "📨",
+    "exists": "♻️",
+    "failed": "❌",
+    "invalid": "⚠️",
+}
+
+
+def format_add_results(items, server_config) -> Tuple[str, OutputSpool]:
+    """Format per-torrent results of a bulk add as a summary title and a spool of result lines"""
+    counts = {}
+    for item in items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    summary = ", ".join(f"{count} {status}" for status, count in counts.items())
+
+    spool = OutputSpool()
+    for item in items:
+        detail = f" ({item.detail})" if item.detail else ""
+        spool.write_line(f"{STATUS_ICONS.get(item.status, '')} `{item.name}` {item.status}{detail}")
+    return f"**Torrents on {server_config.display_name}**: {summary}", spool
+
+
+async def download_attachments(attachments):
+    """Download attachments concurrently, returning bytes or the exception for each"""
+    async def fetch(session, attachment):
+        async with session.get(attachment.url) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    async with aiohttp.ClientSession() as session:
+        return await asyncio.gather(
+            *(fetch(session, attachment) for attachment in attachments),
+            return_exceptions=True
+        )
+
 
 class Torrents(commands.Cog):
     def __init__(self, bot):
@@ -21,12 +66,12 @@ class Torrents(commands.Cog):
         server_names = [s.name for s in servers]
         return [name for name in server_names if name.lower().startswith(ctx.value.lower())]
 
-    @torrent.command(name="add_link", description="Add a torrent from a URL")
+    @torrent.command(name="add_link", description="Add torrents from magnet links or URLs")
     async def add_link(
         self,
         ctx,
         server: Option(str, "Server name", autocomplete=get_server_names),
-        url: Option(str, "Magnet link or HTTP/HTTPS URL"),
+        url: Option(str, "Magnet links or HTTP/HTTPS URLs, separated by spaces or newlines"),
         category: Option(str, "Category", required=False, default=None),
         save_path: Option(str, "Save path", required=False, default=None)
     ):
@@ -40,25 +85,34 @@ class Torrents(commands.Cog):
             await ctx.respond(error_msg, ephemeral=True)
             return
 
+        items = parse_links(url)
+        if not items:
+            await ctx.respond("Please provide at least one magnet link or URL.", ephemeral=True)
+            return
+
+        await ctx.defer(ephemeral=True)
+
         try:
             server_config = server_manager.get_server(server)
-            qbt_client = QBittorrentClient(server_config)
-            result = qbt_client.add_link(url, category, save_path)
-            if result == "Ok.":
-                await ctx.respond(f"✅ Torrent added successfully on {server_config.display_name}", ephemeral=True)
-            else:
-                await ctx.respond(f"Result: {result}", ephemeral=True)
+            qbt_client = get_qbittorrent_client(server_config)
+            items = await qbt_client.add_torrents(items, category, save_path)
+            title, spool = format_add_results(items, server_config)
+            await deliver_output(ctx, spool, title, filename="torrents.txt", code_block=False)
         except Exception as e:
             await ctx.respond(f"Error: {str(e)}", ephemeral=True)
 
-    @torrent.command(name="add_file", description="Add a torrent from a file")
+    @torrent.command(name="add_file", description="Add torrents from .torrent files or a zip of them")
     async def add_file(
         self,
         ctx,
         server: Option(str, "Server name", autocomplete=get_server_names),
-        file: Option(discord.Attachment, "Torrent file"),
+        file: Option(discord.Attachment, "Torrent file or zip of torrent files"),
         category: Option(str, "Category", required=False, default=None),
-        save_path: Option(str, "Save path", required=False, default=None)
+        save_path: Option(str, "Save path", required=False, default=None),
+        file2: Option(discord.Attachment, "Additional torrent file or zip", required=False, default=None),
+        file3: Option(discord.Attachment, "Additional torrent file or zip", required=False, default=None),
+        file4: Option(discord.Attachment, "Additional torrent file or zip", required=False, default=None),
+        file5: Option(discord.Attachment, "Additional torrent file or zip", required=False, default=None)
     ):
         if not self.is_authorized(ctx):
             await ctx.respond("You are not authorized to use this command.", ephemeral=True)
@@ -70,22 +124,33 @@ class Torrents(commands.Cog):
             await ctx.respond(error_msg, ephemeral=True)
             return
 
-        if not file.filename.endswith(".torrent"):
-            await ctx.respond("Please upload a .torrent file.", ephemeral=True)
+        attachments = [a for a in (file, file2, file3, file4, file5) if a is not None]
+        if not any(a.filename.lower().endswith((".torrent", ".zip")) for a in attachments):
+            await ctx.respond("Please upload .torrent files or a zip of .torrent files.", ephemeral=True)
             return
 
+        await ctx.defer(ephemeral=True)
+
         try:
-            file_content = await file.read()
+            contents = await download_attachments(attachments)
+            items = []
+            for attachment, content in zip(attachments, contents):
+                if isinstance(content, Exception):
+                    items.append(TorrentItem(
+                        name=attachment.filename,
+                        status="failed",
+                        detail=f"download failed: {content}"
+                    ))
+                    continue
+                items.extend(parse_torrent_upload(attachment.filename, content))
+
             server_config = server_manager.get_server(server)
-            qbt_client = QBittorrentClient(server_config)
-            result = qbt_client.add_file(file_content, category, save_path)
-            if result == "Ok.":
-                await ctx.respond(f"✅ Torrent added successfully on {server_config.display_name}", ephemeral=True)
-            else:
-                await ctx.respond(f"Result: {result}", ephemeral=True)
+            qbt_client = get_qbittorrent_client(server_config)
+            items = await qbt_client.add_torrents(items, category, save_path)
+            title, spool = format_add_results(items, server_config)
+            await deliver_output(ctx, spool, title, filename="torrents.txt", code_block=False)
         except Exception as e:
             await ctx.respond(f"Error: {str(e)}", ephemeral=True)
 
 def setup(bot):
     bot.add_cog(Torrents(bot))
-
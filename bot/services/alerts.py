@@ -0,0 +1,203 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from config import ServerConfig, settings
+from services.server_manager import server_manager
+
+
+@dataclass(frozen=True)
+class AlertKind:
+    """A kind of alert rule that can be configured per server"""
+    metric: str  # Base metric name; per-path/per-disk metrics use "<metric>:<key>"
+    label: str
+    unit: str
+    hysteresis: float  # Default distance between the firing and clearing thresholds
+
+
+# Rule keys accepted in a server's "alerts" config block
+ALERT_KINDS: Dict[str, AlertKind] = {
+    "disk_percent": AlertKind("disk_used_percent", "Disk usage", "%", 5.0),
+    "container_exited": AlertKind("containers_exited", "Exited containers", "", 0.0),
+    "smart_fail_probability": AlertKind("smart_fail_percent", "SMART failure probability", "%", 5.0),
+    "sync_age_days": AlertKind("snapraid_sync_age_days", "Days since last SnapRAID sync", "d", 0.0),
+}
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    """A threshold rule: fires when a metric rises above threshold, clears at or below clear"""
+    kind: str
+    threshold: float
+    clear: float
+
+
+@dataclass
+class ActiveAlert:
+    """An alert that is currently firing"""
+    server_name: str
+    metric: str
+    rule: AlertRule
+    value: float
+    since: float
+
+
+def parse_alert_rules(server: ServerConfig) -> Dict[str, List[AlertRule]]:
+    """
+    Build a server's alert rules from its config, indexed by base metric name
+    
+    Each rule takes a threshold, or a dict with "threshold" and optional "clear".
+    container_exited also accepts true, meaning any exited container.
+    
+    Args:
+        server: Server configuration
+    
+    Returns:
+        Rules keyed by the base metric they watch
+    """
+    rules: Dict[str, List[AlertRule]] = {}
+    for key, value in server.get_alerts_config().items():
+        kind = ALERT_KINDS.get(key)
+        if kind is None:
+            print(f"Unknown alert rule '{key}' for server {server.name}")
+            continue
+        if value is False or value is None:
+            continue
+        
+        options: Dict[str, Any] = value if isinstance(value, dict) else {"threshold": value}
+        threshold = options.get("threshold", 0)
+        if threshold is True:
+            threshold = 0
+        try:
+            threshold = float(threshold)
+            clear = float(options.get("clear", threshold - kind.hysteresis))
+        except (TypeError, ValueError):
+            print(f"Invalid alert rule '{key}' for server {server.name}: {value!r}")
+            continue
+        rules.setdefault(kind.metric, []).append(AlertRule(key, threshold, min(clear, threshold)))
+    return rules
+
+
+def format_alert_value(rule: AlertRule, value: float) -> str:
+    """Format a metric value with its alert kind's unit"""
+    unit = ALERT_KINDS[rule.kind].unit
+    if unit == "%":
+        return f"{value:.1f}%"
+    if unit == "d":
+        return f"{value:.1f} days"
+    return f"{value:g}"
+
+
+class AlertEngine:
+    """
+    Evaluates per-server alert rules against collected samples
+    
+    Rules are indexed by metric, so each sample only touches the rules that
+    watch it. Alerts are only posted on state transitions (firing/resolved),
+    and the gap between the firing and clearing thresholds keeps a value
+    hovering around a threshold from flapping.
+    """
+    
+    def __init__(self):
+        self._rules: Dict[str, Dict[str, List[AlertRule]]] = {}
+        self._active: Dict[Tuple[str, str, str], ActiveAlert] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._bot = None
+    
+    def start(self, bot) -> None:
+        """Start posting alert notifications through a bot (no-op if already running)"""
+        self._bot = bot
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+    
+    def _get_rules(self, server_name: str) -> Dict[str, List[AlertRule]]:
+        """Get a server's rule index, building it on first use"""
+        rules = self._rules.get(server_name)
+        if rules is None:
+            server = server_manager.get_server(server_name)
+            rules = parse_alert_rules(server) if server else {}
+            self._rules[server_name] = rules
+        return rules
+    
+    def evaluate(self, server_name: str, timestamp: float, values: Dict[str, float]) -> None:
+        """
+        Check a server's samples against its rules (metrics collector listener)
+        
+        Args:
+            server_name: Server the samples came from
+            timestamp: Sample time
+            values: Metric values keyed by metric name
+        """
+        rules = self._get_rules(server_name)
+        if not rules:
+            return
+        for metric, value in values.items():
+            for rule in rules.get(metric.partition(":")[0], ()):
+                self._check(server_name, metric, rule, value, timestamp)
+    
+    def _check(self, server_name: str, metric: str, rule: AlertRule, value: float, timestamp: float) -> None:
+        """Apply one rule to one value, notifying on state transitions"""
+        key = (server_name, metric, rule.kind)
+        active = self._active.get(key)
+        if active is None:
+            if value > rule.threshold:
+                active = ActiveAlert(server_name, metric, rule, value, timestamp)
+                self._active[key] = active
+                self._notify("firing", active)
+        else:
+            active.value = value
+            if value <= rule.clear:
+                del self._active[key]
+                self._notify("resolved", active)
+    
+    def _notify(self, state: str, alert: ActiveAlert) -> None:
+        """Queue a notification for the posting task"""
+        if self._queue is None:
+            print(f"Alert {state}: {self.describe(alert)}")
+            return
+        self._queue.put_nowait((state, alert, alert.value))
+    
+    def describe(self, alert: ActiveAlert, value: Optional[float] = None) -> str:
+        """Describe an alert in one line"""
+        server = server_manager.get_server(alert.server_name)
+        name = server.display_name if server else alert.server_name
+        label = ALERT_KINDS[alert.rule.kind].label
+        _, _, target = alert.metric.partition(":")
+        if target:
+            label = f"{label} ({target})"
+        value = alert.value if value is None else value
+        return (
+            f"{name}: {label} is {format_alert_value(alert.rule, value)} "
+            f"(threshold {format_alert_value(alert.rule, alert.rule.threshold)})"
+        )
+    
+    async def _run(self) -> None:
+        """Post queued notifications to the alert channel"""
+        while True:
+            state, alert, value = await self._queue.get()
+            text = self.describe(alert, value)
+            print(f"Alert {state}: {text}")
+            if not settings.ALERT_CHANNEL_ID or self._bot is None:
+                continue
+            channel = self._bot.get_channel(settings.ALERT_CHANNEL_ID)
+            if channel is None:
+                print(f"Alert channel {settings.ALERT_CHANNEL_ID} not found")
+                continue
+            if state == "firing":
+                message = f"🚨 **Alert:** {text}"
+            else:
+                message = f"✅ **Resolved:** {text} (active for {int(time.time() - alert.since) // 60}m)"
+            try:
+                await channel.send(message)
+            except Exception as e:
+                print(f"Failed to post alert: {e}")
+    
+    def active_alerts(self) -> List[ActiveAlert]:
+        """Get the alerts currently firing, oldest first"""
+        return sorted(self._active.values(), key=lambda alert: alert.since)
+
+
+# Global alert engine instance
+alert_engine = AlertEngine()
@@ -1,10 +1,122 @@
+import asyncio
+import json
+import os
 import secrets
 import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from config import settings
 
 class ConfirmationManager:
-    def __init__(self):
-        self.pending = {}
-
+    """
+    Pending confirmation tokens for dangerous actions
+    
+    Tokens are kept in creation order, so expired ones are always at the
+    front and a sweep only looks at as many entries as it removes. The store
+    is capped in total and per user (the oldest token is dropped to make
+    room), and can be persisted to a JSON file so confirmations survive a
+    restart within their TTL.
+    """
+    
+    def __init__(
+        self,
+        ttl: float = 120,
+        max_pending: int = 1000,
+        max_per_user: int = 5,
+        path: Optional[str] = None
+    ):
+        """
+        Initialize the confirmation store
+        
+        Args:
+            ttl: Seconds a token stays valid
+            max_pending: Maximum tokens kept in total
+            max_per_user: Maximum tokens kept per user
+            path: JSON file to persist pending tokens to (None to keep them in memory only)
+        """
+        self.ttl = ttl
+        self.max_pending = max(1, max_pending)
+        self.max_per_user = max(1, max_per_user)
+        self.path = path
+        self.pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._per_user: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"created": 0, "consumed": 0, "expired": 0, "evicted": 0, "rejected": 0}
+        self._load()
+    
+    def _load(self) -> None:
+        """Load persisted tokens that have not expired yet"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load pending confirmations from {self.path}: {e}")
+            return
+        now = time.time()
+        for token, action in sorted(entries.items(), key=lambda item: item[1].get("timestamp", 0)):
+            if now - action.get("timestamp", 0) < self.ttl:
+                self._add(token, action)
+        if self.pending:
+            print(f"Restored {len(self.pending)} pending confirmations")
+    
+    def _save(self) -> None:
+        """Write pending tokens to the persistence file (atomically)"""
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.pending, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Failed to persist pending confirmations: {e}")
+    
+    def _add(self, token: str, action: Dict[str, Any]) -> None:
+        """Insert a token and count it against its user"""
+        self.pending[token] = action
+        user_id = action["user_id"]
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+    
+    def _remove(self, token: str) -> Optional[Dict[str, Any]]:
+        """Remove a token and uncount it from its user"""
+        action = self.pending.pop(token, None)
+        if action:
+            user_id = action["user_id"]
+            remaining = self._per_user.get(user_id, 1) - 1
+            if remaining > 0:
+                self._per_user[user_id] = remaining
+            else:
+                self._per_user.pop(user_id, None)
+        return action
+    
+    def _is_expired(self, action: Dict[str, Any], now: float) -> bool:
+        return now - action["timestamp"] >= self.ttl
+    
+    def sweep(self) -> int:
+        """
+        Drop expired tokens
+        
+        Returns:
+            Number of tokens removed
+        """
+        now = time.time()
+        removed = 0
+        while self.pending:
+            token, action = next(iter(self.pending.items()))
+            if not self._is_expired(action, now):
+                break
+            self._remove(token)
+            removed += 1
+        if removed:
+            self.counters["expired"] += removed
+            self._save()
+        return removed
+    
     def create(self, user_id: int, action_type: str, **metadata) -> str:
         """
         Create a confirmation token
@@ -13,24 +125,75 @@ class ConfirmationManager:
             user_id: Discord user ID
             action_type: Type of action to confirm
             **metadata: Additional metadata (e.g., server_name)
-            
+        
         Returns:
             Confirmation token
         """
+        self.sweep()
+        
+        # Make room: the user's oldest token first, then the oldest overall
+        if self._per_user.get(user_id, 0) >= self.max_per_user:
+            oldest = next(token for token, action in self.pending.items() if action["user_id"] == user_id)
+            self._remove(oldest)
+            self.counters["evicted"] += 1
+        while len(self.pending) >= self.max_pending:
+            self._remove(next(iter(self.pending)))
+            self.counters["evicted"] += 1
+        
         token = secrets.token_urlsafe(16)
-        self.pending[token] = {
+        self._add(token, {
             "user_id": user_id,
             "action_type": action_type,
             "timestamp": time.time(),
             **metadata
-        }
+        })
+        self.counters["created"] += 1
+        self._save()
         return token
-
+    
     def consume(self, token: str):
         """Consume a token (returns action data or None if invalid/expired)"""
-        action = self.pending.pop(token, None)
-        if action and (time.time() - action["timestamp"]) < 120:
-            return action
-        return None
+        action = self._remove(token)
+        if action is None:
+            self.counters["rejected"] += 1
+            return None
+        self._save()
+        if self._is_expired(action, time.time()):
+            self.counters["expired"] += 1
+            return None
+        self.counters["consumed"] += 1
+        return action
+    
+    def discard(self, token: str) -> None:
+        """Drop a token whose confirmation prompt timed out"""
+        if self._remove(token) is not None:
+            self.counters["expired"] += 1
+            self._save()
+    
+    def pending_actions(self, action_types: Iterable[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Get unexpired tokens for the given action types (e.g. to restore their views)"""
+        self.sweep()
+        action_types = set(action_types)
+        return [(token, action) for token, action in self.pending.items() if action["action_type"] in action_types]
+    
+    def start(self) -> None:
+        """Start the periodic sweep (no-op if already running)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(max(10, self.ttl / 4))
+            self.sweep()
+    
+    def stats(self) -> Dict[str, int]:
+        """Get the number of pending tokens and lifetime counters"""
+        return {"pending": len(self.pending), "users": len(self._per_user), **self.counters}
 
-confirmation_manager = ConfirmationManager()
+# Global confirmation manager instance
+confirmation_manager = ConfirmationManager(
+    ttl=settings.CONFIRMATION_TTL,
+    max_pending=settings.CONFIRMATION_MAX_PENDING,
+    max_per_user=settings.CONFIRMATION_MAX_PER_USER,
+    path=settings.CONFIRMATION_STORE_PATH or None
+)
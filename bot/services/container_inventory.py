@@ -0,0 +1,173 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from config import ServerConfig, settings
+from services.docker_client import DockerClient, ContainerSummary
+from services.ssh_executor import ssh_executor
+
+
+@dataclass
+class _InventoryEntry:
+    """Cached container names for one server"""
+    names: List[str] = field(default_factory=list)
+    fetched_at: float = 0.0
+    loaded: bool = False
+    refresh_task: Optional[asyncio.Task] = None
+    events_task: Optional[asyncio.Task] = None
+    overview: List[ContainerSummary] = field(default_factory=list)
+    overview_fetched_at: float = 0.0
+    overview_task: Optional[asyncio.Task] = None
+
+
+class ContainerInventory:
+    """
+    Per-server container name cache with stale-while-revalidate refreshes
+    
+    Also keeps a short-lived overview (state, health, restarts, CPU and
+    memory) per server; fetching one refreshes the names as well.
+    """
+    
+    def __init__(self):
+        self._entries: Dict[str, _InventoryEntry] = {}
+    
+    def _get_ttl(self, server: ServerConfig) -> float:
+        """Get the inventory TTL for a server"""
+        return server.get_docker_config().get("inventory_ttl", settings.DOCKER_INVENTORY_TTL)
+    
+    def _get_entry(self, server: ServerConfig) -> _InventoryEntry:
+        """Get or create the cache entry for a server"""
+        entry = self._entries.get(server.name)
+        if entry is None:
+            entry = _InventoryEntry()
+            self._entries[server.name] = entry
+        return entry
+    
+    def get_cached_names(self, server: ServerConfig) -> List[str]:
+        """
+        Get container names from memory, refreshing in the background when stale
+        
+        Args:
+            server: Server configuration
+        
+        Returns:
+            Cached container names (empty until the first refresh completes)
+        """
+        entry = self._get_entry(server)
+        if time.monotonic() - entry.fetched_at >= self._get_ttl(server):
+            self._schedule_refresh(server, entry)
+        if server.get_docker_config().get("watch_events") and entry.events_task is None:
+            entry.events_task = asyncio.create_task(self._watch_events(server, entry))
+        return entry.names
+    
+    async def get_names(self, server: ServerConfig, wait: float = 2.0) -> List[str]:
+        """
+        Get container names, waiting briefly for the first load of a server
+        
+        Args:
+            server: Server configuration
+            wait: Seconds to wait when nothing has been cached yet
+        
+        Returns:
+            Container names
+        """
+        names = self.get_cached_names(server)
+        entry = self._get_entry(server)
+        if not entry.loaded and entry.refresh_task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(entry.refresh_task), wait)
+            except asyncio.TimeoutError:
+                pass
+            names = entry.names
+        return names
+    
+    def invalidate(self, server: ServerConfig) -> None:
+        """Mark a server's inventory stale and refresh it in the background"""
+        entry = self._get_entry(server)
+        entry.fetched_at = 0.0
+        entry.overview_fetched_at = 0.0
+        self._schedule_refresh(server, entry)
+    
+    async def get_overview(self, server: ServerConfig, refresh: bool = False) -> List[ContainerSummary]:
+        """
+        Get the state and resource usage of every container on a server
+        
+        Args:
+            server: Server configuration
+            refresh: Ignore the cached overview
+        
+        Returns:
+            List of ContainerSummary (cached for DOCKER_OVERVIEW_TTL seconds)
+        """
+        entry = self._get_entry(server)
+        if not refresh and entry.overview_fetched_at and time.monotonic() - entry.overview_fetched_at < settings.DOCKER_OVERVIEW_TTL:
+            return entry.overview
+        
+        # Concurrent requests share one fetch
+        if entry.overview_task is None or entry.overview_task.done():
+            entry.overview_task = asyncio.create_task(self._fetch_overview(server, entry))
+        return await asyncio.shield(entry.overview_task)
+    
+    async def _fetch_overview(self, server: ServerConfig, entry: _InventoryEntry) -> List[ContainerSummary]:
+        """Load the overview and refresh the names from it"""
+        started = time.monotonic()
+        overview = await DockerClient(server).get_overview()
+        entry.overview = overview
+        entry.overview_fetched_at = started
+        entry.names = sorted(container.name for container in overview)
+        entry.fetched_at = started
+        entry.loaded = True
+        return overview
+    
+    def _schedule_refresh(self, server: ServerConfig, entry: _InventoryEntry) -> None:
+        """Start a refresh unless one is already running"""
+        if entry.refresh_task is None or entry.refresh_task.done():
+            entry.refresh_task = asyncio.create_task(self._refresh(server, entry))
+    
+    async def _refresh(self, server: ServerConfig, entry: _InventoryEntry) -> None:
+        """Reload container names from the server"""
+        started = time.monotonic()
+        try:
+            names = await DockerClient(server).list_containers(raise_on_error=True)
+        except Exception as e:
+            # Keep serving the stale names
+            print(f"Failed to refresh container inventory on {server.display_name}: {e}")
+            return
+        entry.names = sorted(names)
+        entry.fetched_at = started
+        entry.loaded = True
+    
+    async def _watch_events(self, server: ServerConfig, entry: _InventoryEntry) -> None:
+        """
+        Apply docker container events to the inventory between refreshes
+        
+        The event stream never ends, so it runs as a background command and
+        leaves the server's command slots and the shared worker pool alone.
+        """
+        command = "docker events --filter type=container --format '{{.Action}} {{.Actor.Attributes.name}}'"
+        backoff = 5
+        while True:
+            try:
+                async for line in ssh_executor.stream(server, command, background=True):
+                    if line.stream != "stdout":
+                        continue
+                    action, _, name = line.text.strip().partition(" ")
+                    if not name:
+                        continue
+                    backoff = 5
+                    if action == "create" and name not in entry.names:
+                        entry.names = sorted(entry.names + [name])
+                    elif action == "destroy":
+                        entry.names = [n for n in entry.names if n != name]
+                    elif action == "rename":
+                        self.invalidate(server)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Docker event stream on {server.display_name} failed: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 300)
+
+
+# Global container inventory instance
+container_inventory = ContainerInventory()
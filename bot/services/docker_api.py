@@ -0,0 +1,310 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+from config import ServerConfig, settings
+from services.ssh_executor import ssh_executor
+
+
+# Remote command bridging the channel to the Docker daemon socket
+DIAL_COMMAND = "docker system dial-stdio"
+
+# Requests written before their responses are read
+MAX_PIPELINE = 32
+
+_RECV_SIZE = 32768
+
+
+class DockerAPIUnavailable(Exception):
+    """Raised when the Engine API cannot be reached, so callers can fall back to the CLI"""
+
+
+class DockerAPIError(Exception):
+    """An error response from the Engine API"""
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _HTTPChannel:
+    """
+    Minimal HTTP/1.1 client over an SSH channel
+    
+    Supports exactly what the Engine API needs: keep-alive, Content-Length
+    and chunked bodies, and pipelined requests whose responses are read in
+    order. All methods block and run in a worker thread.
+    """
+    
+    def __init__(self, channel, release):
+        self._channel = channel
+        self._release = release
+        self._buffer = b""
+        self.closed = False
+    
+    def _fill(self) -> None:
+        """Read more bytes from the channel"""
+        data = self._channel.recv(_RECV_SIZE)
+        if not data:
+            self.close()
+            raise EOFError("Docker API connection closed")
+        self._buffer += data
+    
+    def _read_until(self, delimiter: bytes) -> bytes:
+        while delimiter not in self._buffer:
+            self._fill()
+        data, _, self._buffer = self._buffer.partition(delimiter)
+        return data
+    
+    def _read_exactly(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            self._fill()
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+    
+    def send(self, requests: List[Tuple[str, str, Optional[bytes]]]) -> None:
+        """Write requests as one pipelined batch"""
+        payload = b""
+        for method, path, body in requests:
+            head = f"{method} {path} HTTP/1.1\r\nHost: docker\r\nConnection: keep-alive\r\n"
+            if body is not None:
+                head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            elif method in ("POST", "PUT"):
+                head += "Content-Length: 0\r\n"
+            payload += (head + "\r\n").encode() + (body or b"")
+        self._channel.sendall(payload)
+    
+    def read_response(self, method: str) -> Tuple[int, bytes]:
+        """Read one response (status code and body)"""
+        head = self._read_until(b"\r\n\r\n").decode("latin-1")
+        status_line, *header_lines = head.split("\r\n")
+        status = int(status_line.split(" ", 2)[1])
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self._read_until(b"\r\n").split(b";")[0], 16)
+                if size == 0:
+                    # Skip trailers up to the blank line
+                    while self._read_until(b"\r\n"):
+                        pass
+                    break
+                chunks.append(self._read_exactly(size))
+                self._read_exactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = self._read_exactly(int(headers["content-length"]))
+        else:
+            # No length: the body runs to the end of the connection
+            try:
+                while True:
+                    self._fill()
+            except EOFError:
+                pass
+            body, self._buffer = self._buffer, b""
+        
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, body
+    
+    def abort(self) -> None:
+        """Shut the channel down from another thread, waking a blocked read"""
+        self._channel.close()
+    
+    def close(self) -> None:
+        """Close the channel and return its pool slot"""
+        if not self.closed:
+            self.closed = True
+            self._release()
+
+
+class DockerAPISession:
+    """
+    Keep-alive Engine API connection to one server
+    
+    The channel runs `docker system dial-stdio`, which splices it onto the
+    daemon socket, so after the first request every call is a plain HTTP
+    exchange with no process spawned on the server. Requests on a session
+    are serialized; batches are pipelined. An idle session is closed after
+    DOCKER_API_IDLE_TIMEOUT seconds to give its SSH channel back.
+    """
+    
+    def __init__(self, server: ServerConfig):
+        self.server = server
+        self._http: Optional[_HTTPChannel] = None
+        self._lock = asyncio.Lock()
+        self._last_used = 0.0
+        self._idle_handle: Optional[asyncio.TimerHandle] = None
+    
+    def _connect(self) -> _HTTPChannel:
+        """Open the tunnel (blocking)"""
+        channel, release = ssh_executor.open_channel(self.server, DIAL_COMMAND)
+        channel.settimeout(settings.DOCKER_API_TIMEOUT)
+        return _HTTPChannel(channel, release)
+    
+    def _exchange(
+        self,
+        requests: List[Tuple[str, str, Optional[bytes]]],
+        abandoned: threading.Event
+    ) -> List[Tuple[int, bytes]]:
+        """Send a batch and read its responses (blocking), reconnecting once if the tunnel is stale"""
+        for attempt in range(2):
+            if abandoned.is_set():
+                raise DockerAPIUnavailable(f"Docker API request cancelled on {self.server.display_name}")
+            fresh = self._http is None or self._http.closed
+            if fresh:
+                self._http = self._connect()
+            responses = []
+            try:
+                self._http.send(requests)
+                for method, _, _ in requests:
+                    responses.append(self._http.read_response(method))
+                return responses
+            except (EOFError, OSError, socket.timeout, ValueError, IndexError) as e:
+                self._http.close()
+                # Only retry batches nothing was answered for, on a connection that had been idle
+                if fresh or responses or attempt:
+                    raise DockerAPIUnavailable(f"Docker API request failed on {self.server.display_name}: {e}")
+    
+    async def request_many(self, requests: List[Tuple[str, str, Any]]) -> List[Tuple[int, Any]]:
+        """
+        Send several requests over the session
+        
+        Args:
+            requests: (method, path, JSON body or None) tuples
+        
+        Returns:
+            (status, decoded JSON body or text) per request, in order
+        
+        Raises:
+            DockerAPIUnavailable: If the tunnel could not be opened or broke
+        """
+        encoded = [
+            (method, path, json.dumps(body).encode() if body is not None else None)
+            for method, path, body in requests
+        ]
+        results: List[Tuple[int, Any]] = []
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            try:
+                for start in range(0, len(encoded), MAX_PIPELINE):
+                    batch = encoded[start:start + MAX_PIPELINE]
+                    abandoned = threading.Event()
+                    exchange = loop.run_in_executor(None, self._exchange, batch, abandoned)
+                    try:
+                        responses = await asyncio.shield(exchange)
+                    except asyncio.CancelledError:
+                        await self._abandon(exchange, abandoned)
+                        raise
+                    except DockerAPIUnavailable:
+                        raise
+                    except Exception as e:
+                        raise DockerAPIUnavailable(f"Docker API unavailable on {self.server.display_name}: {e}")
+                    for status, body in responses:
+                        results.append((status, _decode(body)))
+            finally:
+                self._last_used = time.monotonic()
+                self._schedule_idle_close(loop)
+        return results
+    
+    async def _abandon(self, exchange: asyncio.Future, abandoned: threading.Event) -> None:
+        """
+        Stop a cancelled exchange and drop its channel
+        
+        The worker thread keeps using the channel after the caller is
+        cancelled, so the lock is held until it lets go; the channel is then
+        closed, or the next request would read this batch's responses.
+        """
+        abandoned.set()
+        if self._http is not None:
+            self._http.abort()
+        await asyncio.wait([exchange])
+        if not exchange.cancelled():
+            exchange.exception()  # Expected after the abort; retrieve it so it isn't logged
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+    
+    async def request(self, method: str, path: str, body: Any = None) -> Any:
+        """
+        Send one request and return its decoded body
+        
+        Raises:
+            DockerAPIError: On an error status
+            DockerAPIUnavailable: If the tunnel could not be opened or broke
+        """
+        [(status, data)] = await self.request_many([(method, path, body)])
+        if status >= 400:
+            raise DockerAPIError(status, error_message(data))
+        return data
+    
+    def _schedule_idle_close(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+        self._idle_handle = loop.call_later(settings.DOCKER_API_IDLE_TIMEOUT, self._close_if_idle)
+    
+    def _close_if_idle(self) -> None:
+        if self._lock.locked() or self._http is None:
+            return
+        if time.monotonic() - self._last_used >= settings.DOCKER_API_IDLE_TIMEOUT:
+            self._http.close()
+            self._http = None
+
+
+def _decode(body: bytes) -> Any:
+    """Decode a JSON response body, falling back to text"""
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode("utf-8", errors="replace")
+
+
+def error_message(data: Any) -> str:
+    """Get the message of an Engine API error body"""
+    if isinstance(data, dict):
+        return data.get("message", str(data))
+    return str(data or "").strip()
+
+
+def container_path(name: str, action: str = "") -> str:
+    """Build the API path of a container (or one of its actions)"""
+    path = f"/containers/{quote(name, safe='')}"
+    return f"{path}/{action}" if action else path
+
+
+def list_path(all_containers: bool = True, filters: Optional[Dict[str, List[str]]] = None) -> str:
+    """Build the API path listing containers"""
+    params = {"all": "1" if all_containers else "0"}
+    if filters:
+        params["filters"] = json.dumps(filters)
+    return f"/containers/json?{urlencode(params)}"
+
+
+class DockerAPISessions:
+    """Engine API sessions, one per server"""
+    
+    def __init__(self):
+        self._sessions: Dict[str, DockerAPISession] = {}
+    
+    def get(self, server: ServerConfig) -> DockerAPISession:
+        """Get the shared session of a server"""
+        session = self._sessions.get(server.name)
+        if session is None:
+            session = DockerAPISession(server)
+            self._sessions[server.name] = session
+        return session
+
+
+# Global Docker API session registry
+docker_api_sessions = DockerAPISessions()
@@ -1,10 +1,350 @@
-from typing import List
+import asyncio
+import fnmatch
+import json
+import re
+import shlex
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
 from config import ServerConfig
-from services.ssh_executor import ssh_executor
+from services.ssh_executor import ssh_executor, CommandStream
+from services.docker_api import (
+    DockerAPISession,
+    DockerAPIUnavailable,
+    container_path,
+    docker_api_sessions,
+    error_message,
+    list_path,
+)
+
+
+# Container the bot runs in; never paused
+BOT_CONTAINER_NAME = "discord-server-bot"
+
+# Maximum characters of container names per docker invocation
+MAX_ARGV_CHARS = 16384
+
+# Maximum concurrent docker invocations for one bulk action
+BULK_FAN_OUT = 4
+
+# Separates the sections of the overview command's output
+_OVERVIEW_MARKER = "@@server-manager@@"
+
+# ps, stats and inspect of every container in one invocation; stats only lists running containers
+OVERVIEW_COMMAND = (
+    "docker ps -a --no-trunc --format '{{json .}}' || exit $?; "
+    f"echo {_OVERVIEW_MARKER}; "
+    "docker stats --no-stream --format '{{json .}}'; "
+    f"echo {_OVERVIEW_MARKER}; "
+    "docker ps -aq | xargs -r docker inspect --format "
+    "'{{.Name}}\t{{.RestartCount}}\t{{if .State.Health}}{{.State.Health.Status}}{{end}}'"
+)
+
+# Compose sets this label on every container of a project
+COMPOSE_PROJECT_LABEL = "com.docker.compose.project"
+
+# Characters allowed in name, image and project globs (keeps them safe to turn into awk regexes)
+_GLOB_RE = re.compile(r"^[A-Za-z0-9_.:/@*?-]+$")
+_LABEL_RE = re.compile(r"^[A-Za-z0-9_.-]+(=[A-Za-z0-9_.:/@-]*)?$")
+
+_SIZE_RE = re.compile(r"^([\d.]+)\s*([KMGTP]?i?B)$", re.IGNORECASE)
+_SIZE_UNITS = {
+    "b": 1,
+    "kb": 1000, "mb": 1000 ** 2, "gb": 1000 ** 3, "tb": 1000 ** 4, "pb": 1000 ** 5,
+    "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4, "pib": 1024 ** 5,
+}
+
+
+@dataclass
+class BulkActionResult:
+    """Per-container outcome of a bulk docker action"""
+    succeeded: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    listing_failed: bool = False
+    
+    @property
+    def count(self) -> int:
+        """Number of containers the action succeeded on"""
+        return len(self.succeeded)
+
+
+@dataclass
+class ContainerSummary:
+    """State, health and resource usage of one container"""
+    name: str
+    image: str
+    state: str  # e.g. running, exited, paused, restarting
+    status: str  # e.g. "Up 2 hours (healthy)"
+    health: Optional[str] = None
+    restarts: int = 0
+    cpu_percent: Optional[float] = None
+    memory_bytes: Optional[int] = None
+    memory_percent: Optional[float] = None
+
+
+def _parse_percent(value: str) -> Optional[float]:
+    """Parse a docker stats percentage such as 1.25%"""
+    try:
+        return float(value.strip().rstrip("%"))
+    except ValueError:
+        return None
+
+
+def _parse_size(value: str) -> Optional[int]:
+    """Parse a docker stats size such as "12.5MiB" into bytes"""
+    match = _SIZE_RE.match(value.strip())
+    if not match:
+        return None
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()])
+
+
+def parse_overview(output: str) -> List[ContainerSummary]:
+    """
+    Parse the output of OVERVIEW_COMMAND
+    
+    Args:
+        output: Command output
+    
+    Returns:
+        One ContainerSummary per container
+    """
+    sections = output.split(_OVERVIEW_MARKER + "\n")
+    ps_section = sections[0]
+    stats_section = sections[1] if len(sections) > 1 else ""
+    inspect_section = sections[2] if len(sections) > 2 else ""
+    
+    containers: Dict[str, ContainerSummary] = {}
+    for line in ps_section.splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        # Containers with legacy links list several names
+        name = entry.get("Names", "").split(",")[0]
+        containers[name] = ContainerSummary(
+            name=name,
+            image=entry.get("Image", ""),
+            state=entry.get("State", ""),
+            status=entry.get("Status", "")
+        )
+    
+    for line in stats_section.splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        container = containers.get(entry.get("Name", ""))
+        if container is None:
+            continue
+        container.cpu_percent = _parse_percent(entry.get("CPUPerc", ""))
+        container.memory_bytes = _parse_size(entry.get("MemUsage", "").split("/")[0])
+        container.memory_percent = _parse_percent(entry.get("MemPerc", ""))
+    
+    for line in inspect_section.splitlines():
+        fields = line.split("\t")
+        if len(fields) < 2:
+            continue
+        container = containers.get(fields[0].lstrip("/"))
+        if container is None:
+            continue
+        container.restarts = int(fields[1]) if fields[1].isdigit() else 0
+        container.health = fields[2] if len(fields) > 2 and fields[2] else None
+    
+    return list(containers.values())
+
+
+@dataclass
+class ContainerFilter:
+    """
+    Selects containers by name, image, compose project and label
+    
+    Terms of the same kind are alternatives; different kinds must all
+    match. Labels follow docker's own semantics, so every label term must
+    match.
+    """
+    names: List[str] = field(default_factory=list)  # globs
+    images: List[str] = field(default_factory=list)  # globs
+    projects: List[str] = field(default_factory=list)  # globs
+    labels: List[str] = field(default_factory=list)  # key or key=value
+    
+    @classmethod
+    def parse(cls, terms: Iterable[str]) -> "ContainerFilter":
+        """
+        Parse filter terms
+        
+        Terms are name=<glob>, image=<glob>, project=<glob> or
+        label=<key>[=<value>]; a bare term is a name glob.
+        
+        Args:
+            terms: Filter terms, e.g. "project=media" or "plex*"
+        
+        Returns:
+            ContainerFilter
+        
+        Raises:
+            ValueError: If a term is malformed
+        """
+        result = cls()
+        for term in terms:
+            key, sep, value = term.partition("=")
+            if not sep:
+                key, value = "name", term
+            if key == "label":
+                if not _LABEL_RE.match(value):
+                    raise ValueError(f"Invalid label filter '{value}'")
+                result.labels.append(value)
+                continue
+            targets = {"name": result.names, "image": result.images, "project": result.projects}.get(key)
+            if targets is None:
+                raise ValueError(f"Unknown filter '{key}' (use name, image, project or label)")
+            if not _GLOB_RE.match(value):
+                raise ValueError(f"Invalid {key} pattern '{value}'")
+            targets.append(value)
+        return result
+    
+    @classmethod
+    def from_expression(cls, expression: Optional[str]) -> "ContainerFilter":
+        """Parse a whitespace-separated filter expression (empty matches everything)"""
+        return cls.parse((expression or "").split())
+    
+    @property
+    def empty(self) -> bool:
+        """Whether the filter matches every container"""
+        return not (self.names or self.images or self.projects or self.labels)
+    
+    def describe(self) -> str:
+        """Format the filter as an expression"""
+        terms = [f"name={name}" for name in self.names]
+        terms += [f"image={image}" for image in self.images]
+        terms += [f"project={project}" for project in self.projects]
+        terms += [f"label={label}" for label in self.labels]
+        return " ".join(terms)
+    
+    def matches(self, name: str, image: str, labels: Dict[str, str]) -> bool:
+        """Check a container against the filter locally"""
+        project = labels.get(COMPOSE_PROJECT_LABEL, "")
+        for patterns, value in ((self.names, name), (self.images, image), (self.projects, project)):
+            if patterns and not any(fnmatch.fnmatchcase(value, pattern) for pattern in patterns):
+                return False
+        for label in self.labels:
+            key, sep, value = label.partition("=")
+            if key not in labels or (sep and labels[key] != value):
+                return False
+        return True
+    
+    def matches_any(self, name: str, image: str, labels: Dict[str, str]) -> bool:
+        """Check whether any single term matches a container (used for exclusion lists)"""
+        return any(
+            term.matches(name, image, labels)
+            for term in self._split()
+        )
+    
+    def _split(self) -> List["ContainerFilter"]:
+        """Get one filter per term"""
+        return (
+            [ContainerFilter(names=[name]) for name in self.names]
+            + [ContainerFilter(images=[image]) for image in self.images]
+            + [ContainerFilter(projects=[project]) for project in self.projects]
+            + [ContainerFilter(labels=[label]) for label in self.labels]
+        )
+
+
+def _glob_regex(patterns: List[str]) -> str:
+    """Turn globs into one anchored awk regex (empty if there are none)"""
+    if not patterns:
+        return ""
+    alternatives = [
+        pattern.replace(".", "[.]").replace("*", ".*").replace("?", ".")
+        for pattern in patterns
+    ]
+    return "^(" + "|".join(alternatives) + ")$"
+
+
+def _label_regex(labels: List[str]) -> str:
+    """Turn label terms into an awk regex matched against docker's comma-separated Labels column"""
+    if not labels:
+        return ""
+    alternatives = [
+        label.replace(".", "[.]") + ("" if "=" in label else "(=[^,]*)?")
+        for label in labels
+    ]
+    return "(^|,)(" + "|".join(alternatives) + ")(,|$)"
+
+
+def build_list_command(status: str, include: ContainerFilter, exclude: ContainerFilter) -> str:
+    """
+    Build a docker ps command listing the names of matching containers
+    
+    Status and labels are passed to docker ps --filter; globs and
+    exclusions are applied by awk on the server, so only matching names
+    are sent back.
+    
+    Args:
+        status: Container status to list (e.g. running)
+        include: Containers to list
+        exclude: Containers to leave out if any of its terms matches
+    
+    Returns:
+        Shell command
+    """
+    docker_filters = [f"status={status}"] + [f"label={label}" for label in include.labels]
+    listing = "docker ps " + " ".join(f"--filter {shlex.quote(item)}" for item in docker_filters)
+    listing += " --format '{{.Names}}\t{{.Image}}\t{{.Label \"" + COMPOSE_PROJECT_LABEL + "\"}}\t{{.Labels}}'"
+    # Keep docker's exit code instead of the pipeline's
+    command = f'rows=$({listing}) || exit $?; printf "%s\\n" "$rows"'
+    
+    variables = {
+        "name": _glob_regex(include.names),
+        "image": _glob_regex(include.images),
+        "project": _glob_regex(include.projects),
+        "xname": _glob_regex(exclude.names),
+        "ximage": _glob_regex(exclude.images),
+        "xproject": _glob_regex(exclude.projects),
+        "xlabel": _label_regex(exclude.labels),
+    }
+    if not any(variables.values()):
+        return command + " | cut -f1 | sed '/^$/d'"
+    
+    program = (
+        '(name == "" || $1 ~ name) && (image == "" || $2 ~ image) && (project == "" || $3 ~ project)'
+        ' && !(xname != "" && $1 ~ xname) && !(ximage != "" && $2 ~ ximage)'
+        ' && !(xproject != "" && $3 ~ xproject) && !(xlabel != "" && $4 ~ xlabel) { print $1 }'
+    )
+    assignments = " ".join(f"-v {key}={shlex.quote(value)}" for key, value in variables.items())
+    return f"{command} | awk -F '\t' {assignments} {shlex.quote(program)}"
+
+
+def _error_for(name: str, error_lines: List[str]) -> Optional[str]:
+    """Find the error line about a container, matching its whole name (so plex never takes plex-db's error)"""
+    # Container names consist of letters, digits and _.-, so any other character delimits one
+    pattern = re.compile(r"(?<![\w.-])" + re.escape(name) + r"(?![\w.-])")
+    return next((line for line in error_lines if pattern.search(line)), None)
+
+
+def _chunk_arguments(names: List[str], max_chars: int = MAX_ARGV_CHARS) -> List[List[str]]:
+    """Split names into chunks whose combined length stays under max_chars"""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for name in names:
+        if current and size + len(name) + 1 > max_chars:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(name)
+        size += len(name) + 1
+    if current:
+        chunks.append(current)
+    return chunks
 
 
 class DockerClient:
-    """Client for managing Docker containers on remote servers"""
+    """
+    Client for managing Docker containers on remote servers
+    
+    By default every call runs the docker CLI over SSH. Servers with
+    `docker.backend: "api"` talk to the Engine API instead, through a
+    keep-alive tunnel to the daemon socket; if the tunnel cannot be used,
+    the call falls back to the CLI.
+    """
     
     def __init__(self, server: ServerConfig):
         """
@@ -16,90 +356,251 @@ class DockerClient:
         self.server = server
         self.server_name = server.name
     
-    def _execute_docker_command(self, command: str, timeout: int = 30) -> tuple[str, str, int]:
+    def _api(self) -> Optional[DockerAPISession]:
+        """Get the Engine API session if this server uses the API backend"""
+        if self.server.get_docker_config().get("backend") == "api":
+            return docker_api_sessions.get(self.server)
+        return None
+    
+    async def _api_names(self, session: DockerAPISession, status: Optional[str] = None) -> List[str]:
+        """List container names through the Engine API"""
+        filters = {"status": [status]} if status else None
+        containers = await session.request("GET", list_path(True, filters))
+        return [container["Names"][0].lstrip("/") for container in containers if container.get("Names")]
+    
+    async def _execute_docker_command(self, command: str, timeout: int = 30) -> tuple[str, str, int]:
         """Execute a docker command on the remote server"""
         full_command = f"docker {command}"
-        return ssh_executor.execute_command(self.server, full_command, timeout)
+        return await ssh_executor.run(self.server, full_command, timeout)
     
-    def pause_all(self) -> int:
+    async def _bulk_action(self, action: str, container_names: List[str]) -> BulkActionResult:
         """
-        Pause all running Docker containers (except the bot itself)
+        Apply a docker action to many containers with as few execs as possible
+        
+        Names are passed to a single `docker <action> a b c ...` per chunk, and
+        chunks run concurrently with a bounded fan-out. docker prints the name
+        of each container it handled, which gives the per-container outcome.
+        With the API backend, one request per container is pipelined over
+        the session's tunnel instead.
         
+        Args:
+            action: docker subcommand accepting several containers (e.g. pause)
+            container_names: Containers to act on
+            
         Returns:
-            Number of containers paused
+            BulkActionResult with per-container outcome
         """
-        # Get list of running containers
-        stdout, stderr, exit_code = self._execute_docker_command(
-            "ps --format '{{.Names}}' --filter status=running"
-        )
+        result = BulkActionResult()
         
-        if exit_code != 0:
-            print(f"Failed to list containers: {stderr}")
-            return 0
+        session = self._api()
+        if session:
+            try:
+                responses = await session.request_many(
+                    [("POST", container_path(name, action), None) for name in container_names]
+                )
+            except DockerAPIUnavailable as e:
+                print(f"{e}; falling back to the docker CLI")
+            else:
+                for name, (status, data) in zip(container_names, responses):
+                    if status < 300:
+                        result.succeeded.append(name)
+                    else:
+                        result.failed[name] = error_message(data)
+                        print(f"Failed to {action} {name}: {result.failed[name]}")
+                return result
         
-        container_names = [name.strip() for name in stdout.strip().split('\n') if name.strip()]
-        paused_count = 0
+        semaphore = asyncio.Semaphore(BULK_FAN_OUT)
         
-        for container_name in container_names:
-            # Don't pause the bot itself
-            if container_name == "discord-server-bot":
-                continue
+        async def run_chunk(chunk: List[str]) -> None:
+            async with semaphore:
+                args = " ".join(shlex.quote(name) for name in chunk)
+                stdout, stderr, exit_code = await self._execute_docker_command(f"{action} {args}", timeout=60)
             
-            stdout, stderr, exit_code = self._execute_docker_command(f"pause {container_name}")
-            if exit_code == 0:
-                paused_count += 1
-            else:
-                print(f"Failed to pause {container_name}: {stderr}")
+            handled = set(stdout.split())
+            error_lines = [line for line in stderr.splitlines() if line.strip()]
+            for name in chunk:
+                if name in handled:
+                    result.succeeded.append(name)
+                    continue
+                error = _error_for(name, error_lines)
+                result.failed[name] = error or stderr.strip() or f"exit code {exit_code}"
+                print(f"Failed to {action} {name}: {result.failed[name]}")
         
-        return paused_count
+        await asyncio.gather(*(run_chunk(chunk) for chunk in _chunk_arguments(container_names)))
+        return result
     
-    def resume_all(self) -> int:
+    def _exclusions(self) -> ContainerFilter:
         """
-        Resume all paused Docker containers
+        Get the containers bulk actions never touch
         
-        Returns:
-            Number of containers resumed
+        Raises:
+            ValueError: If the server's docker.exclude list is malformed
         """
-        # Get list of paused containers
-        stdout, stderr, exit_code = self._execute_docker_command(
-            "ps --format '{{.Names}}' --filter status=paused"
+        exclude = ContainerFilter.parse(self.server.get_docker_config().get("exclude") or [])
+        exclude.names.append(BOT_CONTAINER_NAME)
+        return exclude
+    
+    async def _list_by_status(
+        self,
+        status: str,
+        include: Optional[ContainerFilter] = None,
+        exclude: Optional[ContainerFilter] = None
+    ) -> Optional[List[str]]:
+        """List names of matching containers with a given status (None if listing failed)"""
+        include = include or ContainerFilter()
+        exclude = exclude or ContainerFilter()
+        
+        session = self._api()
+        if session:
+            try:
+                containers = await session.request("GET", list_path(True, {"status": [status]}))
+            except DockerAPIUnavailable as e:
+                print(f"{e}; falling back to the docker CLI")
+            except Exception as e:
+                print(f"Failed to list containers: {e}")
+                return None
+            else:
+                names = []
+                for container in containers:
+                    if not container.get("Names"):
+                        continue
+                    name = container["Names"][0].lstrip("/")
+                    image = container.get("Image", "")
+                    labels = container.get("Labels") or {}
+                    if include.matches(name, image, labels) and not exclude.matches_any(name, image, labels):
+                        names.append(name)
+                return names
+        
+        stdout, stderr, exit_code = await ssh_executor.run(
+            self.server, build_list_command(status, include, exclude), 30
         )
         
         if exit_code != 0:
             print(f"Failed to list containers: {stderr}")
-            return 0
+            return None
         
-        container_names = [name.strip() for name in stdout.strip().split('\n') if name.strip()]
-        resumed_count = 0
+        return [name.strip() for name in stdout.strip().split('\n') if name.strip()]
+    
+    async def list_matching(self, status: str, include: Optional[ContainerFilter] = None) -> Optional[List[str]]:
+        """
+        List the containers a bulk action with a filter would touch
         
-        for container_name in container_names:
-            stdout, stderr, exit_code = self._execute_docker_command(f"unpause {container_name}")
-            if exit_code == 0:
-                resumed_count += 1
-            else:
-                print(f"Failed to unpause {container_name}: {stderr}")
+        Running containers are listed for pausing, so the exclusions apply.
+        
+        Args:
+            status: Container status (running or paused)
+            include: Containers to select (None for all)
+        
+        Returns:
+            Container names, or None if listing failed
+        
+        Raises:
+            ValueError: If the server's docker.exclude list is malformed
+        """
+        exclude = self._exclusions() if status == "running" else None
+        return await self._list_by_status(status, include, exclude)
+    
+    async def pause_all(self, include: Optional[ContainerFilter] = None) -> BulkActionResult:
+        """
+        Pause running Docker containers (except excluded ones and the bot itself)
+        
+        Args:
+            include: Containers to pause (None for all)
+        
+        Returns:
+            BulkActionResult with the paused and failed containers
+        
+        Raises:
+            ValueError: If the server's docker.exclude list is malformed
+        """
+        container_names = await self.list_matching("running", include)
+        if container_names is None:
+            return BulkActionResult(listing_failed=True)
+        
+        return await self._bulk_action("pause", container_names)
+    
+    async def resume_all(self, include: Optional[ContainerFilter] = None) -> BulkActionResult:
+        """
+        Resume paused Docker containers
+        
+        Args:
+            include: Containers to resume (None for all)
+        
+        Returns:
+            BulkActionResult with the resumed and failed containers
+        """
+        container_names = await self.list_matching("paused", include)
+        if container_names is None:
+            return BulkActionResult(listing_failed=True)
+        
+        return await self._bulk_action("unpause", container_names)
+    
+    async def resume_containers(self, container_names: List[str]) -> BulkActionResult:
+        """
+        Resume specific paused containers (e.g. the ones a maintenance run paused)
+        
+        Args:
+            container_names: Containers to resume
+        
+        Returns:
+            BulkActionResult with the resumed and failed containers
+        """
+        return await self._bulk_action("unpause", container_names)
+    
+    async def get_overview(self) -> List[ContainerSummary]:
+        """
+        Get state, health, restart count and resource usage of every container
+        
+        ps, stats and inspect run in a single remote invocation, so this is
+        one round trip however many containers the server has.
+        
+        Returns:
+            List of ContainerSummary
         
-        return resumed_count
+        Raises:
+            RuntimeError: If the containers could not be listed
+        """
+        stdout, stderr, exit_code = await ssh_executor.run(self.server, OVERVIEW_COMMAND, timeout=60)
+        if exit_code != 0 and _OVERVIEW_MARKER not in stdout:
+            raise RuntimeError(f"Failed to list containers: {stderr.strip()}")
+        return parse_overview(stdout)
     
-    def list_containers(self) -> List[str]:
+    async def list_containers(self, raise_on_error: bool = False) -> List[str]:
         """
         List all Docker containers
         
+        Args:
+            raise_on_error: Raise RuntimeError instead of returning an empty list on failure
+        
         Returns:
             List of container names
         """
-        stdout, stderr, exit_code = self._execute_docker_command(
+        session = self._api()
+        if session:
+            try:
+                return await self._api_names(session)
+            except DockerAPIUnavailable as e:
+                print(f"{e}; falling back to the docker CLI")
+            except Exception as e:
+                if raise_on_error:
+                    raise RuntimeError(f"Failed to list containers: {e}")
+                print(f"Failed to list containers: {e}")
+                return []
+        
+        stdout, stderr, exit_code = await self._execute_docker_command(
             "ps -a --format '{{.Names}}'"
         )
         
         if exit_code != 0:
+            if raise_on_error:
+                raise RuntimeError(f"Failed to list containers: {stderr.strip()}")
             print(f"Failed to list containers: {stderr}")
             return []
         
         container_names = [name.strip() for name in stdout.strip().split('\n') if name.strip()]
         return container_names
     
-    def restart_container(self, container_name: str) -> str:
+    async def restart_container(self, container_name: str) -> str:
         """
         Restart a specific container
         
@@ -109,7 +610,22 @@ class DockerClient:
         Returns:
             Status message
         """
-        stdout, stderr, exit_code = self._execute_docker_command(f"restart {container_name}")
+        session = self._api()
+        if session:
+            try:
+                [(status, data)] = await session.request_many(
+                    [("POST", container_path(container_name, "restart") + "?t=10", None)]
+                )
+            except DockerAPIUnavailable as e:
+                print(f"{e}; falling back to the docker CLI")
+            else:
+                if status < 300:
+                    return f"Successfully restarted {container_name}"
+                if status == 404:
+                    return f"Container {container_name} not found."
+                return f"Failed to restart {container_name}: {error_message(data)}"
+        
+        stdout, stderr, exit_code = await self._execute_docker_command(f"restart {shlex.quote(container_name)}")
         
         if exit_code == 0:
             return f"Successfully restarted {container_name}"
@@ -118,7 +634,7 @@ class DockerClient:
                 return f"Container {container_name} not found."
             return f"Failed to restart {container_name}: {stderr}"
     
-    def get_container_logs(self, container_name: str, tail: int = 20) -> str:
+    async def get_container_logs(self, container_name: str, tail: int = 20) -> str:
         """
         Get logs for a specific container
         
@@ -129,8 +645,8 @@ class DockerClient:
         Returns:
             Container logs
         """
-        stdout, stderr, exit_code = self._execute_docker_command(
-            f"logs --tail {tail} {container_name}"
+        stdout, stderr, exit_code = await self._execute_docker_command(
+            f"logs --tail {int(tail)} {shlex.quote(container_name)}"
         )
         
         if exit_code == 0:
@@ -139,4 +655,20 @@ class DockerClient:
             if "No such container" in stderr:
                 return f"Container {container_name} not found."
             return f"Failed to get logs for {container_name}: {stderr}"
-
+    
+    def stream_container_logs(self, container_name: str, tail: int = 20) -> CommandStream:
+        """
+        Stream logs for a specific container without buffering them in memory
+        
+        Args:
+            container_name: Name of the container
+            tail: Number of lines to retrieve
+        
+        Returns:
+            CommandStream of the log lines (the container's stdout and stderr interleaved)
+        """
+        return ssh_executor.stream(
+            self.server,
+            f"docker logs --tail {int(tail)} {shlex.quote(container_name)}",
+            timeout=120
+        )
@@ -1,37 +1,292 @@
-from config import ServerConfig
+import asyncio
+import shlex
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+from config import ServerConfig, settings
 from services.ssh_executor import ssh_executor
 
 
-def get_disk_usage(server: ServerConfig, path_key: str) -> str:
+@dataclass
+class FilesystemInfo:
+    """df view of the filesystem holding a path"""
+    mount_point: str
+    total_bytes: int
+    used_bytes: int
+    available_bytes: int
+    measured_at: float
+
+
+@dataclass
+class DirectorySize:
+    """Size of a directory measured by a du crawl"""
+    size_bytes: int
+    measured_at: float
+
+
+@dataclass
+class DiskUsageReport:
+    """Answer to a disk usage query, built from cached measurements"""
+    path: str
+    size: Optional[DirectorySize] = None
+    filesystem: Optional[FilesystemInfo] = None
+    is_mount_point: bool = False
+    children: List[Tuple[str, int]] = field(default_factory=list)
+    crawl_started: Optional[float] = None
+    crawl_queued: bool = False
+    error: Optional[str] = None
+
+
+def format_bytes(size: float) -> str:
+    """Format a byte count in human-readable units"""
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(size) < 1024 or unit == "TB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_age(timestamp: float) -> str:
+    """Format how long ago a timestamp was"""
+    seconds = max(0, int(time.time() - timestamp))
+    if seconds < 60:
+        return f"{seconds}s ago"
+    if seconds < 3600:
+        return f"{seconds // 60}m ago"
+    if seconds < 86400:
+        return f"{seconds // 3600}h {seconds % 3600 // 60}m ago"
+    return f"{seconds // 86400}d {seconds % 86400 // 3600}h ago"
+
+
+def build_df_command(paths: Dict[str, str]) -> str:
     """
-    Get disk usage for a specific path on a remote server
+    Build a command reporting df for several paths, one labelled row per path
+    
+    Each path gets its own df, so a missing or unmounted path yields an
+    error row for itself instead of shifting every row after it.
+    
+    Args:
+        paths: Paths keyed by a label (e.g. the configured path key)
+    
+    Returns:
+        Shell command printing "<label>\t<df row or error>" per path
+    """
+    return "; ".join(
+        f"printf '%s\\t' {shlex.quote(key)}; df -P -B1 {shlex.quote(path)} 2>&1 | tail -n 1"
+        for key, path in paths.items()
+    )
+
+
+def parse_df_rows(output: str) -> Tuple[Dict[str, FilesystemInfo], Dict[str, str]]:
+    """
+    Parse the output of build_df_command
+    
+    Returns:
+        Tuple of (filesystem info by label, error message by label)
+    """
+    infos: Dict[str, FilesystemInfo] = {}
+    errors: Dict[str, str] = {}
+    now = time.time()
+    for line in output.splitlines():
+        key, sep, row = line.partition("\t")
+        if not sep:
+            continue
+        fields = row.split()
+        try:
+            infos[key] = FilesystemInfo(
+                mount_point=" ".join(fields[5:]),
+                total_bytes=int(fields[1]),
+                used_bytes=int(fields[2]),
+                available_bytes=int(fields[3]),
+                measured_at=now
+            )
+        except (ValueError, IndexError):
+            errors[key] = row.strip() or "no output from df"
+    return infos, errors
+
+
+def resolve_path(server: ServerConfig, path_key: str) -> Optional[str]:
+    """
+    Resolve a configured path key to its path on the server
     
     Args:
         server: Server configuration
         path_key: Key identifying the path in server config
-        
+    
     Returns:
-        Disk usage string in human-readable format
+        The configured path, or None if the key is unknown
     """
     fs_config = server.get_filesystem_config()
     if not fs_config:
-        return f"Server {server.name} does not have filesystem configuration"
+        return None
+    return fs_config.get('paths', {}).get(path_key)
+
+
+class DiskUsageIndex:
+    """
+    Cached disk usage per server path
+    
+    Mount points are answered from df, which is instant. Directory sizes come
+    from background du crawls that record every immediate subdirectory too,
+    so a query never waits on a crawl and reports the age of what it returns.
+    Crawls of one server run one at a time, since its paths usually share
+    disks, and as background commands, so a crawl lasting hours never holds
+    one of the server's command slots.
+    """
+    
+    def __init__(self):
+        self._sizes: Dict[str, Dict[str, DirectorySize]] = {}
+        self._filesystems: Dict[str, Dict[str, FilesystemInfo]] = {}
+        # Time each queued or running crawl was requested
+        self._crawls: Dict[Tuple[str, str], float] = {}
+        self._crawl_queues: Dict[str, Deque[str]] = {}
+        self._crawl_workers: Dict[str, asyncio.Task] = {}
+        self._crawling: Dict[str, str] = {}
+    
+    def get_cached_size(self, server: ServerConfig, path: str) -> Optional[DirectorySize]:
+        """Get the last measured size of a path, if any crawl covered it"""
+        return self._sizes.get(server.name, {}).get(path.rstrip("/") or "/")
+    
+    def get_children(self, server: ServerConfig, path: str) -> List[Tuple[str, int]]:
+        """Get cached immediate subdirectories of a path, largest first"""
+        prefix = (path.rstrip("/") or "") + "/"
+        children = [
+            (child_path[len(prefix):], entry.size_bytes)
+            for child_path, entry in self._sizes.get(server.name, {}).items()
+            if child_path.startswith(prefix) and "/" not in child_path[len(prefix):]
+        ]
+        return sorted(children, key=lambda item: item[1], reverse=True)
+    
+    async def _get_filesystem(self, server: ServerConfig, path: str) -> FilesystemInfo:
+        """Get df information for the filesystem holding a path (cached briefly)"""
+        cached = self._filesystems.get(server.name, {}).get(path)
+        if cached and time.time() - cached.measured_at < settings.DISK_USAGE_DF_TTL:
+            return cached
+        
+        cmd = f"df -P -B1 {shlex.quote(path)} | tail -n 1"
+        stdout, stderr, exit_code = await ssh_executor.run(server, cmd, timeout=15)
+        fields = stdout.split()
+        if exit_code != 0 or len(fields) < 6:
+            raise RuntimeError(f"Error running df: {stderr.strip() or stdout.strip()}")
+        
+        info = FilesystemInfo(
+            mount_point=" ".join(fields[5:]),
+            total_bytes=int(fields[1]),
+            used_bytes=int(fields[2]),
+            available_bytes=int(fields[3]),
+            measured_at=time.time()
+        )
+        self._filesystems.setdefault(server.name, {})[path] = info
+        return info
+    
+    def start_crawl(self, server: ServerConfig, path: str) -> float:
+        """
+        Queue a background du crawl of a path unless one is already queued or running
+        
+        Returns:
+            Time the crawl was requested
+        """
+        key = (server.name, path)
+        if key in self._crawls:
+            return self._crawls[key]
+        
+        requested = time.time()
+        self._crawls[key] = requested
+        self._crawl_queues.setdefault(server.name, deque()).append(path)
+        worker = self._crawl_workers.get(server.name)
+        if worker is None or worker.done():
+            self._crawl_workers[server.name] = asyncio.create_task(self._run_crawls(server))
+        return requested
     
-    paths = fs_config.get('paths', {})
-    path = paths.get(path_key)
+    def get_crawl_started(self, server: ServerConfig, path: str) -> Optional[float]:
+        """Get the request time of a queued or running crawl of a path, if any"""
+        return self._crawls.get((server.name, path))
     
-    if not path:
-        available_paths = ', '.join(paths.keys()) if paths else 'none'
-        return f"Invalid path key '{path_key}'. Available paths: {available_paths}"
+    def is_crawl_queued(self, server: ServerConfig, path: str) -> bool:
+        """Check whether a crawl of a path is waiting for another crawl of the server"""
+        return (server.name, path) in self._crawls and self._crawling.get(server.name) != path
     
-    # Execute du command remotely
-    cmd = f"du -sh {path}"
-    stdout, stderr, exit_code = ssh_executor.execute_command(server, cmd, timeout=30)
+    async def _run_crawls(self, server: ServerConfig) -> None:
+        """Crawl a server's queued paths one after another"""
+        queue = self._crawl_queues[server.name]
+        while queue:
+            path = queue.popleft()
+            self._crawling[server.name] = path
+            try:
+                await self._crawl(server, path)
+            except Exception as e:
+                print(f"Disk usage crawl of {path} on {server.display_name} failed: {e}")
+            finally:
+                self._crawling.pop(server.name, None)
+                self._crawls.pop((server.name, path), None)
     
-    if exit_code == 0:
-        return stdout.strip()
-    else:
-        return f"Error checking disk usage: {stderr}"
+    async def _crawl(self, server: ServerConfig, path: str) -> None:
+        """Measure a path and its immediate subdirectories with a low-priority du"""
+        started = time.time()
+        quoted = shlex.quote(path)
+        cmd = (
+            f"$(command -v ionice >/dev/null 2>&1 && echo ionice -c3) "
+            f"nice -n 19 du -x -B1 --max-depth=1 {quoted}"
+        )
+        stdout, stderr, exit_code = await ssh_executor.run(
+            server, cmd, timeout=settings.DISK_USAGE_CRAWL_TIMEOUT, background=True
+        )
+        
+        # du exits non-zero on unreadable entries but still reports totals
+        sizes = {}
+        for line in stdout.splitlines():
+            size, _, entry_path = line.partition("\t")
+            if size.isdigit() and entry_path:
+                sizes[entry_path.rstrip("/") or "/"] = DirectorySize(int(size), started)
+        
+        if (path.rstrip("/") or "/") not in sizes:
+            print(f"Disk usage crawl of {path} on {server.display_name} failed: {stderr.strip()}")
+            return
+        
+        self._sizes.setdefault(server.name, {}).update(sizes)
+    
+    async def query(self, server: ServerConfig, path_key: str, refresh: bool = False) -> DiskUsageReport:
+        """
+        Get disk usage for a configured path without waiting for du
+        
+        Args:
+            server: Server configuration
+            path_key: Key identifying the path in server config
+            refresh: Start a new crawl even if the cached size is recent
+        
+        Returns:
+            DiskUsageReport with cached sizes and their ages
+        """
+        path = resolve_path(server, path_key)
+        if not path:
+            fs_config = server.get_filesystem_config() or {}
+            paths = fs_config.get('paths', {})
+            available_paths = ', '.join(paths.keys()) if paths else 'none'
+            return DiskUsageReport(
+                path=path_key,
+                error=f"Invalid path key '{path_key}'. Available paths: {available_paths}"
+            )
+        
+        report = DiskUsageReport(path=path)
+        report.size = self.get_cached_size(server, path)
+        report.children = self.get_children(server, path)
+        
+        stale = report.size is None or time.time() - report.size.measured_at > settings.DISK_USAGE_MAX_AGE
+        if refresh or stale:
+            report.crawl_started = self.start_crawl(server, path)
+        else:
+            report.crawl_started = self.get_crawl_started(server, path)
+        report.crawl_queued = self.is_crawl_queued(server, path)
+        
+        try:
+            report.filesystem = await self._get_filesystem(server, path)
+            report.is_mount_point = report.filesystem.mount_point.rstrip("/") == path.rstrip("/")
+        except Exception as e:
+            if report.size is None:
+                report.error = str(e)
+        
+        return report
 
 
 def get_available_paths(server: ServerConfig) -> list[str]:
@@ -40,7 +295,7 @@ def get_available_paths(server: ServerConfig) -> list[str]:
     
     Args:
         server: Server configuration
-        
+    
     Returns:
         List of path keys
     """
@@ -50,3 +305,6 @@ def get_available_paths(server: ServerConfig) -> list[str]:
     
     return list(fs_config.get('paths', {}).keys())
 
+
+# Global disk usage index instance
+disk_usage_index = DiskUsageIndex()
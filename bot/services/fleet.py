@@ -0,0 +1,70 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional
+from config import ServerConfig, settings
+
+
+@dataclass
+class HostResult:
+    """Outcome of a fan-out operation on one server"""
+    server: ServerConfig
+    value: Any = None
+    error: Optional[str] = None
+    latency: float = 0.0
+    
+    @property
+    def ok(self) -> bool:
+        """Whether the operation succeeded on this server"""
+        return self.error is None
+
+
+# Caps concurrent per-host operations across every fan-out in flight
+_global_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_global_semaphore() -> asyncio.Semaphore:
+    """Get the semaphore shared by all fan-outs"""
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(max(1, settings.FLEET_MAX_CONCURRENCY))
+    return _global_semaphore
+
+
+async def fan_out(
+    servers: List[ServerConfig],
+    operation: Callable[[ServerConfig], Awaitable[Any]],
+    timeout: Optional[float] = None
+) -> List[HostResult]:
+    """
+    Run an operation against several servers concurrently
+    
+    Concurrency is capped by FLEET_MAX_CONCURRENCY across all fan-outs, and
+    each server gets its own timeout; a slow or failing server only affects
+    its own result.
+    
+    Args:
+        servers: Servers to run on
+        operation: Coroutine function taking a server and returning its result
+        timeout: Per-server timeout in seconds (defaults to FLEET_HOST_TIMEOUT)
+        
+    Returns:
+        One HostResult per server, in the order given
+    """
+    timeout = timeout or settings.FLEET_HOST_TIMEOUT
+    semaphore = _get_global_semaphore()
+    
+    async def run_one(server: ServerConfig) -> HostResult:
+        async with semaphore:
+            started = time.monotonic()
+            result = HostResult(server=server)
+            try:
+                result.value = await asyncio.wait_for(operation(server), timeout)
+            except asyncio.TimeoutError:
+                result.error = f"timed out after {timeout:.0f}s"
+            except Exception as e:
+                result.error = str(e) or type(e).__name__
+            result.latency = time.monotonic() - started
+            return result
+    
+    return await asyncio.gather(*(run_one(server) for server in servers))
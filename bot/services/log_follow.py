@@ -0,0 +1,207 @@
+import asyncio
+import re
+import shlex
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Pattern
+from config import ServerConfig, settings
+from services.ssh_executor import ssh_executor, CommandCancelled, CommandStream, OutputBuffer
+
+
+# Characters of log output posted per batch (one Discord message)
+BATCH_CHARS = 1800
+
+# e.g. "30s", "10m", "2h" or an RFC 3339 timestamp
+_SINCE_RE = re.compile(r"^(\d+[smh]|\d{4}-\d{2}-\d{2}(T[\d:.]+(Z|[+-]\d{2}:\d{2})?)?)$")
+
+
+@dataclass(eq=False)
+class FollowSession:
+    """A running docker logs --follow of one container"""
+    server_name: str
+    container: str
+    since: str
+    duration: float
+    pattern: Optional[Pattern] = None
+    user_id: Optional[int] = None
+    started: float = field(default_factory=time.time)
+    lines_seen: int = 0
+    lines_matched: int = 0
+    lines_skipped: int = 0
+    stop_reason: Optional[str] = None
+    _stream: Optional[CommandStream] = field(default=None, repr=False)
+    
+    def stop(self, reason: str) -> None:
+        """Stop following; the first reason given is kept"""
+        if self.stop_reason is None:
+            self.stop_reason = reason
+        if self._stream is not None:
+            self._stream.cancel()
+
+
+class LogFollower:
+    """
+    Live container log sessions, capped per server
+    
+    Each session holds one SSH channel running docker logs --follow for as
+    long as it lives. Sessions run as background commands, so they never
+    take one of the server's command slots. They share the server's
+    max_background_commands with the docker events watcher and the disk
+    usage crawl, whose slots are kept free, and are capped at
+    DOCKER_FOLLOW_MAX_PER_HOST. Sessions stop on their own after their
+    duration.
+    """
+    
+    def __init__(self):
+        self._sessions: Dict[str, List[FollowSession]] = {}
+    
+    def session_limit(self, server: ServerConfig) -> int:
+        """Get the number of sessions allowed at once on a server (0 if the background slots are all reserved)"""
+        reserved = 0
+        if server.get_docker_config().get("watch_events"):
+            reserved += 1
+        if server.has_feature("filesystem"):
+            # Disk usage crawls run one at a time per server
+            reserved += 1
+        free_slots = ssh_executor.background_limit(server) - reserved
+        return max(0, min(settings.DOCKER_FOLLOW_MAX_PER_HOST, free_slots))
+    
+    def sessions(self, server_name: Optional[str] = None) -> List[FollowSession]:
+        """Get the running sessions, optionally for a single server"""
+        if server_name:
+            return list(self._sessions.get(server_name, []))
+        return [session for sessions in self._sessions.values() for session in sessions]
+    
+    def open_session(
+        self,
+        server: ServerConfig,
+        container: str,
+        since: str = "1m",
+        duration: float = 600,
+        pattern: Optional[str] = None,
+        user_id: Optional[int] = None
+    ) -> FollowSession:
+        """
+        Register a follow session before it starts
+        
+        Args:
+            server: Server configuration
+            container: Container name
+            since: Show logs since a relative time (e.g. 10m) or timestamp before following
+            duration: Seconds after which the session stops on its own
+            pattern: Only pass lines matching this regular expression (case-insensitive)
+            user_id: Discord user who started the session
+        
+        Returns:
+            The session; pass it to run()
+        
+        Raises:
+            ValueError: If since or pattern is invalid
+            RuntimeError: If the server already has its maximum number of sessions
+        """
+        if not _SINCE_RE.match(since):
+            raise ValueError(f"Invalid since value '{since}' (use e.g. 30s, 10m, 2h or a timestamp)")
+        try:
+            compiled = re.compile(pattern, re.IGNORECASE) if pattern else None
+        except re.error as e:
+            raise ValueError(f"Invalid filter: {e}")
+        
+        sessions = self._sessions.setdefault(server.name, [])
+        limit = self.session_limit(server)
+        if limit == 0:
+            raise RuntimeError(
+                f"{server.display_name} has no background command slot left for log sessions "
+                "(raise max_background_commands in its connection block)"
+            )
+        if len(sessions) >= limit:
+            running = ", ".join(session.container for session in sessions)
+            raise RuntimeError(f"{server.display_name} already has {limit} log sessions running ({running})")
+        
+        duration = max(10, min(duration, settings.DOCKER_FOLLOW_MAX_DURATION))
+        session = FollowSession(server.name, container, since, duration, compiled, user_id)
+        sessions.append(session)
+        return session
+    
+    async def run(
+        self,
+        server: ServerConfig,
+        session: FollowSession,
+        on_batch: Callable[[str], Awaitable[None]]
+    ) -> FollowSession:
+        """
+        Follow a container's logs until the session is stopped, times out or the container stops
+        
+        New lines are collected and handed to on_batch as one text block at
+        most every DOCKER_FOLLOW_BATCH_INTERVAL seconds. If more arrives in an
+        interval than fits a message, the oldest lines of the batch are
+        skipped and counted.
+        
+        Args:
+            server: Server configuration
+            session: Session from open_session()
+            on_batch: Coroutine called with each batch of new lines
+        
+        Returns:
+            The session, with stop_reason set
+        """
+        command = f"docker logs --follow --since {shlex.quote(session.since)} {shlex.quote(session.container)}"
+        # A pty makes closing the channel hang up docker logs on the server
+        stream = ssh_executor.stream(server, command, timeout=None, get_pty=True, background=True)
+        session._stream = stream
+        state = {"buffer": OutputBuffer(BATCH_CHARS)}
+        
+        async def read() -> None:
+            async for line in stream:
+                session.lines_seen += 1
+                if session.pattern and not session.pattern.search(line.text):
+                    continue
+                session.lines_matched += 1
+                state["buffer"].append(line.text[:BATCH_CHARS])
+        
+        async def flush() -> None:
+            buffer, state["buffer"] = state["buffer"], OutputBuffer(BATCH_CHARS)
+            text = buffer.getvalue()
+            if not text:
+                return
+            session.lines_skipped += buffer.dropped_lines
+            try:
+                await on_batch(text)
+            except Exception as e:
+                print(f"Failed to post logs of {session.container} on {server.display_name}: {e}")
+        
+        reader = asyncio.create_task(read())
+        deadline = session.started + session.duration
+        try:
+            while not reader.done():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    session.stop("timed out")
+                    remaining = 5
+                await asyncio.wait({reader}, timeout=min(settings.DOCKER_FOLLOW_BATCH_INTERVAL, remaining))
+                await flush()
+            await flush()
+            
+            error = reader.exception()
+            if error is not None and not isinstance(error, CommandCancelled) and session.stop_reason is None:
+                session.stop_reason = f"error: {error}"
+            elif session.stop_reason is None:
+                if stream.exit_code == 0:
+                    session.stop_reason = "container stopped"
+                else:
+                    session.stop_reason = f"docker logs exited with code {stream.exit_code}"
+        finally:
+            if not reader.done():
+                stream.cancel()
+                reader.cancel()
+            self.close(session)
+        return session
+    
+    def close(self, session: FollowSession) -> None:
+        """Unregister a session (run() does this when it ends)"""
+        sessions = self._sessions.get(session.server_name, [])
+        if session in sessions:
+            sessions.remove(session)
+
+
+# Global log follower instance
+log_follower = LogFollower()
@@ -0,0 +1,224 @@
+import asyncio
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+from config import ServerConfig, settings
+from services.fleet import fan_out
+from services.filesystem_stats import build_df_command, parse_df_rows
+from services.ssh_executor import ssh_executor
+from services.snapraid_runner import sync_marker_path
+from services.system_info import SYSTEM_PROBES, build_probe_script, parse_probe_output, parse_system_sections
+
+
+class MetricSeries:
+    """Fixed-size ring buffer of (timestamp, value) samples stored in two float arrays"""
+    
+    __slots__ = ("capacity", "_times", "_values", "_next", "_count")
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def append(self, timestamp: float, value: float) -> None:
+        """Add a sample, overwriting the oldest once the buffer is full"""
+        self._times[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+    
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """Get the most recent (timestamp, value) sample"""
+        if not self._count:
+            return None
+        index = (self._next - 1) % self.capacity
+        return self._times[index], self._values[index]
+    
+    def samples(self, since: Optional[float] = None) -> List[Tuple[float, float]]:
+        """
+        Get samples oldest first
+        
+        Args:
+            since: Only return samples taken at or after this timestamp
+            
+        Returns:
+            List of (timestamp, value)
+        """
+        start = (self._next - self._count) % self.capacity
+        result = []
+        for offset in range(self._count):
+            index = (start + offset) % self.capacity
+            timestamp = self._times[index]
+            if since is None or timestamp >= since:
+                result.append((timestamp, self._values[index]))
+        return result
+
+
+class MetricsCollector:
+    """Samples every configured server on an interval into in-memory metric series"""
+    
+    def __init__(self):
+        self._series: Dict[str, Dict[str, MetricSeries]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[str, float, Dict[str, float]], None]] = []
+    
+    def add_listener(self, callback: Callable[[str, float, Dict[str, float]], None]) -> None:
+        """
+        Register a callback receiving (server_name, timestamp, values) for every sample
+        
+        Callbacks run on the event loop and must not block.
+        """
+        self._listeners.append(callback)
+    
+    def start(self) -> None:
+        """Start the collection loop on the running event loop (no-op if already running)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    def stop(self) -> None:
+        """Stop the collection loop"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    async def _run(self) -> None:
+        """Collect samples every METRICS_INTERVAL seconds"""
+        while True:
+            started = time.monotonic()
+            try:
+                await self.collect_all()
+            except Exception as e:
+                print(f"Metrics collection failed: {e}")
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(1.0, settings.METRICS_INTERVAL - elapsed))
+    
+    async def collect_all(self) -> None:
+        """Sample every configured server concurrently"""
+        servers = settings.get_all_servers()
+        results = await fan_out(servers, self._sample)
+        for result in results:
+            values = {"up": 1.0 if result.ok else 0.0}
+            if result.ok:
+                values.update(result.value)
+            self.publish(result.server.name, values)
+    
+    def publish(self, server_name: str, values: Dict[str, float], timestamp: Optional[float] = None) -> None:
+        """
+        Record samples taken at the same time and pass them to every listener
+        
+        Also used by services that gather metrics outside the periodic probe.
+        
+        Args:
+            server_name: Server the samples came from
+            values: Metric values keyed by metric name
+            timestamp: Sample time (defaults to now)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        for metric, value in values.items():
+            self.record(server_name, metric, timestamp, value)
+        for listener in self._listeners:
+            try:
+                listener(server_name, timestamp, values)
+            except Exception as e:
+                print(f"Metrics listener failed: {e}")
+    
+    def _build_probes(self, server: ServerConfig) -> Dict[str, str]:
+        """Build the probe script sections for a server"""
+        probes = dict(SYSTEM_PROBES)
+        
+        fs_config = server.get_filesystem_config() or {}
+        paths = fs_config.get("paths") or {"root": "/"}
+        probes["df"] = build_df_command(paths)
+        
+        if server.has_feature("docker"):
+            probes["containers"] = "docker ps -a --format '{{.State}}' | sort | uniq -c"
+        
+        if server.has_feature("snapraid"):
+            # Successful sync jobs touch a marker; scrub and fix rewrite the
+            # content file too, so its mtime is no sync time (the remote clock is sent too)
+            probes["snapraid_sync"] = f"date +%s; stat -c %Y {sync_marker_path()}"
+        
+        return probes
+    
+    async def _sample(self, server: ServerConfig) -> Dict[str, float]:
+        """Collect one sample of every metric from a server in a single round trip"""
+        started = time.monotonic()
+        stdout, stderr, exit_code = await ssh_executor.run(server, build_probe_script(self._build_probes(server)), timeout=None)
+        if not stdout.strip():
+            raise RuntimeError(stderr.strip() or f"exit code {exit_code}")
+        
+        sections = parse_probe_output(stdout)
+        snapshot = parse_system_sections(sections)
+        values = {"probe_seconds": time.monotonic() - started}
+        
+        if snapshot.uptime_seconds is not None:
+            values["uptime_seconds"] = snapshot.uptime_seconds
+        if snapshot.load:
+            values["load1"], values["load5"], values["load15"] = snapshot.load
+        if snapshot.mem_total:
+            used = snapshot.mem_total - (snapshot.mem_available or 0)
+            values["mem_used_bytes"] = float(used)
+            values["mem_used_percent"] = used / snapshot.mem_total * 100
+        
+        # Rows are labelled with their path key; paths df could not read are left out
+        filesystems, _ = parse_df_rows(sections.get("df", ""))
+        for key, info in filesystems.items():
+            values[f"disk_used_bytes:{key}"] = float(info.used_bytes)
+            values[f"disk_free_bytes:{key}"] = float(info.available_bytes)
+            if info.total_bytes:
+                values[f"disk_used_percent:{key}"] = info.used_bytes / info.total_bytes * 100
+        
+        if "containers" in sections:
+            states: Dict[str, int] = {}
+            for line in sections["containers"].splitlines():
+                parts = line.split()
+                if len(parts) == 2 and parts[0].isdigit():
+                    states[parts[1]] = int(parts[0])
+            values["containers_total"] = float(sum(states.values()))
+            for state in ("running", "exited", "paused", "restarting"):
+                values[f"containers_{state}"] = float(states.get(state, 0))
+        
+        sync_times = sections.get("snapraid_sync", "").split()
+        if len(sync_times) == 2 and all(t.isdigit() for t in sync_times):
+            values["snapraid_sync_age_days"] = (int(sync_times[0]) - int(sync_times[1])) / 86400
+        
+        return values
+    
+    def record(self, server_name: str, metric: str, timestamp: float, value: float) -> None:
+        """Append a sample to a server's metric series"""
+        server_series = self._series.setdefault(server_name, {})
+        series = server_series.get(metric)
+        if series is None:
+            series = MetricSeries(settings.METRICS_HISTORY)
+            server_series[metric] = series
+        series.append(timestamp, value)
+    
+    def get_series(self, server_name: str, metric: str) -> Optional[MetricSeries]:
+        """Get a server's series for a metric"""
+        return self._series.get(server_name, {}).get(metric)
+    
+    def latest(self, server_name: str, metric: str) -> Optional[Tuple[float, float]]:
+        """Get the latest (timestamp, value) of a server metric"""
+        series = self.get_series(server_name, metric)
+        return series.latest() if series else None
+    
+    def latest_values(self, server_name: str) -> Dict[str, Tuple[float, float]]:
+        """Get the latest sample of every metric collected for a server"""
+        return {
+            metric: series.latest()
+            for metric, series in self._series.get(server_name, {}).items()
+            if len(series)
+        }
+    
+    def metric_names(self, server_name: str) -> List[str]:
+        """Get the names of metrics collected for a server"""
+        return sorted(self._series.get(server_name, {}).keys())
+
+
+# Global metrics collector instance
+metrics_collector = MetricsCollector()
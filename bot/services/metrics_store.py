@@ -0,0 +1,241 @@
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from config import settings
+
+
+# Rollup tiers: bucket width in seconds (0 = raw samples)
+TIER_RAW = 0
+TIER_5MIN = 300
+TIER_HOURLY = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_samples (
+    tier INTEGER NOT NULL,
+    server TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (tier, server, metric, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS command_results (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    server TEXT NOT NULL,
+    command TEXT NOT NULL,
+    exit_code INTEGER,
+    duration REAL,
+    user_id INTEGER,
+    summary TEXT
+);
+
+CREATE INDEX IF NOT EXISTS command_results_server_ts ON command_results (server, ts);
+"""
+
+
+@dataclass
+class StoredSample:
+    """A raw sample or rollup bucket read from the store"""
+    ts: int
+    value: float
+    min: float
+    max: float
+    count: int
+
+
+class MetricsStore:
+    """
+    Local SQLite store for collected metrics and command results
+    
+    Writes are queued in memory and flushed in batches. Raw samples are rolled
+    up into 5-minute and hourly buckets, and every tier is pruned to its own
+    retention so the database stays bounded. All database access happens on
+    one worker thread.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="metrics-store")
+        self._pending_samples: List[Tuple] = []
+        self._pending_results: List[Tuple] = []
+        self._task: Optional[asyncio.Task] = None
+        self.retention = {
+            TIER_RAW: settings.METRICS_RAW_RETENTION,
+            TIER_5MIN: settings.METRICS_5MIN_RETENTION,
+            TIER_HOURLY: settings.METRICS_HOURLY_RETENTION,
+        }
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on the worker thread"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+    
+    async def _call(self, fn, *args):
+        """Run a database function on the worker thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+    
+    def start(self) -> None:
+        """Start periodic flushing and rollups (no-op if already running)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def _run(self) -> None:
+        """Flush queued writes every METRICS_STORE_FLUSH_INTERVAL and maintain rollups"""
+        last_maintenance = 0.0
+        while True:
+            await asyncio.sleep(settings.METRICS_STORE_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+                if time.time() - last_maintenance >= TIER_5MIN:
+                    await self._call(self._maintain)
+                    last_maintenance = time.time()
+            except Exception as e:
+                print(f"Metrics store maintenance failed: {e}")
+    
+    def add_samples(self, server_name: str, timestamp: float, values: Dict[str, float]) -> None:
+        """Queue samples of several metrics taken at the same time"""
+        ts = int(timestamp)
+        self._pending_samples.extend(
+            (TIER_RAW, server_name, metric, ts, value, value, value, 1)
+            for metric, value in values.items()
+        )
+    
+    def record_command(
+        self,
+        server_name: str,
+        command: str,
+        exit_code: Optional[int],
+        duration: Optional[float],
+        user_id: Optional[int] = None,
+        summary: str = ""
+    ) -> None:
+        """Queue the result of a command run through the bot"""
+        self._pending_results.append(
+            (time.time(), server_name, command, exit_code, duration, user_id, summary[:2000])
+        )
+    
+    async def flush(self) -> None:
+        """Write queued samples and command results in one transaction"""
+        if not self._pending_samples and not self._pending_results:
+            return
+        samples, self._pending_samples = self._pending_samples, []
+        results, self._pending_results = self._pending_results, []
+        await self._call(self._write, samples, results)
+    
+    def _write(self, samples: List[Tuple], results: List[Tuple]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO metric_samples (tier, server, metric, ts, value, min, max, count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                samples
+            )
+            conn.executemany(
+                "INSERT INTO command_results (ts, server, command, exit_code, duration, user_id, summary) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                results
+            )
+    
+    def _maintain(self) -> None:
+        """Roll up closed buckets and prune every tier to its retention"""
+        conn = self._connect()
+        now = int(time.time())
+        with conn:
+            for source, target in ((TIER_RAW, TIER_5MIN), (TIER_5MIN, TIER_HOURLY)):
+                # Resume from the newest rollup (recomputing it and the bucket before,
+                # INSERT OR REPLACE keeps this idempotent) up to the last closed bucket
+                end = now - now % target
+                newest = conn.execute("SELECT MAX(ts) FROM metric_samples WHERE tier = ?", (target,)).fetchone()[0]
+                start = min(newest - target, end - 2 * target) if newest is not None else 0
+                conn.execute(
+                    "INSERT OR REPLACE INTO metric_samples (tier, server, metric, ts, value, min, max, count) "
+                    "SELECT ?, server, metric, ts - ts % ?, SUM(value * count) / SUM(count), MIN(min), MAX(max), SUM(count) "
+                    "FROM metric_samples WHERE tier = ? AND ts >= ? AND ts < ? "
+                    "GROUP BY server, metric, ts - ts % ?",
+                    (target, target, source, start, end, target)
+                )
+            for tier, retention in self.retention.items():
+                conn.execute("DELETE FROM metric_samples WHERE tier = ? AND ts < ?", (tier, now - retention))
+            conn.execute("DELETE FROM command_results WHERE ts < ?", (now - settings.COMMAND_RESULTS_RETENTION,))
+    
+    def _select_tier(self, since: float) -> int:
+        """Pick the finest tier whose retention still covers a start time"""
+        age = time.time() - since
+        for tier in (TIER_RAW, TIER_5MIN, TIER_HOURLY):
+            if age <= self.retention[tier]:
+                return tier
+        return TIER_HOURLY
+    
+    def _query_samples(self, server_name: str, metric: str, since: float, tier: int) -> List[StoredSample]:
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT ts, value, min, max, count FROM metric_samples "
+            "WHERE tier = ? AND server = ? AND metric = ? AND ts >= ? ORDER BY ts",
+            (tier, server_name, metric, int(since))
+        ).fetchall()
+        return [StoredSample(*row) for row in rows]
+    
+    async def query_samples(self, server_name: str, metric: str, since: float) -> List[StoredSample]:
+        """
+        Get stored samples of a metric from the finest tier covering the window
+        
+        Args:
+            server_name: Server name
+            metric: Metric name
+            since: Start of the window (unix time)
+        
+        Returns:
+            Samples or rollup buckets, oldest first
+        """
+        await self.flush()
+        return await self._call(self._query_samples, server_name, metric, since, self._select_tier(since))
+    
+    def _query_commands(self, server_name: Optional[str], limit: int) -> List[Tuple]:
+        conn = self._connect()
+        if server_name:
+            return conn.execute(
+                "SELECT ts, server, command, exit_code, duration, user_id, summary FROM command_results "
+                "WHERE server = ? ORDER BY ts DESC LIMIT ?",
+                (server_name, limit)
+            ).fetchall()
+        return conn.execute(
+            "SELECT ts, server, command, exit_code, duration, user_id, summary FROM command_results "
+            "ORDER BY ts DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+    
+    async def recent_commands(self, server_name: Optional[str] = None, limit: int = 10) -> List[Tuple]:
+        """
+        Get the most recent command results
+        
+        Args:
+            server_name: Only return results for this server
+            limit: Maximum number of results
+        
+        Returns:
+            Rows of (ts, server, command, exit_code, duration, user_id, summary), newest first
+        """
+        await self.flush()
+        return await self._call(self._query_commands, server_name, limit)
+
+
+# Global metrics store instance
+metrics_store = MetricsStore(settings.METRICS_DB_PATH)
@@ -0,0 +1,272 @@
+import asyncio
+import gzip
+import tempfile
+from typing import IO, List, Optional, Tuple
+import discord
+from discord.ui import View
+from config import settings
+from services.ssh_executor import CommandStream
+
+
+# Characters of output shown per message, leaving room for a title and code fences
+PAGE_CHARS = 1800
+
+# Bytes kept in memory before a spool moves to a temporary file
+_SPOOL_MEMORY = 1024 * 1024
+
+_COPY_CHUNK = 64 * 1024
+
+
+class OutputSpool:
+    """
+    Command output buffered off-heap and split into message-sized pages
+    
+    Text is written to a spooled temporary file as it arrives; only the byte
+    offsets of page boundaries are kept in memory, so pages can be read back
+    lazily and large outputs can be compressed straight from the file.
+    """
+    
+    def __init__(self, page_chars: int = PAGE_CHARS):
+        self.page_chars = page_chars
+        self._file = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MEMORY)
+        self._page_offsets: List[int] = [0]
+        self._page_size = 0
+        self.size = 0
+        self.line_count = 0
+    
+    def write_line(self, line: str) -> None:
+        """Append a line, splitting it if it is longer than a page"""
+        for start in range(0, max(len(line), 1), self.page_chars - 1):
+            chunk = line[start:start + self.page_chars - 1] + "\n"
+            if self._page_size and self._page_size + len(chunk) > self.page_chars:
+                self._page_offsets.append(self.size)
+                self._page_size = 0
+            data = chunk.encode("utf-8", errors="replace")
+            self._file.write(data)
+            self.size += len(data)
+            self._page_size += len(chunk)
+        self.line_count += 1
+    
+    def write(self, text: str) -> None:
+        """Append text, one line at a time"""
+        for line in text.splitlines():
+            self.write_line(line)
+    
+    @property
+    def page_count(self) -> int:
+        """Number of pages (at least one, even when empty)"""
+        return len(self._page_offsets)
+    
+    def page(self, index: int) -> str:
+        """Read a page back from the spool"""
+        start = self._page_offsets[index]
+        end = self._page_offsets[index + 1] if index + 1 < len(self._page_offsets) else self.size
+        self._file.seek(start)
+        text = self._file.read(end - start).decode("utf-8", errors="replace")
+        self._file.seek(0, 2)
+        return text
+    
+    def _compress_from(self, offset: int) -> IO[bytes]:
+        """Gzip the spool from a byte offset into a new temporary file"""
+        compressed = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MEMORY)
+        with gzip.GzipFile(fileobj=compressed, mode="wb") as gz:
+            self._file.seek(offset)
+            while True:
+                chunk = self._file.read(_COPY_CHUNK)
+                if not chunk:
+                    break
+                gz.write(chunk)
+        self._file.seek(0, 2)
+        compressed.seek(0)
+        return compressed
+    
+    def compress(self, limit: int) -> Tuple[IO[bytes], bool]:
+        """
+        Gzip the spooled output, keeping its end if the result exceeds a size limit
+        
+        Args:
+            limit: Maximum compressed size in bytes
+        
+        Returns:
+            Tuple of (compressed file positioned at its start, whether the start was dropped)
+        """
+        offset = 0
+        while True:
+            compressed = self._compress_from(offset)
+            compressed.seek(0, 2)
+            compressed_size = compressed.tell()
+            compressed.seek(0)
+            if compressed_size <= limit or offset >= self.size:
+                return compressed, offset > 0
+            compressed.close()
+            # Estimate how much of the end fits from the compression ratio, with some margin
+            keep = int((self.size - offset) * limit / compressed_size * 0.9)
+            offset = self._next_line(self.size - keep)
+    
+    def _next_line(self, offset: int) -> int:
+        """Get the offset of the first line starting at or after a byte offset"""
+        if offset <= 0:
+            return 0
+        self._file.seek(offset - 1)
+        while True:
+            chunk = self._file.read(_COPY_CHUNK)
+            if not chunk:
+                return self.size
+            newline = chunk.find(b"\n")
+            if newline >= 0:
+                return offset + newline
+            offset += len(chunk)
+    
+    def close(self) -> None:
+        """Release the spool's temporary file"""
+        self._file.close()
+
+
+async def spool_stream(command_stream: CommandStream, spool: OutputSpool) -> Optional[int]:
+    """
+    Write the output of a streamed command into a spool
+    
+    stdout and stderr lines are interleaved in the order they arrive.
+    
+    Args:
+        command_stream: Stream from ssh_executor.stream()
+        spool: Spool to write to
+    
+    Returns:
+        Exit code of the command
+    """
+    async for line in command_stream:
+        spool.write_line(line.text)
+    return command_stream.exit_code
+
+
+def format_code_block(text: str) -> str:
+    """Wrap text in a code block, keeping it from closing the block early"""
+    text = text.replace("```", "`\u200b``")
+    if not text.endswith("\n"):
+        text += "\n"
+    return f"```\n{text}```"
+
+
+def _render(title: str, text: str, code_block: bool) -> str:
+    """Render a page of output as message content"""
+    if code_block:
+        return f"{title}\n{format_code_block(text)}"
+    return f"{title}\n{text}"
+
+
+class PaginatorView(View):
+    """Buttons to page through a spool; pages are read on demand"""
+    
+    def __init__(self, spool: OutputSpool, title: str, code_block: bool, owner_id: Optional[int], start_page: int = 0):
+        super().__init__(timeout=settings.OUTPUT_PAGINATOR_TIMEOUT)
+        self.spool = spool
+        self.title = title
+        self.code_block = code_block
+        self.owner_id = owner_id
+        self.index = start_page
+        self._update_buttons()
+    
+    def render(self) -> str:
+        """Render the current page"""
+        title = f"{self.title} (page {self.index + 1}/{self.spool.page_count})"
+        return _render(title, self.spool.page(self.index), self.code_block)
+    
+    def _update_buttons(self) -> None:
+        last = self.spool.page_count - 1
+        self.first_page.disabled = self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = self.last_page.disabled = self.index == last
+    
+    async def _show(self, interaction: discord.Interaction, index: int) -> None:
+        if self.owner_id and interaction.user.id != self.owner_id:
+            await interaction.response.send_message("Only the user who ran the command can page through this output.", ephemeral=True)
+            return
+        self.index = max(0, min(index, self.spool.page_count - 1))
+        self._update_buttons()
+        await interaction.response.edit_message(content=self.render(), view=self)
+    
+    async def on_timeout(self):
+        self.spool.close()
+    
+    @discord.ui.button(label="⏮", style=discord.ButtonStyle.secondary)
+    async def first_page(self, button, interaction):
+        await self._show(interaction, 0)
+    
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, button, interaction):
+        await self._show(interaction, self.index - 1)
+    
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, button, interaction):
+        await self._show(interaction, self.index + 1)
+    
+    @discord.ui.button(label="⏭", style=discord.ButtonStyle.secondary)
+    async def last_page(self, button, interaction):
+        await self._show(interaction, self.spool.page_count - 1)
+
+
+async def deliver_output(
+    target,
+    spool: OutputSpool,
+    title: str,
+    filename: str = "output.txt",
+    ephemeral: bool = True,
+    code_block: bool = True,
+    start_at_end: bool = False,
+    empty_message: str = "(no output)"
+) -> None:
+    """
+    Send spooled output to Discord in the most readable form for its size
+    
+    Output that fits one message is sent inline. Longer output gets a
+    paginator whose pages are read from the spool on demand. Output above
+    OUTPUT_ATTACHMENT_THRESHOLD bytes is uploaded as a gzip attachment
+    instead, together with its first or last page as a preview. The spool
+    is owned by this call and closed once it is no longer needed.
+    
+    Args:
+        target: ApplicationContext or Interaction to respond to (after deferring)
+        spool: Output to send
+        title: Heading shown above the output
+        filename: Name of the attachment, without the .gz suffix
+        ephemeral: Send the response ephemerally
+        code_block: Show the output in a code block
+        start_at_end: Open on the last page (e.g. for logs)
+        empty_message: Text shown when there is no output
+    """
+    user = getattr(target, "author", None) or getattr(target, "user", None)
+    
+    if spool.size == 0:
+        spool.close()
+        await target.respond(f"{title}\n{empty_message}", ephemeral=ephemeral)
+        return
+    
+    if spool.page_count == 1:
+        content = _render(title, spool.page(0), code_block)
+        spool.close()
+        await target.respond(content, ephemeral=ephemeral)
+        return
+    
+    if spool.size > settings.OUTPUT_ATTACHMENT_THRESHOLD:
+        try:
+            preview_index = spool.page_count - 1 if start_at_end else 0
+            preview = _render(f"{title} ({'last' if start_at_end else 'first'} page)", spool.page(preview_index), code_block)
+            loop = asyncio.get_running_loop()
+            compressed, truncated = await loop.run_in_executor(None, spool.compress, settings.DISCORD_UPLOAD_LIMIT)
+        finally:
+            spool.close()
+        note = f"\n{spool.line_count} lines, full output attached"
+        if truncated:
+            note += " (start dropped to fit the upload limit)"
+        try:
+            await target.respond(preview + note, file=discord.File(compressed, filename=f"{filename}.gz"), ephemeral=ephemeral)
+        finally:
+            compressed.close()
+        return
+    
+    view = PaginatorView(
+        spool, title, code_block,
+        owner_id=user.id if user else None,
+        start_page=spool.page_count - 1 if start_at_end else 0
+    )
+    await target.respond(view.render(), view=view, ephemeral=ephemeral)
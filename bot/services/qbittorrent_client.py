@@ -1,7 +1,174 @@
+import asyncio
+import base64
+import hashlib
+import io
+import threading
+import zipfile
 import qbittorrentapi
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
 from config import ServerConfig
 
 
+# Seconds to wait for qBittorrent to register newly added torrents
+_CONFIRM_DELAYS = (0.5, 1.0, 2.0)
+
+# Limits on .torrent files extracted from an uploaded zip
+MAX_ARCHIVE_ENTRIES = 100
+MAX_TORRENT_FILE_SIZE = 10 * 1024 * 1024
+
+
+@dataclass
+class TorrentItem:
+    """A torrent submitted in a bulk add"""
+    name: str
+    url: Optional[str] = None
+    content: Optional[bytes] = None
+    info_hash: Optional[str] = None
+    status: str = "pending"  # added, exists, submitted, failed, invalid
+    detail: str = ""
+
+
+def _bencode_end(data: bytes, index: int) -> int:
+    """Return the index just past the bencoded value starting at index"""
+    token = data[index:index + 1]
+    if token == b"i":
+        return data.index(b"e", index) + 1
+    if token in (b"l", b"d"):
+        index += 1
+        while data[index:index + 1] != b"e":
+            if index >= len(data):
+                raise ValueError("Unterminated bencode container")
+            index = _bencode_end(data, index)
+        return index + 1
+    if token.isdigit():
+        colon = data.index(b":", index)
+        return colon + 1 + int(data[index:colon])
+    raise ValueError(f"Invalid bencode token at {index}")
+
+
+def torrent_info_hash(content: bytes) -> Optional[str]:
+    """
+    Compute the v1 info hash of a .torrent file
+    
+    Args:
+        content: Torrent file content
+        
+    Returns:
+        Hex info hash, or None if the content is not a valid torrent
+    """
+    try:
+        if content[:1] != b"d":
+            return None
+        index = 1
+        while content[index:index + 1] != b"e":
+            key_end = _bencode_end(content, index)
+            key = content[content.index(b":", index) + 1:key_end]
+            value_end = _bencode_end(content, key_end)
+            if key == b"info":
+                return hashlib.sha1(content[key_end:value_end]).hexdigest()
+            index = value_end
+    except (ValueError, IndexError):
+        return None
+    return None
+
+
+def magnet_info_hash(uri: str) -> Optional[str]:
+    """
+    Extract the v1 info hash from a magnet link
+    
+    Args:
+        uri: Magnet URI
+        
+    Returns:
+        Hex info hash, or None if the link has no BitTorrent v1 hash
+    """
+    for topic in parse_qs(urlparse(uri).query).get("xt", []):
+        if not topic.lower().startswith("urn:btih:"):
+            continue
+        value = topic[9:]
+        if len(value) == 40:
+            return value.lower()
+        if len(value) == 32:
+            try:
+                return base64.b32decode(value.upper()).hex()
+            except ValueError:
+                return None
+    return None
+
+
+def parse_links(text: str) -> List[TorrentItem]:
+    """
+    Split whitespace-separated magnet links and URLs into torrent items
+    
+    Args:
+        text: Links separated by spaces or newlines
+        
+    Returns:
+        One item per link; unsupported links are marked invalid
+    """
+    items = []
+    for link in text.split():
+        item = TorrentItem(name=link if len(link) <= 60 else link[:57] + "...", url=link)
+        if link.startswith("magnet:"):
+            item.info_hash = magnet_info_hash(link)
+            if not item.info_hash and "xt=urn:btmh:" not in link:
+                item.status = "invalid"
+                item.detail = "magnet link has no info hash"
+        elif not link.startswith(("http://", "https://")):
+            item.status = "invalid"
+            item.detail = "not a magnet link or HTTP/HTTPS URL"
+        items.append(item)
+    return items
+
+
+def parse_torrent_upload(filename: str, content: bytes) -> List[TorrentItem]:
+    """
+    Turn an uploaded .torrent file or zip of .torrent files into torrent items
+    
+    Args:
+        filename: Name of the uploaded file
+        content: File content
+        
+    Returns:
+        One item per torrent; files that are not valid torrents are marked invalid
+    """
+    if filename.lower().endswith(".zip"):
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(content))
+        except zipfile.BadZipFile:
+            return [TorrentItem(name=filename, status="invalid", detail="not a valid zip file")]
+        
+        members = [m for m in archive.infolist() if not m.is_dir() and m.filename.lower().endswith(".torrent")]
+        if not members:
+            return [TorrentItem(name=filename, status="invalid", detail="no .torrent files in archive")]
+        
+        items = []
+        for member in members[:MAX_ARCHIVE_ENTRIES]:
+            name = member.filename.rsplit("/", 1)[-1]
+            if member.file_size > MAX_TORRENT_FILE_SIZE:
+                items.append(TorrentItem(name=name, status="invalid", detail="file too large"))
+                continue
+            items.extend(parse_torrent_upload(name, archive.read(member)))
+        if len(members) > MAX_ARCHIVE_ENTRIES:
+            items.append(TorrentItem(
+                name=filename,
+                status="invalid",
+                detail=f"only the first {MAX_ARCHIVE_ENTRIES} torrents were read"
+            ))
+        return items
+    
+    if not filename.lower().endswith(".torrent"):
+        return [TorrentItem(name=filename, status="invalid", detail="not a .torrent or .zip file")]
+    
+    item = TorrentItem(name=filename, content=content, info_hash=torrent_info_hash(content))
+    if content[:1] != b"d":
+        item.status = "invalid"
+        item.detail = "not a valid torrent file"
+    return [item]
+
+
 class QBittorrentClient:
     """Client for managing qBittorrent on remote servers"""
     
@@ -9,6 +176,9 @@ class QBittorrentClient:
         """
         Initialize qBittorrent client for a specific server
         
+        The client logs in on first use and keeps its authenticated session;
+        use get_qbittorrent_client() to share one instance per server.
+        
         Args:
             server: Server configuration
         """
@@ -23,49 +193,134 @@ class QBittorrentClient:
             username=qb_config['username'],
             password=qb_config['password'],
         )
-        
+        self._login_lock = threading.Lock()
+        self._logged_in = False
+    
+    def _login(self, force: bool = False) -> None:
+        """Log in unless a session already exists (serialized so a burst logs in once)"""
+        with self._login_lock:
+            if self._logged_in and not force:
+                return
+            try:
+                self.client.auth_log_in()
+            except qbittorrentapi.LoginFailed as e:
+                self._logged_in = False
+                raise RuntimeError(f"Failed to login to qBittorrent on {self.server.display_name}: {e}")
+            self._logged_in = True
+    
+    def _call(self, method, *args, **kwargs):
+        """Call a qBittorrent API method, re-authenticating once if the session expired"""
+        self._login()
         try:
-            self.client.auth_log_in()
-        except qbittorrentapi.LoginFailed as e:
-            print(f"Failed to login to qBittorrent on {server.display_name}: {e}")
+            return method(*args, **kwargs)
+        except qbittorrentapi.Forbidden403Error:
+            self._login(force=True)
+            return method(*args, **kwargs)
+    
+    async def _run(self, method, *args, **kwargs):
+        """Run a qBittorrent API call off the event loop"""
+        return await asyncio.to_thread(self._call, method, *args, **kwargs)
     
-    def add_link(self, url: str, category: str = None, save_path: str = None):
+    async def add_torrents(
+        self,
+        items: List[TorrentItem],
+        category: str = None,
+        save_path: str = None
+    ) -> List[TorrentItem]:
         """
-        Add a torrent via magnet link or URL
+        Add several torrents with a single torrents_add call
+        
+        Torrents that are already present are skipped, and torrents with a
+        known info hash are confirmed afterwards, so each item gets its own status.
         
         Args:
-            url: Magnet link or torrent URL
+            items: Links and files to add (items already marked invalid are skipped)
             category: Optional category
             save_path: Optional save path
             
         Returns:
-            Result of the add operation
+            The items with their status filled in
         """
-        kwargs = {}
-        if category:
-            kwargs['category'] = category
-        if save_path:
-            kwargs['save_path'] = save_path
+        pending = [item for item in items if item.status == "pending"]
+        hashes = [item.info_hash for item in pending if item.info_hash]
         
-        return self.client.torrents_add(urls=url, **kwargs)
-    
-    def add_file(self, file_content: bytes, category: str = None, save_path: str = None):
-        """
-        Add a torrent via .torrent file
+        if hashes:
+            existing = await self._get_existing_hashes(hashes)
+            for item in pending:
+                if item.info_hash in existing:
+                    item.status = "exists"
+            pending = [item for item in pending if item.status == "pending"]
+        
+        if not pending:
+            return items
         
-        Args:
-            file_content: Torrent file content as bytes
-            category: Optional category
-            save_path: Optional save path
-            
-        Returns:
-            Result of the add operation
-        """
         kwargs = {}
         if category:
             kwargs['category'] = category
         if save_path:
             kwargs['save_path'] = save_path
         
-        return self.client.torrents_add(torrent_files=file_content, **kwargs)
+        urls = [item.url for item in pending if item.url]
+        # Prefix names so duplicate file names in one batch don't collide
+        files = {
+            f"{index}-{item.name}": item.content
+            for index, item in enumerate(pending)
+            if item.content is not None
+        }
+        if urls:
+            kwargs['urls'] = urls
+        if files:
+            kwargs['torrent_files'] = files
+        
+        try:
+            result = await self._run(self.client.torrents_add, **kwargs)
+        except Exception as e:
+            for item in pending:
+                item.status = "failed"
+                item.detail = str(e)
+            return items
+        
+        # qBittorrent answers for the whole batch; confirm hashed items one by one
+        unconfirmed = {item.info_hash: item for item in pending if item.info_hash}
+        for delay in _CONFIRM_DELAYS:
+            if not unconfirmed:
+                break
+            await asyncio.sleep(delay)
+            for info_hash in await self._get_existing_hashes(list(unconfirmed)):
+                unconfirmed.pop(info_hash).status = "added"
+        
+        for item in pending:
+            if item.status != "pending":
+                continue
+            if item.info_hash:
+                item.status = "failed"
+                item.detail = f"not found after add ({result})"
+            else:
+                item.status = "submitted" if result == "Ok." else "failed"
+                item.detail = "" if result == "Ok." else str(result)
+        return items
+    
+    async def _get_existing_hashes(self, hashes: List[str]) -> set:
+        """Return the subset of info hashes qBittorrent already has"""
+        torrents = await self._run(self.client.torrents_info, torrent_hashes="|".join(hashes))
+        return {torrent.hash.lower() for torrent in torrents}
+
+# Shared clients, one authenticated session per server
+_clients: Dict[str, QBittorrentClient] = {}
 
+
+def get_qbittorrent_client(server: ServerConfig) -> QBittorrentClient:
+    """
+    Get the shared qBittorrent client for a server
+    
+    Args:
+        server: Server configuration
+    
+    Returns:
+        QBittorrentClient reusing its session across commands
+    """
+    client = _clients.get(server.name)
+    if client is None:
+        client = QBittorrentClient(server)
+        _clients[server.name] = client
+    return client
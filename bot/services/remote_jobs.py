@@ -0,0 +1,463 @@
+import asyncio
+import secrets
+import shlex
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from config import ServerConfig, settings
+from services.fleet import fan_out
+from services.resource_scheduler import resource_scheduler, Reservation
+from services.docker_client import DockerClient
+from services.container_inventory import container_inventory
+from services.ssh_executor import ssh_executor
+
+
+_JOB_MARKER = "@@job "
+
+# Job states
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+CANCELLED = "cancelled"
+LOST = "lost"  # Process gone without writing an exit code (e.g. killed or host rebooted)
+
+
+@dataclass
+class RemoteJob:
+    """A command running detached on a server, tracked through files in the job directory"""
+    server_name: str
+    job_id: str
+    label: str = ""
+    command: str = ""
+    user_id: Optional[int] = None
+    channel_id: Optional[int] = None
+    started: float = 0.0
+    state: str = RUNNING
+    exit_code: Optional[int] = None
+    log_size: int = 0
+    meta: Dict[str, str] = field(default_factory=dict)
+    
+    @property
+    def done(self) -> bool:
+        """Whether the job has stopped running"""
+        return self.state != RUNNING
+
+
+def _new_job_id() -> str:
+    """Generate a sortable, unique job ID"""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+
+
+def _job_dir() -> str:
+    """Get the shell-quoted job directory (relative paths are under the SSH user's home)"""
+    return shlex.quote(settings.REMOTE_JOB_DIR)
+
+
+def _job_state(values: Dict[str, str]) -> Tuple[str, Optional[int]]:
+    """Derive a job's state and exit code from its status fields"""
+    exit_code = values.get("exit", "").strip()
+    if exit_code.lstrip("-").isdigit():
+        code = int(exit_code)
+        if values.get("cancelled"):
+            return CANCELLED, code
+        return (FINISHED if code == 0 else FAILED), code
+    if values.get("alive"):
+        return RUNNING, None
+    return (CANCELLED if values.get("cancelled") else LOST), None
+
+
+def _build_job(server_name: str, job_id: str, values: Dict[str, str]) -> RemoteJob:
+    """Build a RemoteJob from the key=value lines describing it"""
+    job = RemoteJob(server_name=server_name, job_id=job_id, meta=values)
+    job.label = values.get("label", "")
+    job.command = values.get("command", "")
+    job.user_id = int(values["user"]) if values.get("user", "").isdigit() else None
+    job.channel_id = int(values["channel"]) if values.get("channel", "").isdigit() else None
+    job.started = float(values["started"]) if values.get("started", "").replace(".", "", 1).isdigit() else 0.0
+    job.log_size = int(values["log_size"]) if values.get("log_size", "").isdigit() else 0
+    job.state, job.exit_code = _job_state(values)
+    return job
+
+
+# Prints the status fields of job $id (run inside the job directory)
+_STATUS_FIELDS = (
+    'if [ -f "$id.exit" ]; then echo "exit=$(cat "$id.exit")"; fi; '
+    'if [ -f "$id.cancelled" ]; then echo "cancelled=1"; fi; '
+    'if [ -f "$id.resumed" ]; then echo "resumed=1"; fi; '
+    'if kill -0 "$(cat "$id.pid" 2>/dev/null)" 2>/dev/null; then echo "alive=1"; fi; '
+    'echo "log_size=$(stat -c %s "$id.log" 2>/dev/null || echo 0)"'
+)
+
+
+class RemoteJobManager:
+    """
+    Runs long commands detached on servers and follows them by polling
+    
+    Each job is started with nohup/setsid so it survives a dropped SSH
+    connection or a bot restart. Its output goes to <job_id>.log in
+    REMOTE_JOB_DIR, alongside .pid, .meta and (once it ends) .exit files.
+    Polling reads the status and any new log bytes in one short command, and
+    running jobs are picked up again when the bot starts. Containers paused
+    for a job are listed in its .meta file; if the bot restarts before they
+    were resumed, they are resumed once the job has ended and a .resumed
+    file records it.
+    """
+    
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, RemoteJob]] = {}
+        self._watchers: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._following: Set[Tuple[str, str]] = set()
+        self._bot = None
+        self._started = False
+    
+    def _remember(self, job: RemoteJob) -> RemoteJob:
+        """Cache a job's latest known state"""
+        self._jobs.setdefault(job.server_name, {})[job.job_id] = job
+        return job
+    
+    def get_cached_jobs(self, server_name: str) -> List[RemoteJob]:
+        """Get the jobs last seen on a server, newest first"""
+        return sorted(self._jobs.get(server_name, {}).values(), key=lambda job: job.job_id, reverse=True)
+    
+    async def launch(
+        self,
+        server: ServerConfig,
+        command: str,
+        label: str,
+        user_id: Optional[int] = None,
+        channel_id: Optional[int] = None,
+        resources: Iterable[str] = (),
+        heavy: bool = False,
+        paused_containers: Iterable[str] = ()
+    ) -> RemoteJob:
+        """
+        Start a command detached on a server
+        
+        Args:
+            server: Server configuration
+            command: Shell command to run
+            label: Short description shown in job listings
+            user_id: Discord user who started the job
+            channel_id: Channel to report completion to if the bot restarts meanwhile
+            resources: Scheduler resources the job holds (reclaimed when reattaching)
+            heavy: Whether the job counts against the per-host disk-heavy cap
+            paused_containers: Containers paused for the job, resumed after a restart if the caller could not
+        
+        Returns:
+            The started job
+        """
+        job_id = _new_job_id()
+        meta = {
+            "label": label,
+            "command": command,
+            "user": str(user_id or ""),
+            "channel": str(channel_id or ""),
+            "started": str(int(time.time())),
+            "resources": ",".join(resources),
+            "heavy": "1" if heavy else "",
+            "paused": ",".join(paused_containers),
+        }
+        meta_lines = " ".join(shlex.quote(f"{key}={value.replace(chr(10), ' ')}") for key, value in meta.items())
+        # $0 is the absolute job path, so the command itself runs in the home directory.
+        # The wrapper records its PID (the process group ID under setsid) and traps
+        # SIGINT, so a cancel reaches the command while the exit code is still written.
+        wrapper = (
+            f'echo $$ > "$0.pid"; trap : INT; ({command}); '
+            f'echo $? > "$0.exit.tmp" && mv "$0.exit.tmp" "$0.exit"'
+        )
+        # Without job control, "cmd &" would start the job with SIGINT ignored;
+        # setsid -f detaches it with default signal handling instead
+        launch = f"nohup sh -c {shlex.quote(wrapper)} \"$dir/{job_id}\" > \"$dir/{job_id}.log\" 2>&1 < /dev/null"
+        script = (
+            f"mkdir -p {_job_dir()} && dir=$(cd {_job_dir()} && pwd) || exit 1; "
+            f"printf '%s\\n' {meta_lines} > \"$dir/{job_id}.meta\"; "
+            f"if command -v setsid >/dev/null; then setsid -f {launch}; else {launch} & fi; "
+            f"for i in $(seq 50); do [ -s \"$dir/{job_id}.pid\" ] && break; sleep 0.1; done; "
+            f"cat \"$dir/{job_id}.pid\""
+        )
+        stdout, stderr, exit_code = await ssh_executor.run(server, script, timeout=30)
+        if exit_code != 0 or not stdout.strip().isdigit():
+            raise RuntimeError(f"Failed to start job on {server.display_name}: {stderr.strip() or stdout.strip()}")
+        
+        job = _build_job(server.name, job_id, dict(meta, alive="1"))
+        print(f"Started job {job_id} ({label}) on {server.display_name}, pid {stdout.strip()}")
+        return self._remember(job)
+    
+    async def list_jobs(self, server: ServerConfig) -> List[RemoteJob]:
+        """
+        List the jobs on a server in one round trip, pruning old finished ones
+        
+        Args:
+            server: Server configuration
+        
+        Returns:
+            Jobs, newest first
+        """
+        retention = max(1, settings.REMOTE_JOB_RETENTION_DAYS)
+        script = (
+            f"cd {_job_dir()} 2>/dev/null || exit 0; "
+            f"for f in $(find . -maxdepth 1 -name '*.exit' -mtime +{retention}); do "
+            f"id=${{f#./}}; id=${{id%.exit}}; rm -f \"$id\".*; done; "
+            f"for m in *.meta; do [ -e \"$m\" ] || continue; id=${{m%.meta}}; "
+            f"echo \"{_JOB_MARKER}$id\"; cat \"$m\"; {_STATUS_FIELDS}; done"
+        )
+        stdout, stderr, exit_code = await ssh_executor.run(server, script, timeout=30)
+        if exit_code != 0:
+            raise RuntimeError(stderr.strip() or f"exit code {exit_code}")
+        
+        jobs: List[RemoteJob] = []
+        job_id, values = None, {}
+        for line in stdout.splitlines() + [_JOB_MARKER]:
+            if line.startswith(_JOB_MARKER):
+                if job_id:
+                    jobs.append(_build_job(server.name, job_id, values))
+                job_id, values = line[len(_JOB_MARKER):].strip(), {}
+            elif "=" in line:
+                key, _, value = line.partition("=")
+                values[key] = value
+        
+        self._jobs[server.name] = {job.job_id: job for job in jobs}
+        return sorted(jobs, key=lambda job: job.job_id, reverse=True)
+    
+    async def poll(
+        self,
+        server: ServerConfig,
+        job: RemoteJob,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Tuple[RemoteJob, str, int]:
+        """
+        Refresh a job's state and read log output written since offset
+        
+        Args:
+            server: Server configuration
+            job: Job to poll
+            offset: Log byte offset already read
+            limit: Maximum log bytes to read (defaults to REMOTE_JOB_LOG_CHUNK, 0 reads none)
+        
+        Returns:
+            Tuple of (updated job, new output, new offset)
+        """
+        limit = settings.REMOTE_JOB_LOG_CHUNK if limit is None else limit
+        job_id = shlex.quote(job.job_id)
+        # Read a byte count fixed before reading, so the new offset is exact
+        script = (
+            f"cd {_job_dir()} || exit 1; id={job_id}; {_STATUS_FIELDS}; "
+            f"size=$(stat -c %s \"$id.log\" 2>/dev/null || echo 0); n=$((size - {offset})); "
+            f"[ $n -gt {limit} ] && n={limit}; [ $n -lt 0 ] && n=0; "
+            f"echo \"read=$n\"; echo {_JOB_MARKER.strip()}; "
+            f"tail -c +{offset + 1} \"$id.log\" | head -c $n"
+        )
+        stdout, stderr, exit_code = await ssh_executor.run(server, script, timeout=60)
+        if exit_code != 0:
+            raise RuntimeError(stderr.strip() or f"exit code {exit_code}")
+        
+        header, _, output = stdout.partition(_JOB_MARKER.strip() + "\n")
+        values = dict(job.meta)
+        for key in ("exit", "cancelled", "alive", "resumed"):
+            values.pop(key, None)
+        for line in header.splitlines():
+            key, _, value = line.partition("=")
+            values[key] = value
+        read = int(values.get("read", "0") or 0)
+        updated = _build_job(server.name, job.job_id, values)
+        return self._remember(updated), output, offset + read
+    
+    async def tail(self, server: ServerConfig, job_id: str, lines: int = 20) -> str:
+        """
+        Get the last lines of a job's log
+        
+        Args:
+            server: Server configuration
+            job_id: Job ID
+            lines: Number of lines
+        
+        Returns:
+            Log tail (progress updates written with carriage returns count as lines)
+        """
+        script = f"cd {_job_dir()} && tr '\\r' '\\n' < {shlex.quote(job_id + '.log')} | tail -n {int(lines)}"
+        stdout, stderr, exit_code = await ssh_executor.run(server, script, timeout=30)
+        if exit_code != 0:
+            raise RuntimeError(stderr.strip() or f"job {job_id} not found")
+        return stdout
+    
+    async def cancel(self, server: ServerConfig, job_id: str, force: bool = False) -> bool:
+        """
+        Signal a job's process group to stop
+        
+        Args:
+            server: Server configuration
+            job_id: Job ID
+            force: Send SIGTERM instead of SIGINT (SIGINT lets SnapRAID save its state)
+        
+        Returns:
+            True if a running process was signalled
+        """
+        signal = "TERM" if force else "INT"
+        quoted = shlex.quote(job_id)
+        script = (
+            f"cd {_job_dir()} || exit 1; id={quoted}; pid=$(cat \"$id.pid\") || exit 1; "
+            f"touch \"$id.cancelled\"; kill -{signal} -- -$pid 2>/dev/null || kill -{signal} $pid"
+        )
+        stdout, stderr, exit_code = await ssh_executor.run(server, script, timeout=30)
+        return exit_code == 0
+    
+    async def follow(
+        self,
+        server: ServerConfig,
+        job: RemoteJob,
+        on_output: Optional[Callable[[str], Awaitable[None]]] = None,
+        interval: Optional[float] = None
+    ) -> RemoteJob:
+        """
+        Poll a job until it stops, passing new log output to a callback
+        
+        Args:
+            server: Server configuration
+            job: Job to follow
+            on_output: Coroutine receiving each batch of new output
+            interval: Seconds between polls (defaults to REMOTE_JOB_POLL_INTERVAL)
+        
+        Returns:
+            The finished job
+        """
+        interval = interval or settings.REMOTE_JOB_POLL_INTERVAL
+        limit = settings.REMOTE_JOB_LOG_CHUNK if on_output else 0
+        key = (job.server_name, job.job_id)
+        self._following.add(key)
+        try:
+            return await self._follow(server, job, on_output, interval, limit)
+        finally:
+            self._following.discard(key)
+    
+    async def _follow(
+        self,
+        server: ServerConfig,
+        job: RemoteJob,
+        on_output: Optional[Callable[[str], Awaitable[None]]],
+        interval: float,
+        limit: int
+    ) -> RemoteJob:
+        """Poll loop behind follow()"""
+        offset = 0
+        failures = 0
+        while True:
+            previous = offset
+            try:
+                job, output, offset = await self.poll(server, job, offset, limit)
+                failures = 0
+            except Exception as e:
+                # Keep following through connection drops; the job runs on regardless
+                failures += 1
+                print(f"Failed to poll job {job.job_id} on {server.display_name} ({failures}): {e}")
+                await asyncio.sleep(min(interval * 2 ** failures, 300))
+                continue
+            if output and on_output:
+                await on_output(output)
+            if limit and offset - previous >= limit:
+                continue  # More output is waiting
+            if job.done:
+                return job
+            await asyncio.sleep(interval)
+    
+    async def mark_resumed(self, server: ServerConfig, job_id: str) -> None:
+        """Record that the containers paused for a job have been resumed"""
+        script = f"cd {_job_dir()} && touch {shlex.quote(job_id + '.resumed')}"
+        stdout, stderr, exit_code = await ssh_executor.run(server, script, timeout=30)
+        if exit_code != 0:
+            print(f"Failed to mark job {job_id} resumed on {server.display_name}: {stderr.strip()}")
+    
+    async def _resume_paused(self, server: ServerConfig, job: RemoteJob) -> str:
+        """Resume the containers a job's .meta lists as paused for it, returning a summary"""
+        names = [name for name in job.meta.get("paused", "").split(",") if name]
+        result = await DockerClient(server).resume_containers(names)
+        container_inventory.invalidate(server)
+        # Failures are reported rather than retried: a container may be gone by now
+        await self.mark_resumed(server, job.job_id)
+        summary = f"Resumed {result.count} of {len(names)} containers paused for the job"
+        if result.failed:
+            summary += " (failed: " + ", ".join(f"{name}: {error}" for name, error in result.failed.items()) + ")"
+        print(f"{summary} {job.job_id} on {server.display_name}")
+        return summary
+    
+    def _needs_resume(self, job: RemoteJob) -> bool:
+        """Whether a job has paused containers that were never resumed"""
+        return bool(job.meta.get("paused")) and not job.meta.get("resumed")
+    
+    def start(self, bot) -> None:
+        """Reattach to jobs still running on any server (call once the bot is ready; later calls are no-ops)"""
+        self._bot = bot
+        if self._started:
+            return
+        self._started = True
+        asyncio.create_task(self._reattach())
+    
+    async def _reattach(self) -> None:
+        """Find running jobs on all servers and report their completion"""
+        results = await fan_out(settings.get_all_servers(), self.list_jobs)
+        for result in results:
+            if not result.ok:
+                print(f"Failed to list jobs on {result.server.display_name}: {result.error}")
+                continue
+            for job in result.value:
+                key = (job.server_name, job.job_id)
+                if key in self._watchers or key in self._following:
+                    continue
+                if job.done and self._needs_resume(job):
+                    # The job ended while the bot was down, with its containers still paused
+                    self._watchers[key] = asyncio.create_task(self._report_when_done(result.server, job, None))
+                elif job.state == RUNNING:
+                    print(f"Reattached to job {job.job_id} ({job.label}) on {result.server.display_name}")
+                    # Hold the job's resources again so new operations queue behind it
+                    reservation = resource_scheduler.reserve(
+                        job.server_name,
+                        [r for r in job.meta.get("resources", "").split(",") if r],
+                        job.label,
+                        heavy=bool(job.meta.get("heavy")),
+                        user_id=job.user_id
+                    )
+                    self._watchers[key] = asyncio.create_task(self._report_when_done(result.server, job, reservation))
+    
+    async def _report_when_done(self, server: ServerConfig, job: RemoteJob, reservation: Optional[Reservation]) -> None:
+        """Post a reattached job's outcome to the channel it was started from, resuming its paused containers"""
+        resumed = ""
+        try:
+            if not job.done:
+                job = await self.follow(server, job)
+            if self._needs_resume(job):
+                try:
+                    resumed = await self._resume_paused(server, job)
+                except Exception as e:
+                    resumed = f"Failed to resume the containers paused for the job: {e}"
+                    print(f"{resumed} ({job.job_id} on {server.display_name})")
+        finally:
+            if reservation is not None:
+                resource_scheduler.release(reservation)
+            self._watchers.pop((job.server_name, job.job_id), None)
+        print(f"Job {job.job_id} ({job.label}) on {server.display_name} ended: {job.state}")
+        if not job.channel_id or self._bot is None:
+            return
+        channel = self._bot.get_channel(job.channel_id)
+        if channel is None:
+            return
+        try:
+            tail = await self.tail(server, job.job_id, lines=10)
+        except Exception:
+            tail = ""
+        icon = "✅" if job.state == FINISHED else "❌"
+        message = (
+            f"{icon} Job `{job.job_id}` ({job.label}) on {server.display_name} {job.state}"
+            + (f" (exit code {job.exit_code})" if job.exit_code is not None else "")
+        )
+        if resumed:
+            message += f"\n{resumed[:300]}"
+        if tail.strip():
+            message += f"\n```\n{tail[-1500:]}\n```"
+        try:
+            await channel.send(message)
+        except Exception as e:
+            print(f"Failed to report job {job.job_id}: {e}")
+
+
+# Global remote job manager instance
+remote_jobs = RemoteJobManager()
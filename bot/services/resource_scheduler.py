@@ -0,0 +1,169 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional
+from config import settings
+
+
+# Resources guarded on each server
+SNAPRAID_ARRAY = "snapraid"
+DOCKER_CONTAINERS = "docker"
+
+
+@dataclass(eq=False)
+class Reservation:
+    """A claim on resources of one server, queued until it can be granted"""
+    server_name: str
+    resources: FrozenSet[str]
+    label: str
+    heavy: bool = False
+    user_id: Optional[int] = None
+    created: float = field(default_factory=time.time)
+    granted_at: Optional[float] = None
+    cancelled: bool = False
+    timed_out: bool = False
+    _updated: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    
+    @property
+    def granted(self) -> bool:
+        """Whether the reservation holds its resources"""
+        return self.granted_at is not None
+
+
+class ResourceScheduler:
+    """
+    FIFO mutual exclusion for operations keyed by (server, resource)
+    
+    Each server has one queue. A reservation is granted once no earlier
+    reservation on the server shares one of its resources and, for disk-heavy
+    operations, fewer than HEAVY_JOBS_PER_HOST earlier heavy operations are
+    queued or running. Earlier reservations always go first, so a stream of
+    short operations cannot starve a queued sync.
+    """
+    
+    def __init__(self):
+        self._queues: Dict[str, List[Reservation]] = {}
+    
+    def reserve(
+        self,
+        server_name: str,
+        resources: Iterable[str],
+        label: str,
+        heavy: bool = False,
+        user_id: Optional[int] = None
+    ) -> Reservation:
+        """
+        Queue a claim on resources of a server
+        
+        Args:
+            server_name: Server name
+            resources: Resource names the operation needs exclusively
+            label: Description shown to users queued behind it
+            heavy: Whether the operation counts against the per-host disk-heavy cap
+            user_id: Discord user who requested the operation
+        
+        Returns:
+            The reservation (possibly granted immediately); release it when done
+        """
+        reservation = Reservation(server_name, frozenset(resources), label, heavy, user_id)
+        self._queues.setdefault(server_name, []).append(reservation)
+        self._schedule(server_name)
+        return reservation
+    
+    def _schedule(self, server_name: str) -> None:
+        """Grant every queued reservation that no earlier one blocks"""
+        claimed = set()
+        heavy = 0
+        for reservation in self._queues.get(server_name, []):
+            if not reservation.granted:
+                blocked = bool(reservation.resources & claimed) or (
+                    reservation.heavy and heavy >= max(1, settings.HEAVY_JOBS_PER_HOST)
+                )
+                if not blocked:
+                    reservation.granted_at = time.time()
+            # Pending reservations also claim their resources, keeping the queue FIFO
+            claimed |= reservation.resources
+            heavy += reservation.heavy
+            reservation._updated.set()
+    
+    def blockers(self, reservation: Reservation) -> List[Reservation]:
+        """Get the earlier reservations a pending reservation is waiting for"""
+        if reservation.granted:
+            return []
+        queue = self._queues.get(reservation.server_name, [])
+        ahead = queue[:queue.index(reservation)] if reservation in queue else []
+        return [
+            other for other in ahead
+            if other.resources & reservation.resources or (reservation.heavy and other.heavy)
+        ]
+    
+    def position(self, reservation: Reservation) -> int:
+        """Get how many operations are ahead of a reservation (0 once granted)"""
+        return len(self.blockers(reservation))
+    
+    async def wait(
+        self,
+        reservation: Reservation,
+        on_update: Optional[Callable[[int], Awaitable[None]]] = None,
+        max_wait: Optional[float] = None
+    ) -> bool:
+        """
+        Wait until a reservation is granted
+        
+        Args:
+            reservation: Reservation to wait for
+            on_update: Coroutine called with the queue position whenever it may have changed
+            max_wait: Seconds after which a reservation still queued is withdrawn (None to wait forever)
+        
+        Returns:
+            True once granted, False if the reservation was released or timed out while waiting
+        """
+        deadline = time.monotonic() + max_wait if max_wait else None
+        while not reservation.granted and not reservation.cancelled:
+            reservation._updated.clear()
+            if on_update:
+                await on_update(self.position(reservation))
+            if deadline is None:
+                await reservation._updated.wait()
+                continue
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                await asyncio.wait_for(reservation._updated.wait(), remaining)
+            except asyncio.TimeoutError:
+                if not reservation.granted:
+                    reservation.timed_out = True
+                    self.release(reservation)
+        return reservation.granted
+    
+    def release(self, reservation: Reservation) -> None:
+        """Release a reservation (or withdraw it from the queue) and grant the next ones"""
+        queue = self._queues.get(reservation.server_name, [])
+        if reservation in queue:
+            queue.remove(reservation)
+        if not reservation.granted:
+            reservation.cancelled = True
+        reservation._updated.set()
+        self._schedule(reservation.server_name)
+    
+    def describe_blockers(self, reservation: Reservation) -> str:
+        """Describe what a pending reservation is queued behind"""
+        blockers = self.blockers(reservation)
+        if not blockers:
+            return ""
+        first = blockers[0]
+        text = f"position {len(blockers)}, behind {first.label}"
+        if first.user_id:
+            text += f" (<@{first.user_id}>)"
+        return text
+    
+    def snapshot(self, server_name: Optional[str] = None) -> Dict[str, List[Reservation]]:
+        """Get the current queues, optionally for a single server"""
+        if server_name:
+            return {server_name: list(self._queues.get(server_name, []))}
+        return {name: list(queue) for name, queue in self._queues.items() if queue}
+
+
+# Global resource scheduler instance
+resource_scheduler = ResourceScheduler()
@@ -75,6 +75,49 @@ class ServerManager:
         """
         return [s.name for s in self.get_servers_with_feature(feature)]
     
+    def get_target_choices(self, feature: Optional[str] = None) -> List[str]:
+        """
+        Get fan-out targets: "all", "@feature" groups and server names
+        
+        Args:
+            feature: Restrict choices to servers supporting this feature
+            
+        Returns:
+            List of target strings accepted by resolve_targets
+        """
+        servers = self.get_servers_with_feature(feature) if feature else self.get_all_servers()
+        features = sorted({f for s in servers for f in s.features})
+        return ["all"] + [f"@{f}" for f in features] + [s.name for s in servers]
+    
+    def resolve_targets(self, target: str, feature: Optional[str] = None) -> tuple[List[ServerConfig], str]:
+        """
+        Resolve a fan-out target to a list of servers
+        
+        Args:
+            target: "all", "@feature" for every server with that feature, or a server name
+            feature: Feature every resolved server must support
+            
+        Returns:
+            Tuple of (servers, error_message)
+        """
+        if target == "all":
+            servers = self.get_servers_with_feature(feature) if feature else self.get_all_servers()
+        elif target.startswith("@"):
+            servers = self.get_servers_with_feature(target[1:])
+            if feature:
+                servers = [s for s in servers if s.has_feature(feature)]
+        else:
+            server = self.get_server(target)
+            if not server:
+                return [], f"Server '{target}' not found. Available servers: {', '.join(self.get_server_names())}"
+            if feature and not server.has_feature(feature):
+                return [], f"Server '{server.display_name}' does not support '{feature}'."
+            servers = [server]
+        
+        if not servers:
+            return [], f"No servers match '{target}'."
+        return servers, ""
+    
     def validate_server_feature(self, server_name: str, feature: str) -> tuple[bool, str]:
         """
         Validate that a server exists and supports a feature
@@ -0,0 +1,299 @@
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from config import ServerConfig, settings
+from services.metrics import metrics_collector
+from services.snapraid_runner import build_command
+from services.ssh_executor import ssh_executor
+
+
+# e.g. "   29549     187    1245     -    3717     274  93% d1"
+_STATUS_DISK_RE = re.compile(
+    r"^\s*(?P<files>\d+)\s+(?P<fragmented>\d+)\s+(?P<excess>\d+)\s+(?P<wasted>\S+)"
+    r"\s+(?P<used>\d+|-)\s+(?P<free>\d+|-)\s+(?P<use>\d+%|-)\s+(?P<name>\S+)\s*$"
+)
+_SCRUB_AGE_RE = re.compile(r"oldest block was scrubbed (\d+) days ago, the median (\d+), the newest (\d+)")
+_NOT_SCRUBBED_RE = re.compile(r"(\d+)% of the array is not scrubbed")
+_NOT_SYNCED_RE = re.compile(r"(\d+)% of the array is not synced")
+_SYNC_IN_PROGRESS_RE = re.compile(r"sync in progress at (\d+)%")
+_ERRORS_RE = re.compile(r"(?:there are|You have) (\d+) errors?")
+
+# e.g. "     38    987       0   5%  4.0  WD-WCC4E1234567  /dev/sdb  d1"
+_SMART_DISK_RE = re.compile(
+    r"^\s*(?P<temp>\d+|-)\s+(?P<days>\d+|-)\s+(?P<errors>\d+|-)\s+(?P<fp>\d+%|\S+)"
+    r"\s+(?P<size>[\d.]+|-)\s+(?P<serial>\S+)\s+(?P<device>/dev/\S+)\s+(?P<disk>\S+)\s*$"
+)
+_ARRAY_FAIL_RE = re.compile(r"at least one disk is going to fail in the next year is (\d+)%")
+
+
+@dataclass
+class DiskStatus:
+    """A data disk's row in snapraid status"""
+    name: str
+    files: int
+    fragmented_files: int
+    used_gb: Optional[int]
+    free_gb: Optional[int]
+    use_percent: Optional[int]
+
+
+@dataclass
+class SnapRAIDStatus:
+    """Parsed snapraid status report"""
+    disks: List[DiskStatus] = field(default_factory=list)
+    oldest_scrub_days: Optional[int] = None
+    median_scrub_days: Optional[int] = None
+    not_scrubbed_percent: int = 0
+    not_synced_percent: int = 0
+    sync_in_progress: Optional[int] = None  # Percent done of an interrupted sync
+    errors: int = 0
+    warnings: List[str] = field(default_factory=list)
+    fetched_at: float = 0.0
+    
+    @property
+    def synced(self) -> bool:
+        """Whether the whole array is covered by parity"""
+        return self.not_synced_percent == 0 and self.sync_in_progress is None
+
+
+@dataclass
+class DiskSmart:
+    """A disk's row in snapraid smart"""
+    disk: str
+    device: str
+    serial: str
+    temperature: Optional[int]
+    power_on_hours: Optional[int]
+    error_count: Optional[int]
+    fail_percent: Optional[int]  # None for SSDs and disks without an estimate
+    size_tb: Optional[float]
+
+
+@dataclass
+class SnapRAIDSmart:
+    """Parsed snapraid smart report"""
+    disks: List[DiskSmart] = field(default_factory=list)
+    array_fail_percent: Optional[int] = None
+    fetched_at: float = 0.0
+
+
+def _optional_int(value: str) -> Optional[int]:
+    """Parse an integer column where "-" means unknown"""
+    value = value.rstrip("%")
+    return int(value) if value.isdigit() else None
+
+
+def parse_status(output: str) -> SnapRAIDStatus:
+    """
+    Parse the output of snapraid status
+    
+    Args:
+        output: Command output
+    
+    Returns:
+        SnapRAIDStatus with whatever could be recognized
+    """
+    status = SnapRAIDStatus(fetched_at=time.time())
+    for line in output.splitlines():
+        disk = _STATUS_DISK_RE.match(line)
+        if disk:
+            status.disks.append(DiskStatus(
+                name=disk.group("name"),
+                files=int(disk.group("files")),
+                fragmented_files=int(disk.group("fragmented")),
+                used_gb=_optional_int(disk.group("used")),
+                free_gb=_optional_int(disk.group("free")),
+                use_percent=_optional_int(disk.group("use"))
+            ))
+            continue
+        
+        match = _SCRUB_AGE_RE.search(line)
+        if match:
+            status.oldest_scrub_days = int(match.group(1))
+            status.median_scrub_days = int(match.group(2))
+        match = _NOT_SCRUBBED_RE.search(line)
+        if match:
+            status.not_scrubbed_percent = int(match.group(1))
+        match = _NOT_SYNCED_RE.search(line)
+        if match:
+            status.not_synced_percent = int(match.group(1))
+        match = _SYNC_IN_PROGRESS_RE.search(line)
+        if match:
+            status.sync_in_progress = int(match.group(1))
+        match = _ERRORS_RE.search(line)
+        if match:
+            status.errors = max(status.errors, int(match.group(1)))
+        if line.startswith(("WARNING!", "DANGER!")):
+            status.warnings.append(line.strip())
+    return status
+
+
+def parse_smart(output: str) -> SnapRAIDSmart:
+    """
+    Parse the output of snapraid smart
+    
+    Args:
+        output: Command output
+    
+    Returns:
+        SnapRAIDSmart with one entry per listed device
+    """
+    smart = SnapRAIDSmart(fetched_at=time.time())
+    for line in output.splitlines():
+        disk = _SMART_DISK_RE.match(line)
+        if disk:
+            days = _optional_int(disk.group("days"))
+            size = disk.group("size")
+            smart.disks.append(DiskSmart(
+                disk=disk.group("disk"),
+                device=disk.group("device"),
+                serial=disk.group("serial"),
+                temperature=_optional_int(disk.group("temp")),
+                power_on_hours=days * 24 if days is not None else None,
+                error_count=_optional_int(disk.group("errors")),
+                fail_percent=_optional_int(disk.group("fp")),
+                size_tb=float(size) if size != "-" else None
+            ))
+            continue
+        match = _ARRAY_FAIL_RE.search(line)
+        if match:
+            smart.array_fail_percent = int(match.group(1))
+    return smart
+
+
+def status_metrics(status: SnapRAIDStatus) -> Dict[str, float]:
+    """Get the metrics published for a status report"""
+    values = {
+        "snapraid_errors": float(status.errors),
+        "snapraid_not_synced_percent": float(status.not_synced_percent),
+        "snapraid_not_scrubbed_percent": float(status.not_scrubbed_percent),
+    }
+    if status.oldest_scrub_days is not None:
+        values["snapraid_scrub_age_days"] = float(status.oldest_scrub_days)
+    return values
+
+
+def smart_metrics(smart: SnapRAIDSmart) -> Dict[str, float]:
+    """Get the metrics published for a SMART report, keyed per disk"""
+    values = {}
+    for disk in smart.disks:
+        # Devices outside the array are listed with "-" as their disk name
+        key = disk.disk if disk.disk != "-" else disk.device.rsplit("/", 1)[-1]
+        if disk.fail_percent is not None:
+            values[f"smart_fail_percent:{key}"] = float(disk.fail_percent)
+        if disk.temperature is not None:
+            values[f"smart_temperature:{key}"] = float(disk.temperature)
+        if disk.error_count is not None:
+            values[f"smart_errors:{key}"] = float(disk.error_count)
+    if smart.array_fail_percent is not None:
+        values["smart_array_fail_percent"] = float(smart.array_fail_percent)
+    return values
+
+
+class SnapRAIDReportService:
+    """
+    Cached, parsed snapraid status and smart reports per server
+    
+    snapraid smart spins up every disk, so its report is kept for
+    SNAPRAID_SMART_TTL seconds and repeat queries are answered from memory.
+    Concurrent requests for the same report share one remote run. Parsed
+    reports are published as metrics, which feeds history and alerts.
+    """
+    
+    def __init__(self):
+        self._status: Dict[str, SnapRAIDStatus] = {}
+        self._smart: Dict[str, SnapRAIDSmart] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._smart_attempts: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    async def _fetch(self, server: ServerConfig, report: str):
+        """Run a snapraid report command and parse its output"""
+        if not server.get_snapraid_config():
+            raise ValueError(f"Server {server.name} does not have SnapRAID configuration")
+        
+        stdout, stderr, exit_code = await ssh_executor.run(server, build_command(server, [report]), timeout=300)
+        if exit_code != 0:
+            raise RuntimeError(f"snapraid {report} failed: {stderr.strip() or stdout.strip()[-500:]}")
+        
+        if report == "status":
+            parsed = parse_status(stdout)
+            self._status[server.name] = parsed
+            metrics_collector.publish(server.name, status_metrics(parsed))
+        else:
+            parsed = parse_smart(stdout)
+            self._smart[server.name] = parsed
+            metrics_collector.publish(server.name, smart_metrics(parsed))
+        return parsed
+    
+    async def _get(self, server: ServerConfig, report: str, cache: Dict, ttl: float, refresh: bool):
+        """Serve a report from cache, or join/start a fetch"""
+        cached = cache.get(server.name)
+        if cached and not refresh and time.time() - cached.fetched_at < ttl:
+            return cached
+        
+        key = (server.name, report)
+        task = self._inflight.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._fetch(server, report))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+    
+    async def get_status(self, server: ServerConfig, refresh: bool = False) -> SnapRAIDStatus:
+        """
+        Get the parsed snapraid status of a server
+        
+        Args:
+            server: Server configuration
+            refresh: Ignore the cached report
+        
+        Returns:
+            SnapRAIDStatus (cached for up to SNAPRAID_STATUS_TTL seconds)
+        """
+        return await self._get(server, "status", self._status, settings.SNAPRAID_STATUS_TTL, refresh)
+    
+    async def get_smart(self, server: ServerConfig, refresh: bool = False) -> SnapRAIDSmart:
+        """
+        Get the parsed snapraid smart report of a server
+        
+        Args:
+            server: Server configuration
+            refresh: Ignore the cached report (spins up the disks)
+        
+        Returns:
+            SnapRAIDSmart (cached for up to SNAPRAID_SMART_TTL seconds)
+        """
+        return await self._get(server, "smart", self._smart, settings.SNAPRAID_SMART_TTL, refresh)
+    
+    def invalidate_status(self, server: ServerConfig) -> None:
+        """Drop a server's cached status, e.g. after a sync or scrub"""
+        self._status.pop(server.name, None)
+    
+    def start(self) -> None:
+        """Start periodic SMART refreshes for servers with smart_interval set (no-op if already running)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def _run(self) -> None:
+        """Refresh SMART reports of servers whose snapraid config sets smart_interval"""
+        while True:
+            for server in settings.get_servers_with_feature("snapraid"):
+                interval = (server.get_snapraid_config() or {}).get("smart_interval")
+                if not interval:
+                    continue
+                if time.time() - self._smart_attempts.get(server.name, 0.0) < interval:
+                    continue
+                self._smart_attempts[server.name] = time.time()
+                cached = self._smart.get(server.name)
+                if cached is None or time.time() - cached.fetched_at >= interval:
+                    try:
+                        await self.get_smart(server, refresh=True)
+                    except Exception as e:
+                        print(f"Scheduled SMART check on {server.display_name} failed: {e}")
+            await asyncio.sleep(60)
+
+
+# Global SnapRAID report service instance
+snapraid_reports = SnapRAIDReportService()
@@ -1,31 +1,124 @@
-from config import ServerConfig
-from services.ssh_executor import ssh_executor
+import re
+import shlex
+from dataclasses import dataclass
+from typing import List, Optional
+from config import ServerConfig, settings
+from services.remote_jobs import remote_jobs, RemoteJob
+from services.resource_scheduler import SNAPRAID_ARRAY, DOCKER_CONTAINERS
 
 
-def run_snapraid_command(server: ServerConfig, *args: str) -> str:
+# e.g. "45%, 1234567 MB, 160 MB/s, 1216 stripe/s, CPU 10%, 3:12 ETA"
+_PROGRESS_RE = re.compile(
+    r"(?P<percent>\d+)%,\s*(?P<processed>\d+) MB"
+    r"(?:,\s*(?P<speed>\d+) MB/s)?"
+    r"(?:,\s*(?P<stripes>\d+) stripe/s)?"
+    r"(?:,\s*CPU (?P<cpu>\d+)%)?"
+    r"(?:,\s*(?P<eta_hours>\d+):(?P<eta_minutes>\d+) ETA)?"
+)
+
+
+@dataclass
+class SnapRAIDProgress:
+    """A progress report printed by a running SnapRAID command"""
+    percent: int
+    processed_mb: int
+    speed_mb_s: Optional[int] = None
+    cpu_percent: Optional[int] = None
+    eta_minutes: Optional[int] = None
+    
+    def format_eta(self) -> str:
+        """Get the ETA as a human-readable string"""
+        if self.eta_minutes is None:
+            return "unknown"
+        hours, minutes = divmod(self.eta_minutes, 60)
+        return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m"
+
+
+def parse_progress_line(line: str) -> Optional[SnapRAIDProgress]:
     """
-    Run a SnapRAID command on a remote server
+    Parse a SnapRAID progress line
     
     Args:
-        server: Server configuration
-        *args: SnapRAID command arguments
+        line: A line of SnapRAID output
         
     Returns:
-        Command output
+        SnapRAIDProgress if the line is a progress report, None otherwise
     """
-    sr_config = server.get_snapraid_config()
-    if not sr_config:
-        return f"Server {server.name} does not have SnapRAID configuration"
+    match = _PROGRESS_RE.search(line)
+    if not match:
+        return None
     
-    conf_path = sr_config['conf_path']
-    cmd = f"snapraid -c {conf_path} {' '.join(args)}"
+    def optional_int(name: str) -> Optional[int]:
+        value = match.group(name)
+        return int(value) if value is not None else None
     
-    # SnapRAID commands can take a while, especially sync/scrub
-    timeout = 300  # 5 minutes
-    stdout, stderr, exit_code = ssh_executor.execute_command(server, cmd, timeout)
+    eta_minutes = None
+    if match.group("eta_hours") is not None:
+        eta_minutes = int(match.group("eta_hours")) * 60 + int(match.group("eta_minutes"))
     
-    if exit_code == 0:
-        return stdout.strip()
-    else:
-        return f"SnapRAID command failed:\n{stderr}"
+    return SnapRAIDProgress(
+        percent=int(match.group("percent")),
+        processed_mb=int(match.group("processed")),
+        speed_mb_s=optional_int("speed"),
+        cpu_percent=optional_int("cpu"),
+        eta_minutes=eta_minutes
+    )
+
+
+# Touched in the job directory when a sync finishes successfully; its mtime is the last sync time
+SYNC_MARKER = "snapraid-last-sync"
+
+
+def sync_marker_path() -> str:
+    """Get the shell-quoted path of the sync marker (relative to the SSH user's home)"""
+    return shlex.quote(f"{settings.REMOTE_JOB_DIR}/{SYNC_MARKER}")
+
+
+def build_command(server: ServerConfig, args) -> str:
+    """Build the snapraid command line for a server"""
+    conf_path = server.get_snapraid_config()['conf_path']
+    return f"snapraid -c {conf_path} {' '.join(args)}"
 
+
+async def start_snapraid_job(
+    server: ServerConfig,
+    action: str,
+    user_id: Optional[int] = None,
+    channel_id: Optional[int] = None,
+    paused_containers: Optional[List[str]] = None
+) -> RemoteJob:
+    """
+    Start a long-running SnapRAID command as a detached remote job
+    
+    The job survives SSH disconnects and bot restarts; follow it with
+    remote_jobs.follow(). Callers should hold the SnapRAID array (and the
+    containers, when they paused some) in the resource scheduler while it runs.
+    
+    Args:
+        server: Server configuration
+        action: SnapRAID command (e.g. sync, scrub, fix)
+        user_id: Discord user who started the job
+        channel_id: Channel to report completion to
+        paused_containers: Containers paused for the job; recorded so they are resumed even after a restart
+        
+    Returns:
+        The started job
+    """
+    if not server.get_snapraid_config():
+        raise ValueError(f"Server {server.name} does not have SnapRAID configuration")
+    
+    command = build_command(server, [action])
+    if action == "sync":
+        # scrub and fix rewrite the content file too, so only a marker tells when the last sync was
+        command += f" && touch {sync_marker_path()}"
+    
+    return await remote_jobs.launch(
+        server,
+        command,
+        f"snapraid {action}",
+        user_id,
+        channel_id,
+        resources=[SNAPRAID_ARRAY, DOCKER_CONTAINERS] if paused_containers else [SNAPRAID_ARRAY],
+        heavy=True,
+        paused_containers=paused_containers or ()
+    )
@@ -1,48 +1,235 @@
 import paramiko
-import io
-from typing import Tuple, Optional
-from config import ServerConfig
+import re
+import codecs
+import select
+import asyncio
+import threading
+import concurrent.futures
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, NamedTuple, Tuple, Optional
+from config import ServerConfig, settings
+from services.ssh_pool import SSHConnectionPool
 import time
 
 
-class SSHExecutor:
-    """Service for executing commands on remote servers via SSH"""
+# Bytes read from a channel per recv call
+_RECV_SIZE = 32768
+
+# Line batches buffered between a pump thread and its async consumer
+_STREAM_QUEUE_SIZE = 64
+
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+# Marks the end of a command's output on a stream queue
+_END_OF_STREAM = object()
+
+
+class OutputLine(NamedTuple):
+    """A decoded line of command output"""
+    stream: str  # "stdout" or "stderr"
+    text: str
+
+
+class OutputBuffer:
+    """Ring buffer keeping the most recent lines of output within a character budget"""
+    
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self._lines: Deque[str] = deque()
+        self._size = 0
+        self.dropped_lines = 0
+    
+    def append(self, line: str) -> None:
+        """Add a line, dropping the oldest lines once the budget is exceeded"""
+        self._lines.append(line)
+        self._size += len(line) + 1
+        while self._size > self.max_chars and len(self._lines) > 1:
+            self._size -= len(self._lines.popleft()) + 1
+            self.dropped_lines += 1
+    
+    def getvalue(self) -> str:
+        """Get the buffered output as text"""
+        text = "".join(line + "\n" for line in self._lines)
+        if self.dropped_lines:
+            text = f"[... {self.dropped_lines} earlier lines dropped ...]\n" + text
+        return text
+
+
+class _LineDecoder:
+    """Incrementally decodes UTF-8 bytes and splits them into lines"""
     
     def __init__(self):
-        self._connections = {}  # Connection pool
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
     
-    def _get_connection(self, server: ServerConfig) -> paramiko.SSHClient:
-        """Get or create SSH connection for a server"""
-        key = server.name
-        
-        # Check if we have an existing connection
-        if key in self._connections:
-            client = self._connections[key]
+    def feed(self, data: bytes) -> List[str]:
+        """Decode a chunk and return the lines it completes"""
+        text = self._pending + self._decoder.decode(data)
+        # A trailing "\r" may be the first half of "\r\n"; hold it for the next chunk
+        hold_cr = text.endswith("\r")
+        if hold_cr:
+            text = text[:-1]
+        parts = _LINE_BREAK.split(text)
+        self._pending = parts.pop() + ("\r" if hold_cr else "")
+        return parts
+    
+    def flush(self) -> List[str]:
+        """Return whatever is left once the stream has ended"""
+        text = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        text = text.rstrip("\r")
+        return [text] if text else []
+
+
+class CommandHandle:
+    """Tracks the channel of an in-flight command so it can be cancelled from another thread"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channel: Optional[paramiko.Channel] = None
+        self.cancelled = False
+    
+    def attach(self, channel: paramiko.Channel) -> None:
+        """Attach the channel the command is running on"""
+        with self._lock:
+            self._channel = channel
+            cancelled = self.cancelled
+        if cancelled:
+            channel.close()
+    
+    def cancel(self) -> None:
+        """Close the command's channel, aborting the remote command"""
+        with self._lock:
+            self.cancelled = True
+            channel = self._channel
+        if channel is not None:
             try:
-                # Test if connection is still alive
-                client.exec_command("echo test", timeout=2)
-                return client
-            except:
-                # Connection is dead, remove it
+                channel.close()
+            except Exception:
+                pass
+
+
+class CommandCancelled(Exception):
+    """Raised when a running command is cancelled"""
+
+
+class CommandStream:
+    """Async iterator over the output of a remote command"""
+    
+    def __init__(
+        self,
+        executor: "SSHExecutor",
+        server: ServerConfig,
+        command: str,
+        timeout: Optional[float],
+        get_pty: bool,
+        background: bool = False
+    ):
+        self._executor = executor
+        self.server = server
+        self.command = command
+        self.timeout = timeout
+        self.get_pty = get_pty
+        self.background = background
+        self.exit_code: Optional[int] = None
+        self._handle = CommandHandle()
+    
+    def cancel(self) -> None:
+        """Abort the remote command; iteration ends with CommandCancelled"""
+        self._handle.cancel()
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancel() has been called"""
+        return self._handle.cancelled
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_STREAM_QUEUE_SIZE)
+        handle = self._handle
+        
+        def put(item) -> bool:
+            # Block the pump thread while the consumer is behind, giving up once cancelled
+            while not handle.cancelled:
+                try:
+                    future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+                except RuntimeError:
+                    return False
                 try:
-                    client.close()
-                except:
-                    pass
-                del self._connections[key]
+                    future.result(timeout=1)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    if not future.cancel():
+                        return True
+            return False
         
-        # Create new connection
+        def finish() -> None:
+            # Runs on the loop: make room for the end marker if the consumer fell behind
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(_END_OF_STREAM)
+        
+        def pump() -> int:
+            try:
+                return self._executor._pump_command(
+                    self.server, self.command, self.timeout, self.get_pty, handle, put
+                )
+            finally:
+                if not put(_END_OF_STREAM):
+                    try:
+                        loop.call_soon_threadsafe(finish)
+                    except RuntimeError:
+                        pass
+        
+        async with self._executor._get_host_semaphore(self.server, self.background):
+            worker = self._executor._start_worker(pump, self.background)
+            try:
+                while True:
+                    batch = await queue.get()
+                    if batch is _END_OF_STREAM:
+                        break
+                    for line in batch:
+                        yield line
+                self.exit_code = await worker
+            finally:
+                if not worker.done():
+                    handle.cancel()
+                    worker.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+class SSHExecutor:
+    """Service for executing commands on remote servers via SSH"""
+    
+    def __init__(self):
+        self._pool = SSHConnectionPool(
+            self._connect,
+            acquire_timeout=settings.SSH_POOL_ACQUIRE_TIMEOUT,
+            janitor_interval=settings.SSH_POOL_JANITOR_INTERVAL
+        )
+        self._host_semaphores: Dict[Tuple[str, bool], asyncio.Semaphore] = {}
+        self._thread_pool = ThreadPoolExecutor(
+            max_workers=settings.SSH_WORKER_THREADS,
+            thread_name_prefix="ssh"
+        )
+    
+    def _connect(self, server: ServerConfig) -> paramiko.SSHClient:
+        """Open a new SSH connection to a server"""
         client = paramiko.SSHClient()
         client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         
         try:
             # Load private key
             if server.connection.key_path:
-                key = paramiko.RSAKey.from_private_key_file(server.connection.key_path)
+                pkey = paramiko.RSAKey.from_private_key_file(server.connection.key_path)
                 client.connect(
                     hostname=server.connection.host,
                     port=server.connection.port,
                     username=server.connection.user,
-                    pkey=key,
+                    pkey=pkey,
                     timeout=10
                 )
             else:
@@ -54,38 +241,278 @@ class SSHExecutor:
                     timeout=10
                 )
             
-            self._connections[key] = client
+            # Keepalives let the transport notice dead peers on its own
+            if server.connection.keepalive_interval > 0:
+                client.get_transport().set_keepalive(server.connection.keepalive_interval)
+            
             return client
             
         except Exception as e:
             raise ConnectionError(f"Failed to connect to {server.display_name}: {e}")
     
+    def _exec_with_retry(self, server: ServerConfig, command: str, timeout: Optional[float], get_pty: bool, body):
+        """
+        Lease a pooled connection, start a command and hand its channel files to body
+        
+        If the channel cannot be opened the connection is marked broken and the
+        command retries once on another connection. The channel slot stays
+        reserved until body returns.
+        
+        Returns:
+            Whatever body returns
+        """
+        for attempt in range(2):
+            with self._pool.lease(server) as conn:
+                try:
+                    stdin, stdout, stderr = conn.client.exec_command(command, timeout=timeout, get_pty=get_pty)
+                except (paramiko.SSHException, EOFError, OSError):
+                    conn.mark_broken()
+                    if attempt:
+                        raise
+                    continue
+                return body(stdin, stdout, stderr)
+    
+    def _pump_command(
+        self,
+        server: ServerConfig,
+        command: str,
+        timeout: Optional[float],
+        get_pty: bool,
+        handle: CommandHandle,
+        emit: Callable[[List[OutputLine]], None]
+    ) -> int:
+        """
+        Run a command, passing batches of decoded output lines to emit as they arrive
+        
+        stdout and stderr are drained together so a chatty stream can never
+        fill the channel window and stall the command.
+        
+        Returns:
+            Exit code of the command
+        """
+        def pump(stdin, stdout, stderr):
+            channel = stdout.channel
+            handle.attach(channel)
+            decoders = {"stdout": _LineDecoder(), "stderr": _LineDecoder()}
+            deadline = time.monotonic() + timeout if timeout else None
+            
+            while True:
+                if handle.cancelled:
+                    raise CommandCancelled("Command cancelled")
+                
+                batch = []
+                if channel.recv_ready():
+                    batch.extend(OutputLine("stdout", line) for line in decoders["stdout"].feed(channel.recv(_RECV_SIZE)))
+                if channel.recv_stderr_ready():
+                    batch.extend(OutputLine("stderr", line) for line in decoders["stderr"].feed(channel.recv_stderr(_RECV_SIZE)))
+                if batch:
+                    emit(batch)
+                    continue
+                
+                # Buffers are empty, so once the exit status is in all output has been read
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    break
+                
+                if deadline is not None and time.monotonic() > deadline:
+                    channel.close()
+                    raise TimeoutError(f"Command timed out after {timeout}s")
+                
+                select.select([channel], [], [], 0.5)
+            
+            tail = [OutputLine(name, line) for name, decoder in decoders.items() for line in decoder.flush()]
+            if tail:
+                emit(tail)
+            return channel.recv_exit_status()
+        
+        return self._exec_with_retry(server, command, timeout, get_pty, pump)
+    
+    def _get_host_semaphore(self, server: ServerConfig, background: bool = False) -> asyncio.Semaphore:
+        """Get the semaphore limiting concurrent commands (or background commands) on a server"""
+        key = (server.name, background)
+        semaphore = self._host_semaphores.get(key)
+        if semaphore is None:
+            limit = self.background_limit(server) if background else max(1, server.connection.max_concurrent_commands)
+            semaphore = asyncio.Semaphore(limit)
+            self._host_semaphores[key] = semaphore
+        return semaphore
+    
+    def background_limit(self, server: ServerConfig) -> int:
+        """Get the number of background commands allowed at once on a server"""
+        return max(1, server.connection.max_background_commands)
+    
+    def _start_worker(self, fn: Callable[[], int], background: bool) -> "asyncio.Future[int]":
+        """
+        Run a blocking pump function off the event loop
+        
+        Regular commands share the worker pool. Background commands may run
+        for hours, so each gets a dedicated thread instead of tying up a
+        pool worker.
+        """
+        loop = asyncio.get_running_loop()
+        if not background:
+            return loop.run_in_executor(self._thread_pool, fn)
+        
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        
+        def target() -> None:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=target, name="ssh-background", daemon=True).start()
+        return asyncio.wrap_future(future, loop=loop)
+    
     def execute_command(
         self, 
         server: ServerConfig, 
         command: str, 
-        timeout: int = 30
+        timeout: Optional[float] = 30,
+        handle: Optional[CommandHandle] = None,
+        max_output: Optional[int] = None
     ) -> Tuple[str, str, int]:
         """
         Execute a command on a remote server
         
+        This blocks the calling thread; coroutines should use run() or stream() instead.
+        
+        Args:
+            server: Server configuration
+            command: Shell command to execute
+            timeout: Command timeout in seconds (None for no limit)
+            handle: Optional handle used to cancel the command from another thread
+            max_output: Characters kept per stream; older lines are dropped beyond it
+        
         Returns:
             Tuple of (stdout, stderr, exit_code)
         """
+        handle = handle or CommandHandle()
+        max_output = max_output or settings.SSH_MAX_OUTPUT_CHARS
+        buffers = {"stdout": OutputBuffer(max_output), "stderr": OutputBuffer(max_output)}
+        
+        def collect(batch: List[OutputLine]) -> None:
+            for line in batch:
+                buffers[line.stream].append(line.text)
+        
         try:
-            client = self._get_connection(server)
-            stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
+            exit_code = self._pump_command(server, command, timeout, False, handle, collect)
+            return buffers["stdout"].getvalue(), buffers["stderr"].getvalue(), exit_code
             
-            # Wait for command to complete
-            exit_code = stdout.channel.recv_exit_status()
+        except Exception as e:
+            if handle.cancelled:
+                return "", "Command cancelled", -1
+            return "", str(e), -1
+    
+    def stream(
+        self,
+        server: ServerConfig,
+        command: str,
+        timeout: Optional[float] = None,
+        get_pty: bool = False,
+        background: bool = False
+    ) -> "CommandStream":
+        """
+        Start a command on a remote server and stream its output
+        
+        Iterate the returned stream with ``async for`` to receive OutputLine
+        items as they arrive; its exit_code is set once iteration finishes.
+        The command starts when iteration begins and counts against the
+        server's max_concurrent_commands until it ends. Long-lived commands
+        pass background=True: they count against max_background_commands
+        and run on their own thread, so they never hold a command slot or a
+        shared worker thread.
+        
+        Args:
+            server: Server configuration
+            command: Shell command to execute
+            timeout: Overall command timeout in seconds (None for no limit)
+            get_pty: Allocate a pseudo-terminal, so cancelling sends SIGHUP to the remote process
+            background: Run outside the command slots and worker pool
             
-            stdout_str = stdout.read().decode('utf-8', errors='replace')
-            stderr_str = stderr.read().decode('utf-8', errors='replace')
+        Returns:
+            CommandStream for the command
+        """
+        return CommandStream(self, server, command, timeout, get_pty, background)
+    
+    def open_channel(self, server: ServerConfig, command: str) -> Tuple[paramiko.Channel, Callable[[], None]]:
+        """
+        Start a command and return its raw channel for two-way traffic
+        
+        Used for long-lived byte streams such as a tunnel to a socket. The
+        channel keeps its pool slot until the returned release function is
+        called, which also closes the channel. This blocks the calling thread.
+        
+        Args:
+            server: Server configuration
+            command: Shell command to execute
+        
+        Returns:
+            Tuple of (channel, release function)
+        """
+        for attempt in range(2):
+            conn = self._pool.acquire(server)
+            try:
+                channel = conn.client.get_transport().open_session()
+                channel.exec_command(command)
+            except (paramiko.SSHException, EOFError, OSError, AttributeError):
+                conn.mark_broken()
+                self._pool.release(server, conn)
+                if attempt:
+                    raise
+                continue
+            
+            released = threading.Event()
             
-            return stdout_str, stderr_str, exit_code
+            def release() -> None:
+                if not released.is_set():
+                    released.set()
+                    try:
+                        channel.close()
+                    finally:
+                        self._pool.release(server, conn)
+            
+            return channel, release
+    
+    async def run(
+        self,
+        server: ServerConfig,
+        command: str,
+        timeout: Optional[float] = 30,
+        max_output: Optional[int] = None,
+        background: bool = False
+    ) -> Tuple[str, str, int]:
+        """
+        Execute a command on a remote server without blocking the event loop
+        
+        Commands on the same server are limited to the server's
+        max_concurrent_commands; commands on different servers run in parallel.
+        Cancelling the awaiting task closes the channel of the remote command.
+        
+        Args:
+            server: Server configuration
+            command: Shell command to execute
+            timeout: Command timeout in seconds (None for no limit)
+            max_output: Characters kept per stream; older lines are dropped beyond it
+            background: Run outside the command slots and worker pool (see stream())
             
+        Returns:
+            Tuple of (stdout, stderr, exit_code)
+        """
+        max_output = max_output or settings.SSH_MAX_OUTPUT_CHARS
+        buffers = {"stdout": OutputBuffer(max_output), "stderr": OutputBuffer(max_output)}
+        
+        command_stream = self.stream(server, command, timeout, background=background)
+        try:
+            async for line in command_stream:
+                buffers[line.stream].append(line.text)
+        except CommandCancelled:
+            return "", "Command cancelled", -1
         except Exception as e:
             return "", str(e), -1
+        
+        return buffers["stdout"].getvalue(), buffers["stderr"].getvalue(), command_stream.exit_code
     
     def execute_python_script(
         self, 
@@ -127,10 +554,10 @@ class SSHExecutor:
             True if successful, False otherwise
         """
         try:
-            client = self._get_connection(server)
-            sftp = client.open_sftp()
-            sftp.put(local_path, remote_path)
-            sftp.close()
+            with self._pool.lease(server) as conn:
+                sftp = conn.client.open_sftp()
+                sftp.put(local_path, remote_path)
+                sftp.close()
             return True
         except Exception as e:
             print(f"Failed to upload file to {server.display_name}: {e}")
@@ -154,14 +581,14 @@ class SSHExecutor:
             True if successful, False otherwise
         """
         try:
-            client = self._get_connection(server)
-            sftp = client.open_sftp()
-            
-            # Write content to remote file
-            with sftp.file(remote_path, 'wb') as remote_file:
-                remote_file.write(content)
-            
-            sftp.close()
+            with self._pool.lease(server) as conn:
+                sftp = conn.client.open_sftp()
+                
+                # Write content to remote file
+                with sftp.file(remote_path, 'wb') as remote_file:
+                    remote_file.write(content)
+                
+                sftp.close()
             return True
         except Exception as e:
             print(f"Failed to upload file content to {server.display_name}: {e}")
@@ -180,15 +607,18 @@ class SSHExecutor:
         except:
             return False
     
+    def pool_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get connection pool usage per server
+        
+        Returns:
+            Dict of server name to pool statistics
+        """
+        return self._pool.stats()
+    
     def close_all(self):
         """Close all SSH connections"""
-        for client in self._connections.values():
-            try:
-                client.close()
-            except:
-                pass
-        self._connections.clear()
-
+        self._pool.close_all()
 
 # Global SSH executor instance
 ssh_executor = SSHExecutor()
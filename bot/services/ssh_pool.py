@@ -0,0 +1,321 @@
+import paramiko
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from config import ServerConfig
+
+
+class PooledConnection:
+    """An SSH connection owned by a host pool, multiplexing several channels"""
+    
+    def __init__(self, client: paramiko.SSHClient):
+        self.client = client
+        self.channels = 0
+        self.created = time.time()
+        self.last_used = self.created
+        self.broken = False
+    
+    def is_alive(self) -> bool:
+        """Check liveness from transport state (no round trip)"""
+        if self.broken:
+            return False
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+    
+    def mark_broken(self) -> None:
+        """Flag the connection so it is closed instead of reused when released"""
+        self.broken = True
+    
+    def close(self) -> None:
+        """Close the underlying SSH client"""
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+
+class HostPool:
+    """Pool of SSH connections to a single server"""
+    
+    def __init__(
+        self,
+        server: ServerConfig,
+        connect: Callable[[ServerConfig], paramiko.SSHClient]
+    ):
+        """
+        Initialize the pool for a server
+        
+        Args:
+            server: Server configuration (pool sizing comes from its connection block)
+            connect: Factory opening a new SSH client to the server
+        """
+        self.server = server
+        self._connect = connect
+        self.min_size = max(0, server.connection.pool_min_size)
+        self.max_size = max(1, server.connection.pool_max_size)
+        self.max_channels = max(1, server.connection.max_channels_per_connection)
+        self.idle_timeout = server.connection.idle_timeout
+        
+        # The condition guards all bookkeeping below; its waiters form the queue
+        # of callers waiting for a free channel
+        self._cond = threading.Condition()
+        self._connections: List[PooledConnection] = []
+        self._connecting = 0
+        self._waiting = 0
+        
+        # Counters
+        self._created = 0
+        self._evicted = 0
+        self._waits = 0
+        self._max_wait = 0.0
+    
+    def _prune_dead(self) -> List[PooledConnection]:
+        """Remove dead connections from the pool (caller holds the lock)"""
+        dead = [c for c in self._connections if not c.is_alive() and c.channels == 0]
+        for conn in dead:
+            self._connections.remove(conn)
+        return dead
+    
+    def acquire(self, timeout: float) -> PooledConnection:
+        """
+        Reserve a channel slot on a pooled connection, opening a new connection if allowed
+        
+        Args:
+            timeout: Seconds to wait for a free slot
+        
+        Returns:
+            The connection the slot was reserved on
+        """
+        deadline = time.monotonic() + timeout
+        waited_since = None
+        dead: List[PooledConnection] = []
+        grow = False
+        
+        with self._cond:
+            while True:
+                dead.extend(self._prune_dead())
+                
+                # Pack channels onto the least loaded live connection
+                candidates = [c for c in self._connections if c.is_alive() and c.channels < self.max_channels]
+                if candidates:
+                    conn = min(candidates, key=lambda c: c.channels)
+                    conn.channels += 1
+                    conn.last_used = time.time()
+                    self._record_wait(waited_since)
+                    break
+                
+                # Grow the pool; the connection itself is opened outside the lock
+                if len(self._connections) + self._connecting < self.max_size:
+                    self._connecting += 1
+                    conn = None
+                    grow = True
+                    self._record_wait(waited_since)
+                    break
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    conn = None
+                    break
+                
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    self._waits += 1
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+        
+        for d in dead:
+            d.close()
+        
+        if conn is not None:
+            return conn
+        if not grow:
+            raise TimeoutError(f"Timed out waiting for an SSH channel on {self.server.display_name}")
+        
+        try:
+            client = self._connect(self.server)
+        except Exception:
+            with self._cond:
+                self._connecting -= 1
+                self._cond.notify()
+            raise
+        
+        conn = PooledConnection(client)
+        conn.channels = 1
+        with self._cond:
+            self._connecting -= 1
+            self._created += 1
+            self._connections.append(conn)
+            # The new connection has spare channels for queued callers
+            self._cond.notify(self.max_channels - 1)
+        return conn
+    
+    def _record_wait(self, waited_since: Optional[float]) -> None:
+        """Track the longest wait for a slot (caller holds the lock)"""
+        if waited_since is not None:
+            self._max_wait = max(self._max_wait, time.monotonic() - waited_since)
+    
+    def release(self, conn: PooledConnection) -> None:
+        """Return a channel slot, closing the connection if it is broken"""
+        close = False
+        with self._cond:
+            conn.channels -= 1
+            conn.last_used = time.time()
+            if not conn.is_alive() and conn.channels == 0 and conn in self._connections:
+                self._connections.remove(conn)
+                close = True
+            self._cond.notify()
+        if close:
+            conn.close()
+    
+    def evict_idle(self) -> None:
+        """Close dead connections and idle ones beyond the pool minimum"""
+        now = time.time()
+        to_close = []
+        with self._cond:
+            to_close.extend(self._prune_dead())
+            idle = sorted(
+                (c for c in self._connections if c.channels == 0),
+                key=lambda c: c.last_used
+            )
+            for conn in idle:
+                if len(self._connections) <= self.min_size:
+                    break
+                if now - conn.last_used >= self.idle_timeout:
+                    self._connections.remove(conn)
+                    to_close.append(conn)
+            self._evicted += len(to_close)
+        for conn in to_close:
+            conn.close()
+    
+    def ensure_min_size(self) -> None:
+        """Open connections until the pool holds its configured minimum"""
+        while True:
+            with self._cond:
+                if len(self._connections) + self._connecting >= self.min_size:
+                    return
+                self._connecting += 1
+            try:
+                client = self._connect(self.server)
+            except Exception as e:
+                print(f"Failed to pre-open SSH connection to {self.server.display_name}: {e}")
+                with self._cond:
+                    self._connecting -= 1
+                return
+            with self._cond:
+                self._connecting -= 1
+                self._created += 1
+                self._connections.append(PooledConnection(client))
+                self._cond.notify()
+    
+    def stats(self) -> Dict[str, float]:
+        """Get a snapshot of pool usage"""
+        with self._cond:
+            return {
+                "connections": len(self._connections),
+                "idle_connections": sum(1 for c in self._connections if c.channels == 0),
+                "channels_in_use": sum(c.channels for c in self._connections),
+                "channel_capacity": self.max_size * self.max_channels,
+                "waiting": self._waiting,
+                "waits": self._waits,
+                "max_wait": round(self._max_wait, 3),
+                "created": self._created,
+                "evicted": self._evicted,
+            }
+    
+    def close_all(self) -> None:
+        """Close every connection in the pool"""
+        with self._cond:
+            connections = self._connections
+            self._connections = []
+            self._cond.notify_all()
+        for conn in connections:
+            conn.close()
+
+
+class SSHConnectionPool:
+    """Thread-safe registry of per-server SSH connection pools"""
+    
+    def __init__(
+        self,
+        connect: Callable[[ServerConfig], paramiko.SSHClient],
+        acquire_timeout: float = 30,
+        janitor_interval: float = 30
+    ):
+        """
+        Initialize the pool registry
+        
+        Args:
+            connect: Factory opening a new SSH client to a server
+            acquire_timeout: Seconds a caller waits for a free channel slot
+            janitor_interval: Seconds between idle eviction passes
+        """
+        self._connect = connect
+        self.acquire_timeout = acquire_timeout
+        self.janitor_interval = janitor_interval
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostPool] = {}
+        self._janitor: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+    
+    def _get_host_pool(self, server: ServerConfig) -> HostPool:
+        """Get or create the pool for a server"""
+        with self._lock:
+            pool = self._hosts.get(server.name)
+            if pool is None:
+                pool = HostPool(server, self._connect)
+                self._hosts[server.name] = pool
+            if self._janitor is None:
+                self._janitor = threading.Thread(target=self._janitor_loop, name="ssh-pool-janitor", daemon=True)
+                self._janitor.start()
+            return pool
+    
+    def _janitor_loop(self) -> None:
+        """Periodically evict idle connections and top pools up to their minimum"""
+        while not self._stopped.wait(self.janitor_interval):
+            with self._lock:
+                pools = list(self._hosts.values())
+            for pool in pools:
+                try:
+                    pool.evict_idle()
+                    pool.ensure_min_size()
+                except Exception as e:
+                    print(f"SSH pool maintenance failed for {pool.server.display_name}: {e}")
+    
+    @contextmanager
+    def lease(self, server: ServerConfig) -> Iterator[PooledConnection]:
+        """
+        Reserve a channel slot on a connection to a server for the duration of the block
+        
+        Call mark_broken() on the connection if it fails, so it is not reused.
+        """
+        conn = self.acquire(server)
+        try:
+            yield conn
+        finally:
+            self.release(server, conn)
+    
+    def acquire(self, server: ServerConfig) -> PooledConnection:
+        """Reserve a channel slot on a connection to a server until release() is called"""
+        return self._get_host_pool(server).acquire(self.acquire_timeout)
+    
+    def release(self, server: ServerConfig, conn: PooledConnection) -> None:
+        """Return a channel slot reserved with acquire()"""
+        self._get_host_pool(server).release(conn)
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Get usage snapshots for every server pool, keyed by server name"""
+        with self._lock:
+            pools = dict(self._hosts)
+        return {name: pool.stats() for name, pool in pools.items()}
+    
+    def close_all(self) -> None:
+        """Close all pooled connections"""
+        with self._lock:
+            pools = list(self._hosts.values())
+            self._hosts.clear()
+        for pool in pools:
+            pool.close_all()
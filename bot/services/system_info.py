@@ -0,0 +1,185 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from config import ServerConfig, settings
+from services.ssh_executor import ssh_executor
+
+
+# Prefix of the marker lines separating probe sections in the output
+_SECTION_MARKER = "@@section "
+
+# Probes shared by /system info and background collection
+SYSTEM_PROBES = {
+    "uptime": "cat /proc/uptime; uptime -p 2>/dev/null",
+    "loadavg": "cat /proc/loadavg",
+    "meminfo": "grep -E '^(MemTotal|MemAvailable|SwapTotal|SwapFree):' /proc/meminfo",
+    "kernel": "uname -sr",
+}
+
+PUBLIC_IP_PROBE = "curl -s -m 5 ifconfig.me"
+
+
+@dataclass
+class SystemSnapshot:
+    """Point-in-time system information for a server"""
+    uptime_seconds: Optional[float] = None
+    uptime_text: Optional[str] = None
+    load: Optional[Tuple[float, float, float]] = None
+    mem_total: Optional[int] = None
+    mem_available: Optional[int] = None
+    swap_total: Optional[int] = None
+    swap_free: Optional[int] = None
+    kernel: Optional[str] = None
+    public_ip: Optional[str] = None
+    public_ip_fetched_at: Optional[float] = None
+    probe_seconds: float = 0.0
+
+
+def build_probe_script(probes: Dict[str, str]) -> str:
+    """
+    Combine several probe commands into one remote script
+    
+    Each probe's output is preceded by a marker line so the sections can be
+    split apart again; a failing probe only leaves its own section empty.
+    
+    Args:
+        probes: Section name to shell command
+        
+    Returns:
+        Shell script running every probe
+    """
+    return "; ".join(
+        f"echo '{_SECTION_MARKER}{name}'; {{ {command}; }} 2>/dev/null"
+        for name, command in probes.items()
+    )
+
+
+def parse_probe_output(output: str) -> Dict[str, str]:
+    """
+    Split the output of a probe script into sections
+    
+    Args:
+        output: stdout of a script from build_probe_script
+        
+    Returns:
+        Section name to its output
+    """
+    sections: Dict[str, list] = {}
+    current = None
+    for line in output.splitlines():
+        if line.startswith(_SECTION_MARKER):
+            current = line[len(_SECTION_MARKER):].strip()
+            sections[current] = []
+        elif current is not None:
+            sections[current].append(line)
+    return {name: "\n".join(lines).strip() for name, lines in sections.items()}
+
+
+def parse_system_sections(sections: Dict[str, str]) -> SystemSnapshot:
+    """
+    Parse the SYSTEM_PROBES sections of a probe into a snapshot
+    
+    Args:
+        sections: Output of parse_probe_output
+        
+    Returns:
+        SystemSnapshot with whatever could be parsed
+    """
+    snapshot = SystemSnapshot()
+    
+    uptime_lines = sections.get("uptime", "").splitlines()
+    if uptime_lines:
+        try:
+            snapshot.uptime_seconds = float(uptime_lines[0].split()[0])
+        except (ValueError, IndexError):
+            pass
+        if len(uptime_lines) > 1:
+            snapshot.uptime_text = uptime_lines[1].strip()
+    
+    load_fields = sections.get("loadavg", "").split()
+    if len(load_fields) >= 3:
+        try:
+            snapshot.load = (float(load_fields[0]), float(load_fields[1]), float(load_fields[2]))
+        except ValueError:
+            pass
+    
+    meminfo = {}
+    for line in sections.get("meminfo", "").splitlines():
+        key, _, value = line.partition(":")
+        parts = value.split()
+        if parts and parts[0].isdigit():
+            meminfo[key] = int(parts[0]) * 1024  # reported in kB
+    snapshot.mem_total = meminfo.get("MemTotal")
+    snapshot.mem_available = meminfo.get("MemAvailable")
+    snapshot.swap_total = meminfo.get("SwapTotal")
+    snapshot.swap_free = meminfo.get("SwapFree")
+    
+    snapshot.kernel = sections.get("kernel") or None
+    return snapshot
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration as days/hours/minutes"""
+    minutes = int(seconds) // 60
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d {hours}h {minutes}m"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
+class SystemInfoService:
+    """Collects system information in a single SSH round trip per request"""
+    
+    def __init__(self):
+        self._public_ips: Dict[str, Tuple[str, float]] = {}
+    
+    def _get_cached_ip(self, server: ServerConfig) -> Optional[Tuple[str, float]]:
+        """Get the cached public IP of a server if it is still fresh"""
+        cached = self._public_ips.get(server.name)
+        if cached and time.time() - cached[1] < settings.PUBLIC_IP_TTL:
+            return cached
+        return None
+    
+    async def collect(self, server: ServerConfig) -> SystemSnapshot:
+        """
+        Collect system information from a server
+        
+        All probes run as one remote script; the public IP is only looked up
+        when the cached value has expired.
+        
+        Args:
+            server: Server configuration
+            
+        Returns:
+            SystemSnapshot of the server
+        """
+        probes = dict(SYSTEM_PROBES)
+        cached_ip = self._get_cached_ip(server)
+        if cached_ip is None:
+            probes["public_ip"] = PUBLIC_IP_PROBE
+        
+        started = time.monotonic()
+        stdout, stderr, exit_code = await ssh_executor.run(server, build_probe_script(probes), timeout=15)
+        if not stdout.strip():
+            raise RuntimeError(stderr.strip() or f"exit code {exit_code}")
+        
+        sections = parse_probe_output(stdout)
+        snapshot = parse_system_sections(sections)
+        snapshot.probe_seconds = time.monotonic() - started
+        
+        if cached_ip is None:
+            public_ip = sections.get("public_ip", "").strip()
+            if public_ip and len(public_ip) <= 45 and " " not in public_ip:
+                cached_ip = (public_ip, time.time())
+                self._public_ips[server.name] = cached_ip
+        if cached_ip:
+            snapshot.public_ip, snapshot.public_ip_fetched_at = cached_ip
+        
+        return snapshot
+
+
+# Global system info service instance
+system_info_service = SystemInfoService()